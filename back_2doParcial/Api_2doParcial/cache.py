@@ -0,0 +1,241 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class VersionesBase:
+    """
+    Versión de cada namespace en una secuencia de PostgreSQL
+    (cache_version_<namespace>), la misma para todos los workers.
+
+    nextval no bloquea ni espera al commit, así las escrituras concurrentes
+    no se serializan en un contador. Como el valor nuevo se ve antes del
+    commit, quien invalida dentro de una transacción vuelve a invalidar al
+    confirmarla (ver Productos/signals.py).
+    """
+
+    def _secuencia(self, namespace):
+        return f'cache_version_{namespace}'
+
+    def instalar(self, namespace, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {self._secuencia(namespace)}')
+
+    def get(self, namespace):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {self._secuencia(namespace)}'
+            )
+            return cursor.fetchone()[0]
+
+    def incr(self, namespace):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [self._secuencia(namespace)])
+
+
+class CacheLRU:
+    """
+    Backend en memoria del proceso con desalojo LRU. Sin `versiones` la
+    versión es local y solo invalida al proceso actual; con VersionesBase
+    las entradas siguen en cada proceso pero la versión es compartida, así
+    una invalidación llega a todos los workers.
+    """
+    nombre = 'lru'
+
+    def __init__(self, max_entradas=1024, versiones=None):
+        self.max_entradas = max_entradas
+        self.versiones = versiones
+        self.desalojos = 0
+        self._datos = OrderedDict()
+        self._version = 1
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, timeout):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + timeout, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def get_version(self, namespace):
+        if self.versiones is None:
+            return self._version
+        version = self.versiones.get(namespace)
+        if version != self._version:
+            with self._lock:
+                # Otro worker invalidó: las entradas guardadas ya no se pueden leer
+                self._version = version
+                self._datos.clear()
+        return version
+
+    def incr_version(self, namespace):
+        if self.versiones is not None:
+            self.versiones.incr(namespace)
+        with self._lock:
+            self._version += 1
+            # Las entradas de versiones anteriores ya no se pueden leer
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheCompartida:
+    """
+    Backend sobre un alias de CACHES (Redis, Memcached, ...). La versión se
+    guarda en la misma cache, así una invalidación llega a todos los workers.
+    """
+    nombre = 'compartida'
+    desalojos = None  # Los desalojos los decide el servidor de cache
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+        if isinstance(self.cache, LocMemCache):
+            raise ImproperlyConfigured(
+                f"CACHES['{alias}'] es LocMemCache, que es por proceso: configure Redis o Memcached "
+                "o use CATALOGO_CACHE_BACKEND='lru'"
+            )
+
+    def get(self, clave):
+        return self.cache.get(clave)
+
+    def set(self, clave, valor, timeout):
+        self.cache.set(clave, valor, timeout)
+
+    def delete(self, clave):
+        self.cache.delete(clave)
+
+    def get_version(self, namespace):
+        clave = f'{namespace}:version'
+        version = self.cache.get(clave)
+        if version is None:
+            # Si la clave de versión fue desalojada, arrancar desde el reloj
+            # para no reutilizar números de versiones anteriores
+            self.cache.add(clave, time.time_ns(), None)
+            version = self.cache.get(clave)
+        return version
+
+    def incr_version(self, namespace):
+        clave = f'{namespace}:version'
+        try:
+            self.cache.incr(clave)
+        except ValueError:
+            self.cache.add(clave, time.time_ns(), None)
+
+    def __len__(self):
+        return 0
+
+
+class CacheVersionada:
+    """
+    Cache read-through de respuestas GET, con clave por endpoint y parámetros.
+
+    Cada clave incluye la versión actual del namespace; invalidar solo
+    incrementa la versión, por lo que no hace falta borrar claves una por una.
+    """
+
+    def __init__(self, namespace, backend, timeout=300):
+        self.namespace = namespace
+        self.backend = backend
+        self.timeout = timeout
+        self.aciertos = 0
+        self.fallos = 0
+
+    def version(self, request):
+        """Versión del namespace, leída una sola vez por petición (la comparten validador y clave)"""
+        versiones = request.__dict__.setdefault('_versiones_cache', {})
+        if self.namespace not in versiones:
+            versiones[self.namespace] = self.backend.get_version(self.namespace)
+        return versiones[self.namespace]
+
+    def validador(self, request, *args, **kwargs):
+        """
+        Validador para @condicional en las vistas cacheadas. Toda escritura
+        que cambia sus respuestas ya incrementa la versión, así el ETag sale
+        de una lectura de la versión y no de un agregado sobre las tablas.
+        Requiere una versión compartida entre workers (VersionesBase o
+        CacheCompartida).
+        """
+        return self.version(request), None
+
+    def clave(self, request):
+        parametros = urlencode(sorted(request.query_params.lists()), doseq=True)
+        resumen = hashlib.sha1(f'{request.path}?{parametros}'.encode()).hexdigest()
+        return f'{self.namespace}:{self.version(request)}:{resumen}'
+
+    def invalidar(self):
+        self.backend.incr_version(self.namespace)
+
+    def instalar(self, using='default', **kwargs):
+        """post_migrate: crea la secuencia de la versión si el backend la usa"""
+        versiones = getattr(self.backend, 'versiones', None)
+        if versiones is not None:
+            versiones.instalar(self.namespace, using)
+
+    def estadisticas(self):
+        return {
+            'backend': self.backend.nombre,
+            'version': self.backend.get_version(self.namespace),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.backend.desalojos,
+            'entradas': len(self.backend),
+        }
+
+    def cachear(self, view_func):
+        """Decorador para vistas GET: sirve desde cache y guarda solo respuestas 200"""
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            clave = self.clave(request)
+            datos = self.backend.get(clave)
+            if datos is not None:
+                self.aciertos += 1
+                return Response(datos)
+
+            self.fallos += 1
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                self.backend.set(clave, response.data, self.timeout)
+            return response
+
+        return wrapper
+
+
+def crear_cache(namespace):
+    """Crea la cache de un namespace según CATALOGO_CACHE_* en settings"""
+    if getattr(settings, 'CATALOGO_CACHE_BACKEND', 'lru') == 'compartida':
+        backend = CacheCompartida(getattr(settings, 'CATALOGO_CACHE_ALIAS', 'default'))
+    else:
+        backend = CacheLRU(getattr(settings, 'CATALOGO_CACHE_MAX_ENTRADAS', 1024), VersionesBase())
+    return CacheVersionada(namespace, backend, getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 300))
+
+
+# Respuestas públicas del catálogo (productos, categorías y marcas)
+cache_catalogo = crear_cache('catalogo')
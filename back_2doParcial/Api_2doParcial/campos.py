@@ -0,0 +1,99 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ParseError
+from rest_framework.serializers import BaseSerializer
+
+
+class CamposDinamicosMixin:
+    """
+    Para ModelSerializer: recibe `campos` (ver leer_campos) y descarta el
+    resto de los campos antes de serializar. Sin `campos` el serializer
+    devuelve todo, como siempre.
+    """
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+def _lista(request, nombre):
+    """Acepta ?fields=a,b y ?fields=a&fields=b"""
+    valores = []
+    for valor in request.query_params.getlist(nombre):
+        valores.extend(parte.strip() for parte in valor.split(',') if parte.strip())
+    return valores
+
+
+def leer_campos(request, serializer_class):
+    """
+    Campos pedidos con ?fields= y relaciones anidadas pedidas con ?expand=.
+
+    Devuelve None si la petición no trae ninguno de los dos. Si trae alguno,
+    las relaciones anidadas pasan a ser opcionales: solo se incluyen las que
+    aparecen en fields o en expand. Si se pide un campo que el serializer no
+    tiene responde 400 con {'error': ...}.
+    """
+    campos = _lista(request, 'fields')
+    expandir = _lista(request, 'expand')
+    if not campos and not expandir:
+        return None
+
+    legibles = {nombre: campo for nombre, campo in serializer_class().fields.items() if not campo.write_only}
+    anidados = {nombre for nombre, campo in legibles.items() if isinstance(campo, BaseSerializer)}
+    desconocidos = [nombre for nombre in campos if nombre not in legibles]
+    desconocidos += [nombre for nombre in expandir if nombre not in anidados]
+    if desconocidos:
+        raise ParseError({'error': f"Campos desconocidos: {', '.join(desconocidos)}"})
+
+    seleccion = set(campos) if campos else set(legibles) - anidados
+    return seleccion | set(expandir)
+
+
+def plan_consulta(serializer_class, modelo, campos):
+    """
+    Qué necesita leer de la base el serializer con esos campos.
+
+    Devuelve (columnas para only() o None si algún campo no se puede
+    resolver a una columna, rutas para select_related, relaciones anidadas
+    para precargar).
+    """
+    columnas, relacionados, anidados = {modelo._meta.pk.name}, set(), []
+    for campo in serializer_class(campos=campos).fields.values():
+        if campo.write_only:
+            continue
+        if isinstance(campo, BaseSerializer):
+            anidados.append(campo.source)
+            continue
+
+        partes = campo.source.split('.')
+        try:
+            modelo._meta.get_field(partes[0])
+        except FieldDoesNotExist:
+            # Propiedad, método o source='*': no se sabe qué columnas usa
+            columnas = None
+            continue
+        if len(partes) > 1:
+            relacionados.add('__'.join(partes[:-1]))
+        if columnas is not None:
+            columnas.add('__'.join(partes))
+
+    return columnas, relacionados, anidados
+
+
+def optimizar(queryset, serializer_class, campos):
+    """
+    Recorta el queryset a los campos pedidos: select_related solo de las
+    relaciones que se muestran y only() de las columnas necesarias.
+    Sin `campos` devuelve el queryset sin cambios.
+    """
+    if campos is None:
+        return queryset
+
+    columnas, relacionados, _ = plan_consulta(serializer_class, queryset.model, campos)
+    queryset = queryset.select_related(None)
+    if relacionados:
+        queryset = queryset.select_related(*relacionados)
+    if columnas is not None:
+        queryset = queryset.only(*columnas)
+    return queryset
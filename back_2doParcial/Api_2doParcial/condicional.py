@@ -0,0 +1,57 @@
+import hashlib
+from functools import wraps
+from django.db.models import Count, Max
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+
+
+def version(queryset, *campos_fecha):
+    """
+    Validador barato de un queryset: (cantidad de filas, fecha más reciente
+    entre `campos_fecha`), calculado en una sola consulta agregada.
+    """
+    maximos = [Max(campo) for campo in campos_fecha]
+    ultima = Greatest(*maximos) if len(maximos) > 1 else maximos[0]
+    datos = queryset.aggregate(total=Count('pk'), ultima=ultima)
+    return datos['total'], datos['ultima']
+
+
+def condicional(validador):
+    """
+    Decorador de GET condicional (ETag / 304).
+
+    `validador(request, *args, **kwargs)` devuelve (total, ultima_modificacion).
+    Si el cliente ya tiene esa versión se responde 304 sin ejecutar la vista,
+    así no se serializa nada cuando no hubo cambios.
+
+    No se envía Last-Modified: la fecha más reciente no cambia cuando una
+    fila sale del conjunto (eliminación lógica, cambio de categoría), y un
+    If-Modified-Since recibiría un 304 con datos viejos. El ETag incluye el
+    total de filas, que sí cambia.
+    """
+    def decorador(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            total, ultima = validador(request, *args, **kwargs)
+            # La ruta y los parámetros forman parte del ETag: cada página o
+            # filtro es una representación distinta
+            firma = f"{request.get_full_path()}|{total}|{ultima.isoformat() if ultima else ''}"
+            etag = quote_etag(hashlib.sha1(firma.encode()).hexdigest())
+
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response.headers['ETag'] = etag
+            return response
+
+        return wrapper
+
+    return decorador
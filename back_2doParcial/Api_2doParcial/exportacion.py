@@ -0,0 +1,78 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+# Filas que se leen del cursor del servidor por cada viaje a la base
+TAMANIO_BLOQUE = 2000
+# Filas que se juntan antes de enviar un fragmento de la respuesta
+FILAS_POR_FRAGMENTO = 500
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve la línea en lugar de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def _lineas_csv(nombres, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(nombres)
+    for fila in filas:
+        yield escritor.writerow([_texto(valor) for valor in fila])
+
+
+def _lineas_ndjson(nombres, filas):
+    for fila in filas:
+        yield json.dumps(dict(zip(nombres, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _fragmentos(lineas):
+    fragmento = []
+    for linea in lineas:
+        fragmento.append(linea)
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield ''.join(fragmento)
+            fragmento = []
+    if fragmento:
+        yield ''.join(fragmento)
+
+
+def exportar(request, queryset, columnas, nombre_archivo):
+    """
+    Exporta un queryset como CSV o NDJSON (?formato=) en streaming.
+
+    `columnas` es una lista de (nombre en el archivo, campo del ORM). Las
+    filas se leen con values_list().iterator(), que en PostgreSQL usa un
+    cursor del servidor, y se envían a medida que llegan: la memoria del
+    worker no depende del tamaño de la tabla y la descarga empieza enseguida.
+    """
+    formato = request.query_params.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return Response(
+            {'error': 'Formato inválido. Use csv o ndjson'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    nombres = [nombre for nombre, _ in columnas]
+    filas = queryset.values_list(*[campo for _, campo in columnas]).iterator(chunk_size=TAMANIO_BLOQUE)
+    lineas = _lineas_csv(nombres, filas) if formato == 'csv' else _lineas_ndjson(nombres, filas)
+
+    response = StreamingHttpResponse(_fragmentos(lineas), content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return response
@@ -0,0 +1,130 @@
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, LimitOffsetPagination
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por cursor (keyset): cada página busca a partir de la clave
+    de orden del último registro en lugar de usar OFFSET, por eso la página
+    10.000 cuesta lo mismo que la primera. Los cursores next/previous son opacos.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
+
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = ordering
+
+
+class PaginacionClaves(PaginacionCursor):
+    """
+    Cursor sobre una clave compuesta única, p. ej. ('ubicacion', 'id').
+
+    CursorPagination busca solo por el primer campo del orden y resuelve los
+    empates con OFFSET: con muchas filas por valor el costo crece con la
+    página, y si cambian filas entre páginas se saltan o repiten. Aquí la
+    posición es la clave completa de la última fila y la búsqueda es una
+    comparación de filas, (ubicacion, id) > (%s, %s), que recorre el índice
+    sobre esas columnas. Todos los campos van en el mismo sentido.
+    """
+
+    def _clave(self, instancia):
+        return json.dumps([str(getattr(instancia, campo.lstrip('-'))) for campo in self.ordering])
+
+    def _buscar(self, queryset, posicion, mayor):
+        campos = [campo.lstrip('-') for campo in self.ordering]
+        try:
+            valores = json.loads(posicion)
+            if not isinstance(valores, list) or len(valores) != len(campos):
+                raise ValueError
+            valores = [
+                Value(campo.to_python(valor), output_field=campo)
+                for campo, valor in zip(map(queryset.model._meta.get_field, campos), valores)
+            ]
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        fila = Func(*map(F, campos), function='ROW', output_field=Field())
+        clave = Func(*valores, function='ROW', output_field=Field())
+        return queryset.filter((GreaterThan if mayor else LessThan)(fila, clave))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        descendente = self.ordering[0].startswith('-')
+        assert all(campo.startswith('-') == descendente for campo in self.ordering), (
+            'PaginacionClaves requiere todos los campos del orden en el mismo sentido'
+        )
+
+        self.cursor = self.decode_cursor(request)
+        reverso = self.cursor is not None and self.cursor.reverse
+        posicion = self.cursor.position if self.cursor is not None else None
+
+        if reverso:
+            queryset = queryset.order_by(*(
+                campo[1:] if campo.startswith('-') else f'-{campo}' for campo in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if posicion is not None:
+            queryset = self._buscar(queryset, posicion, mayor=reverso == descendente)
+
+        resultados = list(queryset[:self.page_size + 1])
+        self.page = resultados[:self.page_size]
+        hay_mas = len(resultados) > self.page_size
+        if reverso:
+            self.page.reverse()
+            self.has_next, self.has_previous = posicion is not None, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, posicion is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        posicion = self._clave(self.page[-1]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=posicion))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        posicion = self._clave(self.page[0]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=posicion))
+
+
+class PaginacionBusqueda(LimitOffsetPagination):
+    """
+    Paginación limit/offset para resultados ordenados por relevancia,
+    donde no hay una clave de orden estable sobre la cual buscar.
+    """
+    default_limit = 20
+    max_limit = 100
+
+
+def paginar(request, queryset, serializer_class, ordering=None, paginador=None, campos=None):
+    """
+    Paginación opcional para las vistas de listado.
+
+    Solo se activa si la petición trae ?cursor=, ?limit= u ?offset=; en ese
+    caso devuelve la Response paginada. Si no, devuelve None y la vista
+    responde con la lista completa como siempre. Por defecto pagina por
+    cursor sobre el `ordering` del modelo. `campos` se pasa al serializer
+    (ver Api_2doParcial/campos.py).
+    """
+    if not any(param in request.query_params for param in ('cursor', 'limit', 'offset')):
+        return None
+
+    if paginador is None:
+        paginador = PaginacionCursor(ordering or queryset.model._meta.ordering or ('-id',))
+    pagina = paginador.paginate_queryset(queryset, request)
+    extra = {'campos': campos} if campos is not None else {}
+    serializer = serializer_class(pagina, many=True, **extra)
+    return paginador.get_paginated_response(serializer.data)
@@ -29,7 +29,35 @@ SECRET_KEY = 'django-insecure-53$y(_=x7jtw-ckn#3nr4b8f@_1+mg8(y%6*@#nw=ih#nm!fi3
 # Configuración JWT personalizada
 JWT_SECRET_KEY = SECRET_KEY  # Usa el SECRET_KEY de Django
 JWT_ALGORITHM = 'HS256'
-JWT_EXP_DELTA_HOURS = 3  # Token expira en 3 horas
+JWT_ACCESS_MINUTOS = 15  # Access token (JWT); se renueva con el refresh token
+JWT_REFRESH_DIAS = 7     # Refresh token (rotado en cada uso)
+JWT_REVOCACIONES_INTERVALO = 30  # segundos entre reconstrucciones del filtro de revocados
+JWT_BLOOM_BITS = 1 << 20         # 128 KB: ~1% de falsos positivos con 100k familias revocadas
+JWT_BLOOM_HASHES = 7
+JWT_USUARIOS_CACHE_TTL = 60      # segundos que un proceso reusa el usuario de un token (0 = sin cache)
+JWT_USUARIOS_CACHE_MAX = 10_000  # usuarios en la cache de cada proceso
+PERMISOS_CACHE_TTL = 60          # segundos que un proceso reusa los permisos compilados de un usuario (0 = sin cache)
+PERMISOS_CACHE_MAX = 10_000      # usuarios con permisos compilados en cada proceso
+
+# Protección del login (Usuarios/proteccion.py)
+# 'base' = tabla login_cubetas compartida por todos los workers, 'local' = memoria de cada proceso (desarrollo)
+LOGIN_CUBETAS_BACKEND = os.getenv('LOGIN_CUBETAS_BACKEND', 'base')
+LOGIN_IP_RAFAGA = 20           # intentos seguidos por IP
+LOGIN_IP_POR_MINUTO = 10       # intentos que se recuperan por minuto
+LOGIN_USUARIO_RAFAGA = 5       # contraseñas incorrectas seguidas por username
+LOGIN_USUARIO_POR_MINUTO = 1
+LOGIN_PROXIES = 0              # proxies de confianza delante (X-Forwarded-For); 0 = usar REMOTE_ADDR
+LOGIN_HASH_PROCESOS = 0        # procesos para verificar contraseñas (0 = en el hilo de la petición)
+LOGIN_HASH_CONCURRENTES = 4    # verificaciones a la vez por proceso
+LOGIN_HASH_ESPERA = 2          # segundos esperando lugar antes de responder 503
+
+# Cache de respuestas del catálogo (Api_2doParcial/cache.py)
+# 'lru' = respuestas en memoria de cada proceso, con la versión (invalidación) en una secuencia de PostgreSQL
+# compartida por todos los workers; 'compartida' = CACHES[CATALOGO_CACHE_ALIAS] (Redis o Memcached, no LocMem)
+CATALOGO_CACHE_BACKEND = os.getenv('CATALOGO_CACHE_BACKEND', 'lru')
+CATALOGO_CACHE_ALIAS = 'default'
+CATALOGO_CACHE_MAX_ENTRADAS = 1024
+CATALOGO_CACHE_TIMEOUT = 300  # segundos
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -46,6 +74,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'cloudinary',
@@ -73,6 +102,27 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 # Opcional: Configuraciones adicionales
 CLOUDINARY_URL = f"cloudinary://{os.getenv('CLOUDINARY_API_KEY')}:{os.getenv('CLOUDINARY_API_SECRET')}@{os.getenv('CLOUDINARY_CLOUD_NAME')}"
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+PRODUCTOS_MAX_LOTE = 100      # ids por petición en productos/lote/
+PERMISOS_LOTE = 1000               # filas por INSERT ... ON CONFLICT en permisos/asignar/
+PERMISOS_MAX_ASIGNACION = 50_000   # usuarios x vistas por petición en permisos/asignar/
+
+# Carga de imágenes en segundo plano (Productos/imagenes.py)
+# 'cloudinary' = almacenamiento real, 'archivos' = carpeta local (pruebas y benchmarks sin red)
+IMAGENES_BACKEND = os.getenv('IMAGENES_BACKEND', 'cloudinary')
+IMAGENES_STAGING_DIR = MEDIA_ROOT / 'staging'    # archivos recibidos aún no subidos
+IMAGENES_ARCHIVOS_DIR = MEDIA_ROOT / 'imagenes'  # destino del backend 'archivos'
+IMAGENES_ARCHIVOS_URL = MEDIA_URL + 'imagenes/'
+IMAGENES_TRABAJADORES = 4
+IMAGENES_MAX_LOTE = 20        # archivos por petición en imagenes-producto/producto/<id>/lote/
+IMAGENES_PROCESOS = 2         # procesos que generan variantes con el backend 'archivos'
+IMAGENES_REINTENTOS = 3      # intentos por imagen antes de marcarla con error
+IMAGENES_TIMEOUT = 30        # segundos por subida
+IMAGENES_CIRCUITO_FALLOS = 5     # fallos seguidos que abren el circuito
+IMAGENES_CIRCUITO_ESPERA = 30    # segundos con el circuito abierto antes de probar otra vez
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -1,4 +1,6 @@
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path,include
 
@@ -13,3 +15,6 @@ urlpatterns = [
     path('api/marcas/', include('Marcas.urls')),
     path('api/productos/', include('Productos.urls')),
 ]
+
+# Imágenes del backend 'archivos' (solo con DEBUG; en producción las sirve el servidor web)
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
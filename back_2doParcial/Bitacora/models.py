@@ -9,4 +9,7 @@ class Bitacora (models.Model):
     descripcion = models.TextField()
 
     class Meta :
-        db_table = 'bitacora'
\ No newline at end of file
+        db_table = 'bitacora'
+        indexes = [
+            models.Index(fields=['-fecha_hora', '-id'], name='bitacora_fecha_hora_idx'),
+        ]
\ No newline at end of file
@@ -1,3 +1,138 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
 from django.test import TestCase
+from django.urls import reverse
+from Api_2doParcial.exportacion import FILAS_POR_FRAGMENTO
+from Api_2doParcial.paginacion import PaginacionCursor
+from .models import Bitacora
 
-# Create your tests here.
+
+def contenido(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+class ExportacionBitacoraTest(TestCase):
+    """Exportación en streaming de la bitácora, de la más reciente a la más antigua"""
+
+    def setUp(self):
+        inicio = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+        self.registros = [
+            Bitacora.objects.create(
+                username='admin', ip='10.0.0.1', fecha_hora=inicio, accion='login', descripcion='Ingreso'
+            ),
+            # Misma fecha_hora: desempata el id
+            Bitacora.objects.create(
+                username='admin', ip='10.0.0.1', fecha_hora=inicio, accion='crear', descripcion='Producto "Café", 1 kg'
+            ),
+            Bitacora.objects.create(
+                username='vendedor', ip='10.0.0.2', fecha_hora=inicio + timedelta(hours=1),
+                accion='logout', descripcion='Salida'
+            ),
+        ]
+        self.url = reverse('exportar_bitacoras')
+
+    def test_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bitacora.csv"')
+
+        filas = list(csv.reader(io.StringIO(contenido(response))))
+        self.assertEqual(filas[0], ['id', 'username', 'ip', 'fecha_hora', 'accion', 'descripcion'])
+        self.assertEqual([int(fila[0]) for fila in filas[1:]], [r.id for r in reversed(self.registros)])
+        self.assertEqual(filas[2][3], '2025-03-01T12:00:00+00:00')
+        self.assertEqual(filas[2][5], 'Producto "Café", 1 kg')
+
+    def test_ndjson(self):
+        response = self.client.get(self.url, {'formato': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bitacora.ndjson"')
+
+        filas = [json.loads(linea) for linea in contenido(response).splitlines()]
+        self.assertEqual([fila['id'] for fila in filas], [r.id for r in reversed(self.registros)])
+        self.assertEqual(filas[0], {
+            'id': self.registros[2].id, 'username': 'vendedor', 'ip': '10.0.0.2',
+            'fecha_hora': '2025-03-01T13:00:00Z', 'accion': 'logout', 'descripcion': 'Salida',
+        })
+
+    def test_fragmentos(self):
+        fecha = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        Bitacora.objects.bulk_create(
+            Bitacora(username='carga', ip='10.0.0.3', fecha_hora=fecha, accion='importar', descripcion=str(i))
+            for i in range(FILAS_POR_FRAGMENTO * 2)
+        )
+        fragmentos = list(self.client.get(self.url).streaming_content)
+        # Encabezado + 1003 filas en fragmentos de FILAS_POR_FRAGMENTO líneas
+        self.assertEqual(len(fragmentos), 3)
+        self.assertEqual(b''.join(fragmentos).count(b'\r\n'), FILAS_POR_FRAGMENTO * 2 + 4)
+
+    def test_formato_invalido(self):
+        response = self.client.get(self.url, {'formato': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+
+
+class PaginacionBitacoraTest(TestCase):
+    """Listado por cursor (?limit, ?cursor) sobre (-fecha_hora, -id)"""
+
+    def setUp(self):
+        inicio = datetime(2025, 3, 1, tzinfo=timezone.utc)
+        # Varias filas por cada fecha_hora: el id tiene que desempatar entre páginas
+        Bitacora.objects.bulk_create(
+            Bitacora(
+                username='admin', ip='10.0.0.1', fecha_hora=inicio + timedelta(minutes=i // 3),
+                accion='accion', descripcion=str(i)
+            )
+            for i in range(10)
+        )
+        self.esperado = list(Bitacora.objects.order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        self.url = reverse('listar_bitacoras')
+
+    def test_sin_parametros_lista_completa(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 10)
+
+    def test_recorrido_por_cursor(self):
+        vistos = []
+        response = self.client.get(self.url, {'limit': 4})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 4)
+            vistos += [fila['id_bitacora'] for fila in response.data['results']]
+            if response.data['next'] is None:
+                break
+            self.assertIn('cursor=', response.data['next'])
+            self.assertIn('limit=4', response.data['next'])
+            response = self.client.get(response.data['next'])
+        self.assertEqual(vistos, self.esperado)
+
+        # Una fila nueva más reciente no corre las páginas siguientes
+        primera = self.client.get(self.url, {'limit': 4})
+        Bitacora.objects.create(
+            username='admin', ip='10.0.0.1', fecha_hora=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            accion='accion', descripcion='nueva'
+        )
+        segunda = self.client.get(primera.data['next'])
+        self.assertEqual([fila['id_bitacora'] for fila in segunda.data['results']], self.esperado[4:8])
+
+    def test_limite_maximo(self):
+        fecha = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        Bitacora.objects.bulk_create(
+            Bitacora(username='carga', ip='10.0.0.2', fecha_hora=fecha, accion='accion', descripcion=str(i))
+            for i in range(PaginacionCursor.max_page_size)
+        )
+        response = self.client.get(self.url, {'limit': PaginacionCursor.max_page_size * 2})
+        self.assertEqual(len(response.data['results']), PaginacionCursor.max_page_size)
+        self.assertIsNotNone(response.data['next'])
+
+        # Un limit inválido usa el tamaño por defecto
+        response = self.client.get(self.url, {'limit': 'x'})
+        self.assertEqual(len(response.data['results']), PaginacionCursor.page_size)
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'no-es-un-cursor'}).status_code, 404)
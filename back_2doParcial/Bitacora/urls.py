@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import listar_bitacoras, registrar_bitacora
+from .views import listar_bitacoras, registrar_bitacora, exportar_bitacoras
 
 urlpatterns = [
     path('listar', listar_bitacoras, name='listar_bitacoras'),
     path('registrar', registrar_bitacora, name='registrar_bitacora'),
+    path('exportar', exportar_bitacoras, name='exportar_bitacoras'),
 ]
@@ -4,16 +4,36 @@ from rest_framework import status
 from .models import Bitacora
 from .serializers import RegistroBitacora, serializerBitacora
 from django.utils import timezone
+from Api_2doParcial.paginacion import paginar
+from Api_2doParcial.exportacion import exportar
 
 
 # 📋 Listar todas las bitácoras
 @api_view(["GET"])
 def listar_bitacoras(request):
     bitacoras = Bitacora.objects.all().order_by("-fecha_hora")  # orden descendente
+    pagina = paginar(request, bitacoras, serializerBitacora, ordering=("-fecha_hora", "-id"))
+    if pagina is not None:
+        return pagina
     serializer = serializerBitacora(bitacoras, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+# 📤 Exportar la bitácora completa (CSV o NDJSON, en streaming)
+@api_view(["GET"])
+def exportar_bitacoras(request):
+    columnas = [
+        ("id", "id"),
+        ("username", "username"),
+        ("ip", "ip"),
+        ("fecha_hora", "fecha_hora"),
+        ("accion", "accion"),
+        ("descripcion", "descripcion"),
+    ]
+    bitacoras = Bitacora.objects.order_by("-fecha_hora", "-id")
+    return exportar(request, bitacoras, columnas, "bitacora")
+
+
 # 📝 Registrar una nueva bitácora
 @api_view(["POST"])
 def registrar_bitacora(request):
@@ -2,6 +2,7 @@ from django.db import models
 
 class Categoria(models.Model):
     descripcion = models.CharField(max_length=255, unique=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, null=True)
     estado = models.BooleanField(default=True)  # Para eliminación lógica
     
     class Meta:
@@ -3,9 +3,13 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Categoria
 from .serializers import CategoriaSerializer
+from Api_2doParcial.cache import cache_catalogo
+from Api_2doParcial.condicional import condicional, version
 
 # GET /api/categorias/ - Listar categorías activas
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def listar_categorias(request):
     """Listar solo categorías activas"""
     categorias = Categoria.objects.filter(estado=True)
@@ -24,6 +28,7 @@ def listar_todas_categorias(request):
 
 # GET /api/categorias/{id}/ - Obtener categoría específica
 @api_view(['GET'])
+@condicional(lambda request, pk: version(Categoria.objects.filter(pk=pk, estado=True), 'fecha_actualizacion'))
 def obtener_categoria(request, pk):
     try:
         categoria = Categoria.objects.get(pk=pk, estado=True)
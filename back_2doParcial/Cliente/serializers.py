@@ -2,8 +2,9 @@ from rest_framework import serializers
 from django.db import transaction
 from .models import Cliente
 from Usuarios.models import Usuario
+from Api_2doParcial.campos import CamposDinamicosMixin
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_username = serializers.CharField(source='usuario.username', read_only=True)
     usuario_correo = serializers.CharField(source='usuario.correo', read_only=True)
 
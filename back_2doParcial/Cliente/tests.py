@@ -1,3 +1,40 @@
+import csv
+import io
+import json
 from django.test import TestCase
+from django.urls import reverse
+from Usuarios.models import Usuario
+from .models import Cliente
 
-# Create your tests here.
+
+class ExportacionClientesTest(TestCase):
+    """Exportación en streaming de clientes activos e inactivos, por id"""
+
+    def setUp(self):
+        self.clientes = [
+            Cliente.objects.create(
+                usuario=Usuario.objects.create(
+                    username=f'cliente{i}', correo=f'cliente{i}@example.com', password='secreta', tipo_usuario='cliente'
+                ),
+                nombre_completo=f'Cliente {i}', telefono=f'7000000{i}', direccion='Av. Busch', ci=f'123{i}',
+                estado=i != 1
+            )
+            for i in range(2)
+        ]
+
+    def test_csv_y_ndjson(self):
+        response = self.client.get(reverse('exportar-clientes'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="clientes.csv"')
+        filas = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual([int(fila['id']) for fila in filas], [cliente.id for cliente in self.clientes])
+        self.assertEqual(filas[0]['usuario_username'], 'cliente0')
+        self.assertEqual(filas[1]['estado'], 'False')
+
+        response = self.client.get(reverse('exportar-clientes'), {'formato': 'ndjson'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="clientes.ndjson"')
+        fila = json.loads(b''.join(response.streaming_content).decode('utf-8').splitlines()[0])
+        self.assertEqual(fila['ci'], '1230')
+        self.assertEqual(fila['usuario_correo'], 'cliente0@example.com')
+
+        self.assertEqual(self.client.get(reverse('exportar-clientes'), {'formato': 'pdf'}).status_code, 400)
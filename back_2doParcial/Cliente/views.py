@@ -3,29 +3,59 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Cliente
 from .serializers import ClienteSerializer, ClienteCreateSerializer
+from Api_2doParcial.paginacion import paginar
+from Api_2doParcial.exportacion import exportar
+from Api_2doParcial.campos import leer_campos, optimizar
 
 # GET /api/clientes/listar/ - Listar clientes activos (PROTEGIDA)
 @api_view(['GET'])
 def listar_clientes(request):
-    clientes = Cliente.objects.filter(estado=True)
-    serializer = ClienteSerializer(clientes, many=True)
+    campos = leer_campos(request, ClienteSerializer)
+    clientes = optimizar(Cliente.objects.select_related('usuario').filter(estado=True), ClienteSerializer, campos)
+    pagina = paginar(request, clientes, ClienteSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = ClienteSerializer(clientes, many=True, campos=campos)
     return Response(serializer.data)
 
 
 # GET /api/clientes/todos/ - Listar todos los clientes, activos e inactivos (PROTEGIDA)
 @api_view(['GET'])
 def listar_todos_clientes(request):
-    clientes = Cliente.objects.all()
-    serializer = ClienteSerializer(clientes, many=True)
+    campos = leer_campos(request, ClienteSerializer)
+    clientes = optimizar(Cliente.objects.select_related('usuario'), ClienteSerializer, campos)
+    pagina = paginar(request, clientes, ClienteSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = ClienteSerializer(clientes, many=True, campos=campos)
     return Response(serializer.data)
 
 
+# GET /api/clientes/exportar/?formato=csv|ndjson - Exportar todos los clientes (PROTEGIDA)
+@api_view(['GET'])
+def exportar_clientes(request):
+    columnas = [
+        ('id', 'id'),
+        ('usuario', 'usuario_id'),
+        ('usuario_username', 'usuario__username'),
+        ('usuario_correo', 'usuario__correo'),
+        ('nombre_completo', 'nombre_completo'),
+        ('telefono', 'telefono'),
+        ('direccion', 'direccion'),
+        ('ci', 'ci'),
+        ('fecha_registro', 'fecha_registro'),
+        ('estado', 'estado'),
+    ]
+    return exportar(request, Cliente.objects.order_by('id'), columnas, 'clientes')
+
+
 # GET /api/clientes/{id}/ - Obtener cliente específico (PROTEGIDA)
 @api_view(['GET'])
 def obtener_cliente(request, pk):
+    campos = leer_campos(request, ClienteSerializer)
     try:
-        cliente = Cliente.objects.get(pk=pk, estado=True)
-        serializer = ClienteSerializer(cliente)
+        cliente = optimizar(Cliente.objects.select_related('usuario'), ClienteSerializer, campos).get(pk=pk, estado=True)
+        serializer = ClienteSerializer(cliente, campos=campos)
         return Response(serializer.data)
     except Cliente.DoesNotExist:
         return Response({'error': 'Cliente no encontrado o inactivo'}, status=status.HTTP_404_NOT_FOUND)
@@ -2,8 +2,9 @@ from rest_framework import serializers
 from django.db import transaction
 from .models import Empleado
 from Usuarios.models import Usuario
+from Api_2doParcial.campos import CamposDinamicosMixin
 
-class EmpleadoSerializer(serializers.ModelSerializer):
+class EmpleadoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_username = serializers.CharField(source='usuario.username', read_only=True)
     usuario_correo = serializers.CharField(source='usuario.correo', read_only=True)
     username = serializers.CharField(write_only=True, required=True)  # Nuevo campo para buscar usuario
@@ -1,3 +1,39 @@
+import csv
+import io
+import json
 from django.test import TestCase
+from django.urls import reverse
+from Usuarios.models import Usuario
+from .models import Empleado
 
-# Create your tests here.
+
+class ExportacionEmpleadosTest(TestCase):
+    """Exportación en streaming de empleados activos e inactivos, por id"""
+
+    def setUp(self):
+        self.empleados = [
+            Empleado.objects.create(
+                usuario=Usuario.objects.create(
+                    username=f'empleado{i}', correo=f'empleado{i}@example.com', password='secreta', tipo_usuario='vendedor'
+                ),
+                nombre_completo=f'Empleado {i}', telefono='70000000', ci=f'456{i}', rol='vendedor',
+                direccion='Av. Banzer', salario='3500.00' if i == 0 else None
+            )
+            for i in range(2)
+        ]
+
+    def test_csv_y_ndjson(self):
+        response = self.client.get(reverse('exportar-empleados'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="empleados.csv"')
+        filas = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual([int(fila['id']) for fila in filas], [empleado.id for empleado in self.empleados])
+        self.assertEqual([fila['salario'] for fila in filas], ['3500.00', ''])
+
+        response = self.client.get(reverse('exportar-empleados'), {'formato': 'ndjson'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="empleados.ndjson"')
+        filas = [json.loads(linea) for linea in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([fila['salario'] for fila in filas], ['3500.00', None])
+        self.assertEqual(filas[0]['usuario_username'], 'empleado0')
+
+        self.assertEqual(self.client.get(reverse('exportar-empleados'), {'formato': 'pdf'}).status_code, 400)
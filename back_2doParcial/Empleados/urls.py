@@ -6,6 +6,7 @@ urlpatterns = [
     # Listar
     path('empleados/', views.listar_empleados, name='listar-empleados'),
     path('empleados/todos/', views.listar_todos_empleados, name='listar-todos-empleados'),
+    path('empleados/exportar/', views.exportar_empleados, name='exportar-empleados'),
     
     # Crear
     path('empleados/crear/', views.crear_empleado, name='crear-empleado'),
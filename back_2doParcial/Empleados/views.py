@@ -4,13 +4,20 @@ from rest_framework import status
 from django.db import transaction
 from .models import Empleado
 from .serializers import EmpleadoSerializer, EmpleadoCreateSerializer
+from Api_2doParcial.paginacion import paginar
+from Api_2doParcial.exportacion import exportar
+from Api_2doParcial.campos import leer_campos, optimizar
 
 # GET /api/empleados/ - Listar empleados activos (PROTEGIDA)
 @api_view(['GET'])
 def listar_empleados(request):
     """Listar solo empleados activos"""
-    empleados = Empleado.objects.filter(estado=True)
-    serializer = EmpleadoSerializer(empleados, many=True)
+    campos = leer_campos(request, EmpleadoSerializer)
+    empleados = optimizar(Empleado.objects.select_related('usuario').filter(estado=True), EmpleadoSerializer, campos)
+    pagina = paginar(request, empleados, EmpleadoSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = EmpleadoSerializer(empleados, many=True, campos=campos)
     return Response(serializer.data)
 
 
@@ -18,11 +25,35 @@ def listar_empleados(request):
 @api_view(['GET'])
 def listar_todos_empleados(request):
     """Listar todos los empleados (activos e inactivos)"""
-    empleados = Empleado.objects.all()
-    serializer = EmpleadoSerializer(empleados, many=True)
+    campos = leer_campos(request, EmpleadoSerializer)
+    empleados = optimizar(Empleado.objects.select_related('usuario'), EmpleadoSerializer, campos)
+    pagina = paginar(request, empleados, EmpleadoSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = EmpleadoSerializer(empleados, many=True, campos=campos)
     return Response(serializer.data)
 
 
+# GET /api/empleados/exportar/?formato=csv|ndjson - Exportar todos los empleados (PROTEGIDA)
+@api_view(['GET'])
+def exportar_empleados(request):
+    columnas = [
+        ('id', 'id'),
+        ('usuario', 'usuario_id'),
+        ('usuario_username', 'usuario__username'),
+        ('usuario_correo', 'usuario__correo'),
+        ('nombre_completo', 'nombre_completo'),
+        ('telefono', 'telefono'),
+        ('ci', 'ci'),
+        ('rol', 'rol'),
+        ('direccion', 'direccion'),
+        ('fecha_contratacion', 'fecha_contratacion'),
+        ('salario', 'salario'),
+        ('estado', 'estado'),
+    ]
+    return exportar(request, Empleado.objects.order_by('id'), columnas, 'empleados')
+
+
 # POST /api/empleados/ - Crear empleado con usuario (PROTEGIDA) - CON TRANSACCIÓN
 @api_view(['POST'])
 def crear_empleado(request):
@@ -65,9 +96,10 @@ def crear_empleado_simple(request):
 # GET /api/empleados/{id}/ - Obtener empleado específico (PROTEGIDA)
 @api_view(['GET'])
 def obtener_empleado(request, pk):
+    campos = leer_campos(request, EmpleadoSerializer)
     try:
-        empleado = Empleado.objects.get(pk=pk, estado=True)
-        serializer = EmpleadoSerializer(empleado)
+        empleado = optimizar(Empleado.objects.select_related('usuario'), EmpleadoSerializer, campos).get(pk=pk, estado=True)
+        serializer = EmpleadoSerializer(empleado, campos=campos)
         return Response(serializer.data)
     except Empleado.DoesNotExist:
         return Response(
@@ -164,6 +196,7 @@ def buscar_empleado_por_ci(request):
 # GET /api/empleados/rol/{rol}/ - Listar por rol (PROTEGIDA)
 @api_view(['GET'])
 def listar_empleados_por_rol(request, rol):
-    empleados = Empleado.objects.filter(rol=rol, estado=True)
-    serializer = EmpleadoSerializer(empleados, many=True)
+    campos = leer_campos(request, EmpleadoSerializer)
+    empleados = optimizar(Empleado.objects.select_related('usuario').filter(rol=rol, estado=True), EmpleadoSerializer, campos)
+    serializer = EmpleadoSerializer(empleados, many=True, campos=campos)
     return Response(serializer.data)
\ No newline at end of file
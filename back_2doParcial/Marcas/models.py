@@ -2,6 +2,7 @@ from django.db import models
 
 class Marca(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, null=True)
     estado = models.BooleanField(default=True)
     
     class Meta:
@@ -3,9 +3,13 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Marca
 from .serializers import MarcaSerializer
+from Api_2doParcial.cache import cache_catalogo
+from Api_2doParcial.condicional import condicional, version
 
 # GET /api/marcas/ - Listar marcas activas
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def listar_marcas(request):
     """Listar solo marcas activas"""
     marcas = Marca.objects.filter(estado=True)
@@ -24,6 +28,7 @@ def listar_todas_marcas(request):
 
 # GET /api/marcas/{id}/ - Obtener marca específica
 @api_view(['GET'])
+@condicional(lambda request, pk: version(Marca.objects.filter(pk=pk, estado=True), 'fecha_actualizacion'))
 def obtener_marca(request, pk):
     try:
         marca = Marca.objects.get(pk=pk, estado=True)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PermisosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Permisos'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from .matriz import invalidar_permiso
+        from .models import Permiso
+        post_save.connect(invalidar_permiso, sender=Permiso, dispatch_uid='matriz_permisos_save')
+        post_delete.connect(invalidar_permiso, sender=Permiso, dispatch_uid='matriz_permisos_delete')
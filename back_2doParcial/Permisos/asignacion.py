@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db import transaction
+from Usuarios.models import Usuario
+from .matriz import ACCIONES, matriz
+from .models import Permiso
+
+
+def permisos_de(usuario_id):
+    """
+    Filas de Permiso de un usuario como [{'vista', 'ver', 'crear', 'editar',
+    'eliminar'}]. Lanza ValueError si el usuario no existe.
+    """
+    if not Usuario.objects.filter(pk=usuario_id).exists():
+        raise ValueError(f'El usuario origen {usuario_id} no existe')
+    return list(Permiso.objects.filter(usuario_id=usuario_id).order_by('vista').values('vista', *ACCIONES))
+
+
+@transaction.atomic
+def asignar(usuario_ids, permisos, reemplazar=False):
+    """
+    Deja los `permisos` ([{'vista', 'ver', 'crear', 'editar', 'eliminar'}])
+    a cada uno de los usuarios: un INSERT ... ON CONFLICT (usuario_id, vista)
+    DO UPDATE por lote de PERMISOS_LOTE filas. Con `reemplazar` también
+    borra las vistas de esos usuarios que no están en `permisos`.
+
+    Devuelve {'usuarios', 'vistas', 'asignados', 'eliminados'}.
+    Lanza ValueError si algún usuario no existe o si son más de
+    PERMISOS_MAX_ASIGNACION celdas.
+    """
+    if len(usuario_ids) * len(permisos) > settings.PERMISOS_MAX_ASIGNACION:
+        raise ValueError(
+            f'Se pueden asignar como máximo {settings.PERMISOS_MAX_ASIGNACION} permisos (usuarios x vistas) por petición'
+        )
+    existentes = set(Usuario.objects.filter(pk__in=usuario_ids).values_list('pk', flat=True))
+    faltantes = sorted(set(usuario_ids) - existentes)
+    if faltantes:
+        raise ValueError('Usuarios que no existen: ' + ', '.join(str(pk) for pk in faltantes))
+
+    filas = [
+        Permiso(usuario_id=usuario_id, **permiso)
+        for usuario_id in usuario_ids
+        for permiso in permisos
+    ]
+    if filas:
+        Permiso.objects.bulk_create(
+            filas, batch_size=settings.PERMISOS_LOTE, update_conflicts=True,
+            unique_fields=['usuario', 'vista'], update_fields=list(ACCIONES)
+        )
+
+    eliminados = 0
+    if reemplazar:
+        eliminados, _ = Permiso.objects.filter(usuario_id__in=usuario_ids).exclude(
+            vista__in=[permiso['vista'] for permiso in permisos]
+        ).delete()
+
+    # bulk_create no envía post_save (ver matriz.py)
+    matriz.invalidar(usuario_ids)
+    transaction.on_commit(lambda: matriz.invalidar(usuario_ids))
+    return {
+        'usuarios': len(usuario_ids),
+        'vistas': len(permisos),
+        'asignados': len(filas),
+        'eliminados': eliminados,
+    }
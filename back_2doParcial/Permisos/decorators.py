@@ -0,0 +1,66 @@
+from functools import wraps
+from rest_framework import status
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from Usuarios.decorators import jwt_required
+from .matriz import ACCION_POR_METODO, ACCIONES, matriz
+
+
+def _accion(request, accion):
+    return accion or ACCION_POR_METODO.get(request.method, 'ver')
+
+
+def permiso_requerido(vista, accion=None):
+    """
+    Decorador para vistas: exige token (jwt_required) y que el usuario
+    tenga la acción en la vista según sus filas de Permiso. Sin `accion`
+    se deduce del método: GET ver, POST crear, PUT/PATCH editar, DELETE
+    eliminar. Va debajo de @api_view:
+
+        @api_view(['PUT'])
+        @permiso_requerido('productos')
+        def actualizar_producto(request, pk): ...
+    """
+    if accion is not None and accion not in ACCIONES:
+        raise ValueError(f'Acción desconocida: {accion}')
+
+    def decorador(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            nombre = _accion(request, accion)
+            if not matriz.permite(request.user.id, vista, nombre):
+                return Response(
+                    {'error': f'Sin permiso para {nombre} en {vista}'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            return view_func(request, *args, **kwargs)
+
+        return jwt_required(wrapper)
+
+    return decorador
+
+
+def permiso_vista(vista, accion=None):
+    """
+    Clase de permiso de DRF con la misma regla que permiso_requerido, para
+    usar junto a JWTAutenticacion:
+
+        @api_view(['GET'])
+        @authentication_classes([JWTAutenticacion])
+        @permission_classes([permiso_vista('reportes')])
+        def reporte_ventas(request): ...
+    """
+    if accion is not None and accion not in ACCIONES:
+        raise ValueError(f'Acción desconocida: {accion}')
+
+    class PermisoVista(BasePermission):
+        message = f'Sin permiso en {vista}'
+
+        def has_permission(self, request, view):
+            usuario = request.user
+            if not getattr(usuario, 'is_authenticated', False):
+                return False
+            return matriz.permite(usuario.id, vista, _accion(request, accion))
+
+    PermisoVista.__name__ = PermisoVista.__qualname__ = f'PermisoVista_{vista}'
+    return PermisoVista
@@ -0,0 +1,131 @@
+import threading
+from django.conf import settings
+from django.db import transaction
+from Api_2doParcial.cache import CacheLRU
+from .models import Permiso
+
+# Permisos compilados: por usuario, {vista: máscara de bits} en memoria del
+# proceso.
+#
+# Cada fila de Permiso se reduce a un entero (ver=1, crear=2, editar=4,
+# eliminar=8), así que verificar un acceso es buscar la vista en un dict y
+# hacer un AND, sin consulta mientras el usuario esté en la cache. Las
+# escrituras de Permiso (señales) suben la versión del usuario y la entrada
+# compilada con la versión anterior deja de valer; en los demás procesos
+# vence a los PERMISOS_CACHE_TTL segundos.
+#
+# QuerySet.update(), bulk_create() y bulk_update() no envían señales: quien
+# los use debe llamar a matriz.invalidar(usuario_ids) al terminar.
+
+VER, CREAR, EDITAR, ELIMINAR = 1, 2, 4, 8
+ACCIONES = {'ver': VER, 'crear': CREAR, 'editar': EDITAR, 'eliminar': ELIMINAR}
+ACCION_POR_METODO = {
+    'GET': 'ver', 'HEAD': 'ver', 'OPTIONS': 'ver',
+    'POST': 'crear', 'PUT': 'editar', 'PATCH': 'editar', 'DELETE': 'eliminar',
+}
+COLUMNAS = ('usuario_id', 'vista', *ACCIONES)
+
+
+def mascara(ver=False, crear=False, editar=False, eliminar=False):
+    """Máscara de bits de una fila de Permiso"""
+    return (VER if ver else 0) | (CREAR if crear else 0) | (EDITAR if editar else 0) | (ELIMINAR if eliminar else 0)
+
+
+class MatrizPermisos:
+    """
+    Cache por proceso de los permisos compilados. Las entradas se guardan
+    con la versión (global, del usuario) leída antes de consultar: si una
+    escritura invalida al usuario mientras se compila, la compilación vieja
+    no se guarda ni se vuelve a servir.
+    """
+
+    def __init__(self, max_usuarios, ttl):
+        self.cache = CacheLRU(max_usuarios)
+        self.ttl = ttl
+        self.compilaciones = 0
+        self._global = 0
+        self._versiones = {}
+        self._lock = threading.Lock()
+
+    def _version(self, usuario_id):
+        return self._global, self._versiones.get(usuario_id, 0)
+
+    def invalidar(self, usuario_ids=None):
+        """Invalida a los usuarios dados, o a todos sin argumentos"""
+        with self._lock:
+            if usuario_ids is None:
+                self._global += 1
+                self.cache.incr_version('permisos')
+                return
+            for usuario_id in usuario_ids:
+                self._versiones[usuario_id] = self._versiones.get(usuario_id, 0) + 1
+                self.cache.delete(usuario_id)
+
+    def compilar(self, usuario_ids=None):
+        """
+        {usuario_id: {vista: máscara}} de los usuarios dados (todos los que
+        tienen permisos sin argumentos) en una consulta, y lo guarda en la cache.
+        """
+        with self._lock:
+            global_antes, versiones = self._global, dict(self._versiones)
+        filas = Permiso.objects.values_list(*COLUMNAS)
+        compilados = {}
+        if usuario_ids is not None:
+            compilados = {usuario_id: {} for usuario_id in usuario_ids}
+            filas = filas.filter(usuario_id__in=list(compilados))
+        for usuario_id, vista, ver, crear, editar, eliminar in filas:
+            compilados.setdefault(usuario_id, {})[vista] = mascara(ver, crear, editar, eliminar)
+        self.compilaciones += 1
+
+        if self.ttl > 0:
+            with self._lock:
+                for usuario_id, mascaras in compilados.items():
+                    version = (global_antes, versiones.get(usuario_id, 0))
+                    if version == self._version(usuario_id):
+                        self.cache.set(usuario_id, (version, mascaras), self.ttl)
+        return compilados
+
+    def mascaras(self, usuario_id):
+        """{vista: máscara} de un usuario ({} si no tiene permisos)"""
+        entrada = self.cache.get(usuario_id)
+        if entrada is not None and entrada[0] == self._version(usuario_id):
+            return entrada[1]
+        return self.compilar([usuario_id])[usuario_id]
+
+    def permite(self, usuario_id, vista, accion):
+        """True si el usuario tiene la acción ('ver', 'crear', 'editar' o 'eliminar') en la vista"""
+        return bool(self.mascaras(usuario_id).get(vista, 0) & ACCIONES[accion])
+
+    def matriz(self, usuario_ids=None):
+        """
+        Permisos compilados de varios usuarios: los que están en la cache
+        salen de ella y el resto se compila en una sola consulta. Sin
+        argumentos compila a todos los usuarios con permisos.
+        """
+        if usuario_ids is None:
+            return self.compilar()
+        resultado, faltantes = {}, []
+        for usuario_id in usuario_ids:
+            entrada = self.cache.get(usuario_id)
+            if entrada is not None and entrada[0] == self._version(usuario_id):
+                resultado[usuario_id] = entrada[1]
+            else:
+                faltantes.append(usuario_id)
+        if faltantes:
+            resultado.update(self.compilar(faltantes))
+        return {usuario_id: resultado[usuario_id] for usuario_id in usuario_ids}
+
+
+matriz = MatrizPermisos(
+    getattr(settings, 'PERMISOS_CACHE_MAX', 10_000), getattr(settings, 'PERMISOS_CACHE_TTL', 60)
+)
+
+
+def invalidar_permiso(sender=None, instance=None, **kwargs):
+    """Receptor de post_save/post_delete de Permiso: invalida al usuario (y al anterior si cambió)"""
+    usuario_ids = {instance.usuario_id, getattr(instance, '_usuario_id_original', None)} - {None}
+    matriz.invalidar(usuario_ids)
+    instance._usuario_id_original = instance.usuario_id
+    # Otra petición pudo compilar las filas anteriores antes del commit
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: matriz.invalidar(usuario_ids))
@@ -14,5 +14,12 @@ class Permiso(models.Model):
         unique_together = ('usuario', 'vista')  # opcional: evita duplicados por vista
         ordering = ['id']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Si un PUT cambia el usuario, hay que recompilar también al anterior (ver matriz.py)
+        instancia._usuario_id_original = instancia.__dict__.get('usuario_id')
+        return instancia
+
     def __str__(self):
         return f"{self.usuario.username} - {self.vista}"
@@ -16,3 +16,39 @@ class PermisoSerializer(serializers.ModelSerializer):
             'eliminar',
             'ver'
         ]
+
+
+class PermisoVistaSerializer(serializers.Serializer):
+    """Una columna de la matriz: la vista y sus acciones (mismos defaults que el modelo)"""
+    vista = serializers.CharField(max_length=50)
+    crear = serializers.BooleanField(default=False)
+    editar = serializers.BooleanField(default=False)
+    eliminar = serializers.BooleanField(default=False)
+    ver = serializers.BooleanField(default=True)
+
+
+class AsignacionMasivaSerializer(serializers.Serializer):
+    """
+    Los `usuarios` reciben los `permisos` dados o una copia de los del
+    usuario `origen` (uno de los dos).
+    """
+    usuarios = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    permisos = PermisoVistaSerializer(many=True, required=False)
+    origen = serializers.IntegerField(min_value=1, required=False)
+    reemplazar = serializers.BooleanField(default=False)
+
+    def validate_usuarios(self, value):
+        return list(dict.fromkeys(value))
+
+    def validate_permisos(self, value):
+        vistas = [permiso['vista'] for permiso in value]
+        if len(set(vistas)) < len(vistas):
+            raise serializers.ValidationError('Cada vista puede aparecer una sola vez')
+        return value
+
+    def validate(self, data):
+        if ('permisos' in data) == ('origen' in data):
+            raise serializers.ValidationError('Envíe permisos o un usuario origen, no ambos')
+        if data.get('origen') in data['usuarios']:
+            raise serializers.ValidationError('El usuario origen no puede estar entre los usuarios destino')
+        return data
@@ -1,3 +1,211 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+from Usuarios.autenticacion import JWTAutenticacion
+from Usuarios.jwt_utils import generate_token
+from Usuarios.models import Usuario
+from .decorators import permiso_requerido, permiso_vista
+from .matriz import CREAR, EDITAR, ELIMINAR, VER, matriz
+from .models import Permiso
 
-# Create your tests here.
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permiso_requerido('clientes')
+def vista_clientes(request):
+    return Response({'ok': True})
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAutenticacion])
+@permission_classes([permiso_vista('reportes')])
+def vista_reportes(request):
+    return Response({'ok': True})
+
+
+class MatrizPermisosTest(TestCase):
+    """Permisos compilados a máscaras por usuario, cacheados e invalidados al escribir"""
+
+    def setUp(self):
+        matriz.invalidar()
+        self.vendedor = Usuario.objects.create(
+            username='vendedor', correo='vendedor@example.com', password='secreta', tipo_usuario='vendedor'
+        )
+        self.cajero = Usuario.objects.create(
+            username='cajero', correo='cajero@example.com', password='secreta', tipo_usuario='cajero'
+        )
+        self.permiso = Permiso.objects.create(usuario=self.vendedor, vista='clientes', crear=True)
+        Permiso.objects.create(usuario=self.vendedor, vista='reportes', ver=False)
+        self.admin = Usuario.objects.create(
+            username='admin', correo='admin@example.com', password='secreta', tipo_usuario='administrador'
+        )
+        Permiso.objects.create(usuario=self.admin, vista='permisos', ver=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {generate_token(self.admin)}'}
+        self.factory = RequestFactory()
+
+    def pedir(self, vista, metodo='get', usuario=None):
+        token = generate_token(usuario or self.vendedor)
+        request = getattr(self.factory, metodo)('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return vista(request).status_code
+
+    def test_compilacion_y_cache(self):
+        self.assertEqual(matriz.mascaras(self.vendedor.id), {'clientes': VER | CREAR, 'reportes': 0})
+        self.assertEqual(matriz.mascaras(self.cajero.id), {})
+        with self.assertNumQueries(0):
+            self.assertTrue(matriz.permite(self.vendedor.id, 'clientes', 'crear'))
+            self.assertFalse(matriz.permite(self.vendedor.id, 'clientes', 'eliminar'))
+            self.assertFalse(matriz.permite(self.cajero.id, 'clientes', 'ver'))
+
+    def test_escrituras_invalidan(self):
+        self.assertFalse(matriz.permite(self.vendedor.id, 'clientes', 'eliminar'))
+        self.permiso.eliminar = True
+        self.permiso.save()
+        self.assertTrue(matriz.permite(self.vendedor.id, 'clientes', 'eliminar'))
+
+        # Pasar la fila a otro usuario recompila a los dos
+        self.assertFalse(matriz.permite(self.cajero.id, 'clientes', 'ver'))
+        response = self.client.put(
+            reverse('actualizar-permiso', args=[self.permiso.pk]), {'usuario': self.cajero.id},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(matriz.mascaras(self.cajero.id), {'clientes': VER | CREAR | ELIMINAR})
+        self.assertNotIn('clientes', matriz.mascaras(self.vendedor.id))
+
+        Permiso.objects.get(pk=self.permiso.pk).delete()
+        self.assertEqual(matriz.mascaras(self.cajero.id), {})
+
+    def test_decorador(self):
+        self.assertEqual(vista_clientes(self.factory.get('/')).status_code, 401)
+        self.assertEqual(self.pedir(vista_clientes), 200)
+        self.assertEqual(self.pedir(vista_clientes, 'post'), 200)
+        self.assertEqual(self.pedir(vista_clientes, 'delete'), 403)
+        self.assertEqual(self.pedir(vista_clientes, usuario=self.cajero), 403)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.pedir(vista_clientes), 200)
+
+    def test_clase_drf(self):
+        self.assertIn(vista_reportes(self.factory.get('/')).status_code, (401, 403))
+        self.assertEqual(self.pedir(vista_reportes), 403)
+        Permiso.objects.filter(vista='reportes').first().delete()
+        Permiso.objects.create(usuario=self.vendedor, vista='reportes', ver=True)
+        self.assertEqual(self.pedir(vista_reportes), 200)
+
+    def test_endpoint_matriz(self):
+        response = self.client.get(reverse('matriz-permisos'), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['acciones'], {'ver': VER, 'crear': CREAR, 'editar': EDITAR, 'eliminar': ELIMINAR})
+        self.assertEqual(response.data['usuarios'][self.vendedor.id], {'clientes': 3, 'reportes': 0})
+        self.assertNotIn(self.cajero.id, response.data['usuarios'])
+
+        # Los usuarios pedidos salen de la cache sin consultar
+        matriz.mascaras(self.cajero.id)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('matriz-permisos'), {'usuarios': f'{self.cajero.id},{self.vendedor.id}'}, **self.headers
+            )
+        self.assertEqual(list(response.data['usuarios']), [self.cajero.id, self.vendedor.id])
+        self.assertEqual(response.data['usuarios'][self.cajero.id], {})
+
+        # '²' pasa isdigit() pero int() lo rechaza
+        for usuarios in ('x', '²', f'{self.vendedor.id},²', '-1'):
+            response = self.client.get(reverse('matriz-permisos'), {'usuarios': usuarios}, **self.headers)
+            self.assertEqual(response.status_code, 400)
+
+    def test_endpoint_matriz_protegido(self):
+        self.assertEqual(self.client.get(reverse('matriz-permisos')).status_code, 401)
+        token = generate_token(self.vendedor)
+        response = self.client.get(reverse('matriz-permisos'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+
+class AsignacionMasivaTest(TestCase):
+    """Matriz usuarios x vistas (o copia de un usuario) con un upsert por lote"""
+
+    def setUp(self):
+        matriz.invalidar()
+        self.usuarios = [
+            Usuario.objects.create(
+                username=f'empleado{i}', correo=f'empleado{i}@example.com', password='secreta', tipo_usuario='vendedor'
+            )
+            for i in range(4)
+        ]
+        self.ids = [usuario.id for usuario in self.usuarios]
+        Permiso.objects.create(usuario=self.usuarios[0], vista='clientes', ver=True)
+        Permiso.objects.create(usuario=self.usuarios[0], vista='bitacora', ver=True)
+        self.admin = Usuario.objects.create(
+            username='admin', correo='admin@example.com', password='secreta', tipo_usuario='administrador'
+        )
+        Permiso.objects.create(usuario=self.admin, vista='permisos', editar=True)
+
+    def asignar(self, datos, usuario=None):
+        token = generate_token(usuario or self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('asignar-permisos'), datos, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {token}'
+            )
+
+    def test_matriz_en_un_insert(self):
+        self.assertFalse(matriz.permite(self.ids[0], 'clientes', 'editar'))
+        permisos = [
+            {'vista': 'clientes', 'crear': True, 'editar': True},
+            {'vista': 'productos', 'ver': True},
+            {'vista': 'reportes', 'ver': False},
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.asignar({'usuarios': self.ids, 'permisos': permisos})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {k: response.data[k] for k in ('usuarios', 'vistas', 'asignados', 'eliminados')},
+            {'usuarios': 4, 'vistas': 3, 'asignados': 12, 'eliminados': 0}
+        )
+        inserts = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('ON CONFLICT', inserts[0])
+
+        # La fila existente se actualizó en el lugar y la que no estaba en la matriz sigue
+        self.assertEqual(Permiso.objects.filter(usuario_id__in=self.ids).count(), 13)
+        self.assertEqual(response.data['matriz'][self.ids[0]], {'clientes': 7, 'productos': 1, 'reportes': 0, 'bitacora': 1})
+        self.assertTrue(matriz.permite(self.ids[3], 'clientes', 'editar'))
+
+    @override_settings(PERMISOS_LOTE=5)
+    def test_lotes(self):
+        permisos = [{'vista': f'vista{i}'} for i in range(3)]
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.asignar({'usuarios': self.ids, 'permisos': permisos}).status_code, 200)
+        self.assertEqual(sum(q['sql'].startswith('INSERT') for q in consultas.captured_queries), 3)
+
+    def test_copiar_y_reemplazar(self):
+        Permiso.objects.create(usuario=self.usuarios[1], vista='ventas', eliminar=True)
+        response = self.asignar({'usuarios': self.ids[1:], 'origen': self.ids[0], 'reemplazar': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['eliminados'], 1)
+        for usuario_id in self.ids[1:]:
+            self.assertEqual(matriz.mascaras(usuario_id), {'clientes': VER, 'bitacora': VER})
+
+    def test_errores(self):
+        casos = [
+            {'usuarios': self.ids + [999999], 'permisos': [{'vista': 'clientes'}]},
+            {'usuarios': self.ids, 'permisos': [{'vista': 'clientes'}], 'origen': self.ids[0]},
+            {'usuarios': self.ids[1:], 'permisos': [{'vista': 'clientes'}, {'vista': 'clientes'}]},
+            {'usuarios': self.ids, 'origen': self.ids[0]},
+            {'usuarios': self.ids[1:], 'origen': 999999},
+            {'usuarios': []},
+        ]
+        for datos in casos:
+            self.assertEqual(self.asignar(datos).status_code, 400, datos)
+        with override_settings(PERMISOS_MAX_ASIGNACION=3):
+            self.assertEqual(self.asignar({'usuarios': self.ids, 'permisos': [{'vista': 'clientes'}]}).status_code, 400)
+        self.assertEqual(Permiso.objects.count(), 3)
+
+    def test_protegido(self):
+        datos = {'usuarios': [self.ids[1]], 'permisos': [{'vista': 'permisos', 'crear': True, 'editar': True}]}
+        response = self.client.post(reverse('asignar-permisos'), datos, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        # Ver la vista 'permisos' no alcanza para asignar
+        Permiso.objects.create(usuario=self.usuarios[1], vista='permisos', ver=True)
+        self.assertEqual(self.asignar(datos, self.usuarios[1]).status_code, 403)
+        self.assertFalse(Permiso.objects.filter(usuario=self.usuarios[1], vista='permisos', editar=True).exists())
@@ -1,14 +1,21 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from .asignacion import asignar, permisos_de
+from .decorators import permiso_requerido
+from .matriz import ACCIONES, matriz
 from .models import Permiso
-from .serializers import PermisoSerializer
+from .serializers import AsignacionMasivaSerializer, PermisoSerializer
+from Api_2doParcial.paginacion import paginar
 
 
 # GET /api/permisos/ - Listar todos los permisos (PROTEGIDA)
 @api_view(['GET'])
 def listar_permisos(request):
-    permisos = Permiso.objects.all()
+    permisos = Permiso.objects.select_related('usuario')
+    pagina = paginar(request, permisos, PermisoSerializer)
+    if pagina is not None:
+        return pagina
     serializer = PermisoSerializer(permisos, many=True)
     return Response(serializer.data)
 
@@ -66,3 +73,50 @@ def eliminar_permiso(request, pk):
         return Response({'message': 'Permiso eliminado correctamente'}, status=status.HTTP_200_OK)
     except Permiso.DoesNotExist:
         return Response({'error': 'Permiso no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+
+# GET /api/permisos/matriz/?usuarios=2,5 - Permisos compilados de todos los usuarios (o de los dados) en una llamada (PROTEGIDA)
+@api_view(['GET'])
+@permiso_requerido('permisos', 'ver')
+def matriz_permisos(request):
+    """
+    {usuario_id: {vista: máscara}} desde la cache de matriz.py; cada máscara
+    combina los bits de 'acciones'. Sin ?usuarios trae a todos los que
+    tienen permisos; los usuarios pedidos sin permisos vienen con {}.
+    """
+    usuarios = request.query_params.get('usuarios')
+    if usuarios is None:
+        compilados = matriz.matriz()
+    else:
+        ids = [parte.strip() for parte in usuarios.split(',') if parte.strip()]
+        if not ids or not all(parte.isdecimal() for parte in ids):
+            return Response(
+                {'error': 'usuarios debe ser una lista de ids numéricos separados por coma'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compilados = matriz.matriz(list(dict.fromkeys(int(pk) for pk in ids)))
+    return Response({'acciones': ACCIONES, 'usuarios': compilados})
+
+
+# POST /api/permisos/asignar/ - Asignar una matriz de permisos (o copiar los de un usuario) a varios usuarios (PROTEGIDA)
+@api_view(['POST'])
+@permiso_requerido('permisos', 'editar')
+def asignar_permisos(request):
+    """
+    Crea o actualiza (usuario, vista) para cada usuario y vista pedidos en
+    una transacción, con un INSERT ... ON CONFLICT por lote. Con
+    "reemplazar": true los usuarios quedan solo con esas vistas.
+    """
+    serializer = AsignacionMasivaSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    datos = serializer.validated_data
+    try:
+        permisos = datos['permisos'] if 'permisos' in datos else permisos_de(datos['origen'])
+        resultado = asignar(datos['usuarios'], permisos, datos['reemplazar'])
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    resultado['matriz'] = matriz.matriz(datos['usuarios'])
+    return Response(resultado)
@@ -0,0 +1,109 @@
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+# Alertas de stock: una fila en alertas_stock (modelo AlertaStock) por cada
+# inventario activo con cantidad <= punto_reorden.
+#
+# Un trigger por sentencia sobre inventario recalcula solo las filas que
+# estaban o quedaron bajo su punto de reorden, así que los cambios de stock
+# normales (lejos del umbral) no escriben nada y la consulta de alertas lee
+# una tabla del tamaño del problema, no del catálogo. Los inventarios
+# fraccionados entran cuando se refresca su total cacheado (fracciones.py).
+SQL_ALERTAS = [
+    """
+    CREATE OR REPLACE FUNCTION alertas_stock_refrescar(ids bigint[]) RETURNS void AS $$
+    BEGIN
+        IF cardinality(ids) = 0 THEN
+            RETURN;
+        END IF;
+
+        DELETE FROM alertas_stock a
+        WHERE a.inventario_id = ANY(ids)
+          AND NOT EXISTS (
+              SELECT 1 FROM inventario i
+              WHERE i.id = a.inventario_id AND i.estado AND i.cantidad <= i.punto_reorden
+          );
+
+        -- fecha se conserva mientras el producto siga bajo el umbral
+        INSERT INTO alertas_stock (inventario_id, producto_id, ubicacion, cantidad, punto_reorden, fecha)
+        SELECT i.id, i.producto_id, i.ubicacion, i.cantidad, i.punto_reorden, now()
+        FROM inventario i
+        WHERE i.id = ANY(ids) AND i.estado AND i.cantidad <= i.punto_reorden
+        ON CONFLICT (inventario_id) DO UPDATE SET
+            producto_id = EXCLUDED.producto_id,
+            ubicacion = EXCLUDED.ubicacion,
+            cantidad = EXCLUDED.cantidad,
+            punto_reorden = EXCLUDED.punto_reorden;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION alertas_por_inventario() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM alertas_stock_refrescar(ARRAY(
+                SELECT id FROM nuevos WHERE estado AND cantidad <= punto_reorden
+            ));
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM alertas_stock_refrescar(ARRAY(
+                SELECT n.id FROM nuevos n JOIN anteriores a ON a.id = n.id
+                WHERE (n.estado AND n.cantidad <= n.punto_reorden)
+                   OR (a.estado AND a.cantidad <= a.punto_reorden)
+            ));
+        ELSE
+            DELETE FROM alertas_stock WHERE inventario_id IN (SELECT id FROM anteriores);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+def _sql_triggers():
+    referencias = {
+        'INSERT': 'NEW TABLE AS nuevos',
+        'UPDATE': 'OLD TABLE AS anteriores NEW TABLE AS nuevos',
+        'DELETE': 'OLD TABLE AS anteriores',
+    }
+    for evento, referencia in referencias.items():
+        nombre = f'inventario_alertas_{evento.lower()}_trg'
+        yield f'DROP TRIGGER IF EXISTS {nombre} ON inventario'
+        yield f"""
+            CREATE TRIGGER {nombre}
+                AFTER {evento} ON inventario
+                REFERENCING {referencia}
+                FOR EACH STATEMENT EXECUTE FUNCTION alertas_por_inventario()
+        """
+
+
+def reconstruir_alertas(using=DEFAULT_DB_ALIAS):
+    """Recalcula las alertas completas (carga inicial o reparación); usa el índice parcial de inventario"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute('TRUNCATE alertas_stock')
+        cursor.execute(
+            'SELECT alertas_stock_refrescar(ARRAY('
+            'SELECT id FROM inventario WHERE estado AND cantidad <= punto_reorden))'
+        )
+
+
+def instalar_alertas(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Instala la función y los triggers de alertas y las completa si están
+    vacías. Se ejecuta en post_migrate; todas las sentencias son idempotentes.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        for sentencia in [*SQL_ALERTAS, *_sql_triggers()]:
+            cursor.execute(sentencia)
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM alertas_stock)')
+        vacio = not cursor.fetchone()[0]
+
+    if vacio:
+        reconstruir_alertas(using)
@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Productos'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from Api_2doParcial.cache import cache_catalogo
+        from .busqueda import instalar_busqueda
+        from .catalogo import instalar_catalogo
+        from .kardex import snapshot_inicial
+        from .alertas import instalar_alertas
+        from .atributos import normalizar_especificaciones
+        post_migrate.connect(cache_catalogo.instalar, sender=self)
+        post_migrate.connect(instalar_busqueda, sender=self)
+        post_migrate.connect(instalar_catalogo, sender=self)
+        post_migrate.connect(normalizar_especificaciones, sender=self)
+        post_migrate.connect(snapshot_inicial, sender=self)
+        post_migrate.connect(instalar_alertas, sender=self)
+
+        from . import signals
+        signals.conectar()
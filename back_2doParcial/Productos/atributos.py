@@ -0,0 +1,161 @@
+from functools import reduce
+from operator import or_
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from .models import Especificacion
+from .normalizacion import normalizar, normalizar_atributo
+
+# Filtro y facetas por especificaciones sobre el catálogo (catalogo.py).
+#
+# Cada fila de catalogo_productos trae `atributos` = {clave: [valores]} con
+# las especificaciones normalizadas, indexado con GIN (jsonb_path_ops). Un
+# filtro de varios atributos es una sola contención:
+#
+#     atributos @> '{"ram": ["16gb"], "color": ["negro"]}'
+#
+# y la intersección la resuelve el índice, sin un join a especificaciones
+# por atributo. Los nombres y valores tal como se cargaron salen del índice
+# (clave, valor) de especificaciones.
+
+MAX_FILTROS = 10
+VALORES_POR_ATRIBUTO = 50  # las facetas listan los valores con más productos primero
+LOTE_NORMALIZACION = 2000
+
+
+def leer_atributos(request):
+    """
+    Lee ?esp=RAM:16GB|32GB&esp=Color:Negro como {clave: [valores]}
+    normalizados: `|` es un O dentro del atributo y los atributos se
+    combinan con Y. Lanza ValueError con el mensaje para el cliente.
+    """
+    atributos = {}
+    for filtro in request.query_params.getlist('esp'):
+        nombre, separador, valores = filtro.partition(':')
+        clave = normalizar(nombre)
+        valores = [valor for valor in map(normalizar, valores.split('|')) if valor]
+        if not separador or not clave or not valores:
+            raise ValueError('esp debe tener la forma nombre:valor o nombre:valor1|valor2')
+        existentes = atributos.setdefault(clave, [])
+        existentes.extend(valor for valor in valores if valor not in existentes)
+    if len(atributos) > MAX_FILTROS:
+        raise ValueError(f'esp admite como máximo {MAX_FILTROS} atributos')
+    return atributos
+
+
+def filtrar_atributos(queryset, atributos, excluir=None):
+    """
+    Aplica los filtros de atributos salvo el de la clave `excluir`. Los
+    atributos de un solo valor van juntos en una contención; los de varios
+    valores, en un OR de contenciones (BitmapOr sobre el mismo índice).
+    """
+    unicos = {clave: valores for clave, valores in atributos.items() if clave != excluir and len(valores) == 1}
+    condicion = Q(atributos__contains=unicos) if unicos else Q()
+    for clave, valores in atributos.items():
+        if clave != excluir and len(valores) > 1:
+            condicion &= reduce(or_, (Q(atributos__contains={clave: [valor]}) for valor in valores))
+    return queryset.filter(condicion)
+
+
+def _conteos(cursor, queryset, claves=None, excluidas=()):
+    """(clave, valor, total) de los productos de `queryset`"""
+    sql, parametros = queryset.order_by().values('atributos').query.sql_with_params()
+    condicion, extra = '', []
+    if claves is not None:
+        condicion, extra = 'WHERE a.clave = ANY(%s)', [list(claves)]
+    elif excluidas:
+        condicion, extra = 'WHERE a.clave <> ALL(%s)', [list(excluidas)]
+    cursor.execute(
+        f"""
+        SELECT a.clave, v.valor, count(*)
+        FROM ({sql}) c
+        CROSS JOIN LATERAL jsonb_each(c.atributos) a(clave, valores)
+        CROSS JOIN LATERAL jsonb_array_elements_text(a.valores) v(valor)
+        {condicion}
+        GROUP BY a.clave, v.valor
+        """,
+        [*parametros, *extra]
+    )
+    return cursor.fetchall()
+
+
+def _nombres(cursor, pares):
+    """{(clave, valor): (nombre, descripcion)} con una fila de ejemplo por par"""
+    if not pares:
+        return {}
+    cursor.execute(
+        f"""
+        SELECT t.clave, t.valor, e.nombre, e.descripcion
+        FROM unnest(%s::text[], %s::text[]) t(clave, valor)
+        CROSS JOIN LATERAL (
+            SELECT nombre, descripcion FROM {Especificacion._meta.db_table} e
+            WHERE e.clave = t.clave AND e.valor = t.valor AND e.estado AND e.valor <> ''
+            LIMIT 1
+        ) e
+        """,
+        [[clave for clave, _ in pares], [valor for _, valor in pares]]
+    )
+    return {(clave, valor): (nombre, descripcion) for clave, valor, nombre, descripcion in cursor.fetchall()}
+
+
+def facetas_atributos(queryset, atributos):
+    """
+    Valores de cada atributo con su número de productos. Como en
+    facetas.py, cada atributo filtrado se cuenta con los demás filtros pero
+    no con el suyo, para que el cliente vea las alternativas. Son una
+    consulta por atributo filtrado, una para el resto y una para los nombres.
+    """
+    filas = []
+    with connections[queryset.db].cursor() as cursor:
+        filas.extend(_conteos(cursor, filtrar_atributos(queryset, atributos), excluidas=list(atributos)))
+        for clave in atributos:
+            filas.extend(_conteos(cursor, filtrar_atributos(queryset, atributos, excluir=clave), claves=[clave]))
+
+        por_clave = {}
+        for clave, valor, total in filas:
+            por_clave.setdefault(clave, []).append((valor, total))
+        for valores in por_clave.values():
+            valores.sort(key=lambda par: (-par[1], par[0]))
+            del valores[VALORES_POR_ATRIBUTO:]
+        nombres = _nombres(cursor, [(clave, valor) for clave, valores in por_clave.items() for valor, _ in valores])
+
+    resultado = []
+    for clave in sorted(por_clave):
+        valores = por_clave[clave]
+        nombre = nombres.get((clave, valores[0][0]), (clave, None))[0]
+        resultado.append({
+            'clave': clave,
+            'nombre': nombre,
+            'valores': [
+                {
+                    'valor': valor,
+                    'descripcion': nombres.get((clave, valor), (None, valor))[1],
+                    'total': total,
+                    'seleccionado': valor in atributos.get(clave, ()),
+                }
+                for valor, total in valores
+            ],
+        })
+    return resultado
+
+
+def normalizar_especificaciones(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Completa clave y valor de las especificaciones cargadas antes de que
+    existieran (o por SQL directo), por lotes. Los triggers del catálogo
+    recalculan `atributos` de los productos tocados. Se ejecuta en
+    post_migrate después de instalar_catalogo; devuelve cuántas normalizó.
+    """
+    pendientes = Especificacion.objects.using(using).filter(clave='').exclude(nombre='').order_by('pk')
+    total, desde = 0, 0
+    while True:
+        lote = list(pendientes.filter(pk__gt=desde).only('pk', 'nombre', 'descripcion')[:LOTE_NORMALIZACION])
+        if not lote:
+            return total
+        for especificacion in lote:
+            especificacion.clave, especificacion.valor = normalizar_atributo(
+                especificacion.nombre, especificacion.descripcion
+            )
+        with transaction.atomic(using=using):
+            Especificacion.objects.using(using).bulk_update(lote, ['clave', 'valor'])
+        total += len(lote)
+        desde = lote[-1].pk
@@ -0,0 +1,120 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import F, Q
+
+# Configuración de texto en español que ignora tildes (ver SQL_BUSQUEDA)
+CONFIGURACION = 'es_unaccent'
+
+# El vector de búsqueda se mantiene con triggers en la base de datos:
+# descripción (peso A) > marca (peso B) > categoría (peso C).
+# Los cambios de nombre en marcas y categorías recalculan sus productos.
+SQL_BUSQUEDA = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION productos_busqueda_actualizar() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda :=
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.descripcion, '')), 'A') ||
+            setweight(to_tsvector('es_unaccent', coalesce(
+                (SELECT nombre FROM marcas WHERE id = NEW.marca_id), '')), 'B') ||
+            setweight(to_tsvector('es_unaccent', coalesce(
+                (SELECT descripcion FROM categorias WHERE id = NEW.categoria_id), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS productos_busqueda_trg ON productos",
+    """
+    CREATE TRIGGER productos_busqueda_trg
+        BEFORE INSERT OR UPDATE OF descripcion, marca_id, categoria_id ON productos
+        FOR EACH ROW EXECUTE FUNCTION productos_busqueda_actualizar()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION marcas_busqueda_propagar() RETURNS trigger AS $$
+    BEGIN
+        UPDATE productos SET descripcion = descripcion WHERE marca_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS marcas_busqueda_trg ON marcas",
+    """
+    CREATE TRIGGER marcas_busqueda_trg
+        AFTER UPDATE OF nombre ON marcas
+        FOR EACH ROW WHEN (OLD.nombre IS DISTINCT FROM NEW.nombre)
+        EXECUTE FUNCTION marcas_busqueda_propagar()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION categorias_busqueda_propagar() RETURNS trigger AS $$
+    BEGIN
+        UPDATE productos SET descripcion = descripcion WHERE categoria_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS categorias_busqueda_trg ON categorias",
+    """
+    CREATE TRIGGER categorias_busqueda_trg
+        AFTER UPDATE OF descripcion ON categorias
+        FOR EACH ROW WHEN (OLD.descripcion IS DISTINCT FROM NEW.descripcion)
+        EXECUTE FUNCTION categorias_busqueda_propagar()
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS productos_descripcion_trgm_idx
+        ON productos USING gin (descripcion gin_trgm_ops)
+    """,
+    # Completar el vector de productos que existían antes de instalar el trigger
+    "UPDATE productos SET descripcion = descripcion WHERE busqueda IS NULL",
+]
+
+
+def instalar_busqueda(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Instala extensiones, configuración de texto, triggers e índice trigram.
+    Se ejecuta en post_migrate; todas las sentencias son idempotentes.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        for sentencia in SQL_BUSQUEDA:
+            cursor.execute(sentencia)
+
+
+def _consulta_prefijos(texto):
+    """Convierte el texto en un tsquery de prefijos: 'lapto sams' -> 'lapto:* & sams:*'"""
+    palabras = re.findall(r'\w+', texto)
+    return ' & '.join(f'{palabra}:*' for palabra in palabras)
+
+
+def buscar(queryset, texto):
+    """
+    Filtra y ordena por relevancia un queryset de productos.
+
+    Combina la búsqueda de texto completo (por prefijos, sin tildes) con
+    similitud trigram sobre la descripción para tolerar errores de tipeo.
+    """
+    prefijos = _consulta_prefijos(texto)
+    if not prefijos:
+        return queryset.none()
+
+    consulta = SearchQuery(prefijos, config=CONFIGURACION, search_type='raw')
+    return queryset.filter(
+        Q(busqueda=consulta) | Q(descripcion__trigram_word_similar=texto)
+    ).annotate(
+        relevancia=SearchRank(F('busqueda'), consulta) + TrigramWordSimilarity(texto, 'descripcion')
+    ).order_by('-relevancia', '-id')
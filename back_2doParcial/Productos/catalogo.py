@@ -0,0 +1,223 @@
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+# Modelo de lectura del catálogo: una fila por producto activo en la tabla
+# catalogo_productos (modelo CatalogoProducto), con categoría, marca, stock,
+# imagen principal y especificaciones ya resueltas. `atributos` agrupa las
+# especificaciones filtrables normalizadas por clave (ver atributos.py).
+#
+# Se mantiene con triggers por sentencia sobre productos, inventario,
+# especificaciones, imágenes, categorías y marcas. Cada sentencia recalcula
+# solo los productos que tocó (las tablas de transición traen las filas
+# afectadas), así que un UPDATE con F() o un bulk_create también la
+# actualizan y las lecturas nunca esperan un REFRESH completo.
+SQL_CATALOGO = [
+    """
+    CREATE OR REPLACE FUNCTION catalogo_refrescar(ids bigint[]) RETURNS void AS $$
+    BEGIN
+        IF cardinality(ids) = 0 THEN
+            RETURN;
+        END IF;
+
+        -- Bloquear los productos antes de leerlos: una transacción que cambió
+        -- uno de ellos (o refresca su fila) termina primero, y el INSERT de
+        -- abajo toma su snapshot después y ve ese cambio. Sin esto, una
+        -- especificación nueva podía copiar el precio anterior de una
+        -- edición simultánea sobre la fila ya actualizada. NO KEY UPDATE no
+        -- choca con el FOR KEY SHARE de las FK de las tablas hijas.
+        PERFORM 1 FROM productos WHERE id = ANY(ids) ORDER BY id FOR NO KEY UPDATE;
+
+        DELETE FROM catalogo_productos c
+        WHERE c.id = ANY(ids)
+          AND NOT EXISTS (SELECT 1 FROM productos p WHERE p.id = c.id AND p.estado);
+
+        INSERT INTO catalogo_productos (
+            id, descripcion, precio, categoria_id, nombre_categoria, marca_id, nombre_marca,
+            cantidad, ubicacion, imagen_principal, especificaciones, atributos, fecha_actualizacion
+        )
+        SELECT
+            p.id, p.descripcion, p.precio, p.categoria_id, cat.descripcion, p.marca_id, m.nombre,
+            i.cantidad, i.ubicacion,
+            (SELECT img.imagen FROM imagenes_productos img
+             WHERE img.producto_id = p.id AND img.estado AND img.imagen IS NOT NULL
+             ORDER BY img.es_principal DESC, img.id LIMIT 1),
+            coalesce((SELECT jsonb_agg(jsonb_build_object(
+                          'id', e.id, 'nombre', e.nombre, 'descripcion', e.descripcion
+                      ) ORDER BY e.id)
+                      FROM especificaciones e
+                      WHERE e.producto_id = p.id AND e.estado), '[]'::jsonb),
+            coalesce((SELECT jsonb_object_agg(a.clave, a.valores)
+                      FROM (SELECT e.clave, jsonb_agg(DISTINCT e.valor) AS valores
+                            FROM especificaciones e
+                            WHERE e.producto_id = p.id AND e.estado AND e.clave <> '' AND e.valor <> ''
+                            GROUP BY e.clave) a), '{}'::jsonb),
+            greatest(p.fecha_actualizacion, i.fecha_actualizacion, cat.fecha_actualizacion, m.fecha_actualizacion)
+        FROM productos p
+        JOIN categorias cat ON cat.id = p.categoria_id
+        JOIN marcas m ON m.id = p.marca_id
+        LEFT JOIN inventario i ON i.producto_id = p.id AND i.estado
+        WHERE p.id = ANY(ids) AND p.estado
+        ON CONFLICT (id) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            precio = EXCLUDED.precio,
+            categoria_id = EXCLUDED.categoria_id,
+            nombre_categoria = EXCLUDED.nombre_categoria,
+            marca_id = EXCLUDED.marca_id,
+            nombre_marca = EXCLUDED.nombre_marca,
+            cantidad = EXCLUDED.cantidad,
+            ubicacion = EXCLUDED.ubicacion,
+            imagen_principal = EXCLUDED.imagen_principal,
+            especificaciones = EXCLUDED.especificaciones,
+            atributos = EXCLUDED.atributos,
+            fecha_actualizacion = EXCLUDED.fecha_actualizacion;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # productos: la fila cambiada; hijos: el producto al que pertenecen (antes y después)
+    """
+    CREATE OR REPLACE FUNCTION catalogo_por_producto() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM catalogo_refrescar(ARRAY(SELECT id FROM nuevos));
+        ELSIF TG_OP = 'UPDATE' THEN
+            -- Ignorar updates que no cambian columnas del catálogo, como los
+            -- que recalculan el vector de búsqueda (ver busqueda.py)
+            PERFORM catalogo_refrescar(ARRAY(
+                SELECT n.id FROM nuevos n JOIN anteriores a ON a.id = n.id
+                WHERE (n.descripcion, n.precio, n.categoria_id, n.marca_id, n.estado, n.fecha_actualizacion)
+                      IS DISTINCT FROM (a.descripcion, a.precio, a.categoria_id, a.marca_id, a.estado, a.fecha_actualizacion)
+            ));
+        ELSE
+            PERFORM catalogo_refrescar(ARRAY(SELECT id FROM anteriores));
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION catalogo_por_hijo() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM catalogo_refrescar(ARRAY(SELECT DISTINCT producto_id FROM nuevos));
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM catalogo_refrescar(ARRAY(
+                SELECT producto_id FROM nuevos UNION SELECT producto_id FROM anteriores
+            ));
+        ELSE
+            PERFORM catalogo_refrescar(ARRAY(SELECT DISTINCT producto_id FROM anteriores));
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # inventario: los cambios de stock solo copian cantidad y ubicación; altas,
+    # bajas lógicas o cambio de producto recalculan la fila completa
+    """
+    CREATE OR REPLACE FUNCTION catalogo_por_inventario() RETURNS trigger AS $$
+    BEGIN
+        UPDATE catalogo_productos c
+        SET cantidad = n.cantidad,
+            ubicacion = n.ubicacion,
+            fecha_actualizacion = greatest(c.fecha_actualizacion, n.fecha_actualizacion)
+        FROM nuevos n JOIN anteriores a ON a.id = n.id
+        WHERE c.id = n.producto_id AND n.estado AND a.estado AND n.producto_id = a.producto_id;
+
+        PERFORM catalogo_refrescar(ARRAY(
+            SELECT unnest(ARRAY[n.producto_id, a.producto_id])
+            FROM nuevos n JOIN anteriores a ON a.id = n.id
+            WHERE n.estado IS DISTINCT FROM a.estado OR n.producto_id <> a.producto_id
+        ));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # categorías y marcas: solo si cambió el nombre (o la fecha que forma parte del validador)
+    """
+    CREATE OR REPLACE FUNCTION catalogo_por_categoria() RETURNS trigger AS $$
+    BEGIN
+        PERFORM catalogo_refrescar(ARRAY(
+            SELECT p.id FROM productos p
+            JOIN nuevos n ON n.id = p.categoria_id
+            JOIN anteriores a ON a.id = n.id
+            WHERE p.estado AND (n.descripcion, n.fecha_actualizacion)
+                  IS DISTINCT FROM (a.descripcion, a.fecha_actualizacion)
+        ));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION catalogo_por_marca() RETURNS trigger AS $$
+    BEGIN
+        PERFORM catalogo_refrescar(ARRAY(
+            SELECT p.id FROM productos p
+            JOIN nuevos n ON n.id = p.marca_id
+            JOIN anteriores a ON a.id = n.id
+            WHERE p.estado AND (n.nombre, n.fecha_actualizacion)
+                  IS DISTINCT FROM (a.nombre, a.fecha_actualizacion)
+        ));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# (tabla, función, eventos)
+TRIGGERS_CATALOGO = [
+    ('productos', 'catalogo_por_producto', ('INSERT', 'UPDATE', 'DELETE')),
+    ('inventario', 'catalogo_por_hijo', ('INSERT', 'DELETE')),
+    ('inventario', 'catalogo_por_inventario', ('UPDATE',)),
+    ('especificaciones', 'catalogo_por_hijo', ('INSERT', 'UPDATE', 'DELETE')),
+    ('imagenes_productos', 'catalogo_por_hijo', ('INSERT', 'UPDATE', 'DELETE')),
+    ('categorias', 'catalogo_por_categoria', ('UPDATE',)),
+    ('marcas', 'catalogo_por_marca', ('UPDATE',)),
+]
+
+
+def _sql_triggers():
+    # Un trigger por evento: cada uno declara solo las tablas de transición que existen en ese evento
+    referencias = {
+        'INSERT': 'NEW TABLE AS nuevos',
+        'UPDATE': 'OLD TABLE AS anteriores NEW TABLE AS nuevos',
+        'DELETE': 'OLD TABLE AS anteriores',
+    }
+    for tabla, funcion, eventos in TRIGGERS_CATALOGO:
+        for evento in eventos:
+            nombre = f'{tabla}_catalogo_{evento.lower()}_trg'
+            yield f'DROP TRIGGER IF EXISTS {nombre} ON {tabla}'
+            yield f"""
+                CREATE TRIGGER {nombre}
+                    AFTER {evento} ON {tabla}
+                    REFERENCING {referencias[evento]}
+                    FOR EACH STATEMENT EXECUTE FUNCTION {funcion}()
+            """
+
+
+def reconstruir_catalogo(using=DEFAULT_DB_ALIAS):
+    """Recalcula el catálogo completo (carga inicial o reparación)"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    # En una transacción: las lecturas esperan al TRUNCATE en vez de ver la tabla vacía
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute('TRUNCATE catalogo_productos')
+        cursor.execute('SELECT catalogo_refrescar(ARRAY(SELECT id FROM productos WHERE estado))')
+
+
+def instalar_catalogo(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Instala las funciones y triggers del catálogo y lo completa si está
+    vacío. Se ejecuta en post_migrate; todas las sentencias son idempotentes.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        for sentencia in [*SQL_CATALOGO, *_sql_triggers()]:
+            cursor.execute(sentencia)
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM catalogo_productos)')
+        vacio = not cursor.fetchone()[0]
+
+    if vacio:
+        reconstruir_catalogo(using)
@@ -0,0 +1,64 @@
+from django.db.models import Prefetch
+from Api_2doParcial.campos import plan_consulta
+from Api_2doParcial.condicional import version
+from .models import Producto, Especificacion, Inventario, ImagenProducto
+from .serializers import ProductoSerializer
+
+# Relaciones anidadas que ProductoSerializer renderiza por defecto
+RELACIONES_CATALOGO = ('especificaciones', 'inventario', 'imagenes')
+
+
+def _prefetch(relacion):
+    """Prefetch de una relación anidada, filtrando solo registros activos"""
+    querysets = {
+        'especificaciones': Especificacion.objects.filter(estado=True),
+        'inventario': Inventario.objects.filter(estado=True),
+        'imagenes': ImagenProducto.objects.filter(estado=True),
+    }
+    return Prefetch(relacion, queryset=querysets[relacion])
+
+
+def catalogo_queryset(queryset=None, relaciones=RELACIONES_CATALOGO, campos=None):
+    """
+    Prepara un queryset de productos para ProductoSerializer.
+
+    Trae categoría y marca en el mismo SELECT y precarga solo las relaciones
+    anidadas que se van a renderizar, así el número de consultas es constante
+    sin importar cuántos productos se serialicen. Con `campos` (?fields= /
+    ?expand=) se leen solo las columnas, joins y anidados que se muestran.
+    """
+    if queryset is None:
+        queryset = Producto.objects.all()
+
+    relacionados, columnas = ('categoria', 'marca'), None
+    if campos is not None:
+        columnas, relacionados, relaciones = plan_consulta(ProductoSerializer, Producto, campos)
+        if relaciones and columnas is not None:
+            # Los serializers anidados muestran producto_descripcion
+            columnas.add('descripcion')
+
+    if relacionados:
+        queryset = queryset.select_related(*relacionados)
+    if columnas is not None:
+        queryset = queryset.only(*columnas)
+    return queryset.prefetch_related(*[_prefetch(relacion) for relacion in relaciones])
+
+
+def version_catalogo(queryset):
+    """
+    Validador para GET condicional de productos. Los cambios en
+    especificaciones e imágenes actualizan la fecha del producto (ver
+    signals.py); inventario, categoría y marca aportan su propia fecha.
+    """
+    return version(
+        queryset,
+        'fecha_actualizacion',
+        'inventario__fecha_actualizacion',
+        'categoria__fecha_actualizacion',
+        'marca__fecha_actualizacion',
+    )
+
+
+def version_inventario(queryset):
+    """Validador para GET condicional de inventario (incluye la descripción del producto)"""
+    return version(queryset, 'fecha_actualizacion', 'producto__fecha_actualizacion')
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Especificacion, Producto
+from .normalizacion import normalizar_atributo
+from .signals import invalidar_catalogo
+
+MAX_ESPECIFICACIONES = 200  # por petición de sincronización
+
+
+def _emparejar(actuales, deseadas):
+    """
+    Asigna a cada especificación deseada una fila activa: la del `id` si lo
+    trae, si no la primera libre con el mismo nombre normalizado. Devuelve
+    [(fila o None, deseada)] y las filas que quedaron sin pareja.
+    """
+    por_id = {fila.pk: fila for fila in actuales}
+    ids = [deseada['id'] for deseada in deseadas if deseada.get('id') is not None]
+    usados = set(ids)
+    if len(usados) < len(ids):
+        raise ValueError('Cada id de especificación puede aparecer una sola vez')
+    ajenos = usados - por_id.keys()
+    if ajenos:
+        raise ValueError(
+            'Especificaciones que no son activas de este producto: '
+            + ', '.join(str(pk) for pk in sorted(ajenos))
+        )
+
+    libres = {}
+    for fila in actuales:
+        if fila.pk not in usados:
+            libres.setdefault(fila.clave, []).append(fila)
+
+    parejas = []
+    for deseada in deseadas:
+        if deseada.get('id') is not None:
+            parejas.append((por_id[deseada['id']], deseada))
+        else:
+            candidatas = libres.get(normalizar_atributo(deseada['nombre'], '')[0])
+            parejas.append((candidatas.pop(0) if candidatas else None, deseada))
+    sobrantes = [fila for filas in libres.values() for fila in filas]
+    return parejas, sobrantes
+
+
+@transaction.atomic
+def sincronizar(producto_id, deseadas):
+    """
+    Deja las especificaciones activas de un producto iguales a `deseadas`
+    ([{'id'?, 'nombre', 'descripcion'}]): crea las nuevas, actualiza las que
+    cambiaron y elimina (lógicamente) las que ya no están, con un
+    bulk_create y un bulk_update. El producto queda bloqueado hasta el
+    commit para que dos ediciones de la ficha no se mezclen.
+
+    Devuelve {'especificaciones': [...], 'creadas', 'actualizadas', 'eliminadas'}.
+    Lanza Producto.DoesNotExist o ValueError (id ajeno al producto).
+    """
+    producto = Producto.objects.select_for_update().get(pk=producto_id, estado=True)
+    actuales = list(Especificacion.objects.filter(producto=producto, estado=True).order_by('pk'))
+    parejas, sobrantes = _emparejar(actuales, deseadas)
+
+    finales, nuevas, cambiadas = [], [], []
+    for fila, deseada in parejas:
+        clave, valor = normalizar_atributo(deseada['nombre'], deseada['descripcion'])
+        if fila is None:
+            # bulk_create no pasa por save(): clave y valor se calculan aquí
+            fila = Especificacion(
+                producto=producto, nombre=deseada['nombre'], descripcion=deseada['descripcion'],
+                clave=clave, valor=valor
+            )
+            nuevas.append(fila)
+        elif (fila.nombre, fila.descripcion) != (deseada['nombre'], deseada['descripcion']):
+            fila.nombre, fila.descripcion, fila.clave, fila.valor = (
+                deseada['nombre'], deseada['descripcion'], clave, valor
+            )
+            cambiadas.append(fila)
+        fila.producto = producto
+        finales.append(fila)
+    for fila in sobrantes:
+        fila.estado = False
+
+    if nuevas:
+        Especificacion.objects.bulk_create(nuevas)
+    if cambiadas or sobrantes:
+        Especificacion.objects.bulk_update(
+            [*cambiadas, *sobrantes], ['nombre', 'descripcion', 'clave', 'valor', 'estado']
+        )
+    if nuevas or cambiadas or sobrantes:
+        # bulk_create y bulk_update no envían post_save (ver signals.py)
+        Producto.objects.filter(pk=producto.pk).update(fecha_actualizacion=timezone.now())
+        invalidar_catalogo()
+
+    return {
+        'especificaciones': finales,
+        'creadas': len(nuevas),
+        'actualizadas': len(cambiadas),
+        'eliminadas': len(sobrantes),
+    }
@@ -0,0 +1,127 @@
+from decimal import Decimal, InvalidOperation
+from django.db.models import Count, Q
+
+# Límites de los rangos de precio: [0, 100), [100, 500), ... [5000, ∞)
+RANGOS_PRECIO = (Decimal('100'), Decimal('500'), Decimal('1000'), Decimal('5000'))
+VERDADEROS = ('1', 'true', 'si', 'sí')
+
+
+def _ids(request, nombre):
+    """Acepta ?categoria=1&categoria=2 y ?categoria=1,2"""
+    valores = []
+    for valor in request.query_params.getlist(nombre):
+        valores.extend(parte.strip() for parte in valor.split(',') if parte.strip())
+    try:
+        return [int(valor) for valor in valores]
+    except ValueError:
+        raise ValueError(f'{nombre} debe ser un id o una lista de ids separados por coma')
+
+
+def _decimal(request, nombre):
+    valor = request.query_params.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(f'{nombre} debe ser un número')
+    # NaN, sNaN e Infinity no se pueden comparar ni guardar en el filtro del ORM
+    if not numero.is_finite():
+        raise ValueError(f'{nombre} debe ser un número')
+    return numero
+
+
+def leer_filtros(request):
+    """
+    Convierte los parámetros de la petición en un Q por faceta. Lanza
+    ValueError con el mensaje para el cliente si algún parámetro es inválido.
+    """
+    filtros = {}
+
+    categorias = _ids(request, 'categoria')
+    if categorias:
+        filtros['categoria'] = Q(categoria_id__in=categorias)
+
+    marcas = _ids(request, 'marca')
+    if marcas:
+        filtros['marca'] = Q(marca_id__in=marcas)
+
+    precio_min = _decimal(request, 'precio_min')
+    precio_max = _decimal(request, 'precio_max')
+    if precio_min is not None and precio_max is not None and precio_min > precio_max:
+        raise ValueError('precio_min no puede ser mayor que precio_max')
+    precio = Q()
+    if precio_min is not None:
+        precio &= Q(precio__gte=precio_min)
+    if precio_max is not None:
+        precio &= Q(precio__lte=precio_max)
+    if precio:
+        filtros['precio'] = precio
+
+    if request.query_params.get('en_stock', '').lower() in VERDADEROS:
+        filtros['stock'] = Q(inventario__estado=True, inventario__cantidad__gt=0)
+
+    return filtros
+
+
+def filtrar(queryset, filtros, excluir=None):
+    """Aplica todos los filtros salvo el de la faceta `excluir`"""
+    return queryset.filter(*[q for nombre, q in filtros.items() if nombre != excluir])
+
+
+def _rangos():
+    desde = Decimal('0')
+    for hasta in RANGOS_PRECIO:
+        yield desde, hasta
+        desde = hasta
+    yield desde, None
+
+
+def calcular_facetas(queryset, filtros):
+    """
+    Conteos por categoría, por marca y por rango de precio, más el total.
+
+    Cada faceta se cuenta con los filtros de las demás pero no con el suyo
+    (así el cliente ve cuántos resultados tendría al cambiar de categoría,
+    por ejemplo). Son tres consultas agrupadas sin importar cuántas
+    categorías, marcas o productos haya; los rangos de precio y el total
+    salen de un solo aggregate con COUNT ... FILTER.
+    """
+    categorias = (
+        filtrar(queryset, filtros, excluir='categoria')
+        .values('categoria_id', 'categoria__descripcion')
+        .annotate(total=Count('pk'))
+        .order_by('-total', 'categoria__descripcion')
+    )
+    marcas = (
+        filtrar(queryset, filtros, excluir='marca')
+        .values('marca_id', 'marca__nombre')
+        .annotate(total=Count('pk'))
+        .order_by('-total', 'marca__nombre')
+    )
+
+    rangos = list(_rangos())
+    conteos = {'total': Count('pk', filter=filtros.get('precio'))}
+    for indice, (desde, hasta) in enumerate(rangos):
+        rango = Q(precio__gte=desde) if hasta is None else Q(precio__gte=desde, precio__lt=hasta)
+        conteos[f'rango_{indice}'] = Count('pk', filter=rango)
+    totales = filtrar(queryset, filtros, excluir='precio').aggregate(**conteos)
+
+    return totales['total'], {
+        'categorias': [
+            {'id': fila['categoria_id'], 'descripcion': fila['categoria__descripcion'], 'total': fila['total']}
+            for fila in categorias
+        ],
+        'marcas': [
+            {'id': fila['marca_id'], 'nombre': fila['marca__nombre'], 'total': fila['total']}
+            for fila in marcas
+        ],
+        'precios': [
+            {
+                'desde': str(desde),
+                'hasta': str(hasta) if hasta is not None else None,
+                'total': totales[f'rango_{indice}'],
+            }
+            for indice, (desde, hasta) in enumerate(rangos)
+        ],
+    }
@@ -0,0 +1,181 @@
+import random
+from django.db import connection, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Mod
+from .models import FraccionInventario, Inventario
+
+# Inventario fraccionado: para los productos más vendidos, lo disponible
+# (cantidad - reservado) se reparte en N filas de fracciones_inventario.
+# Cada venta descuenta de una fracción al azar, así las ventas simultáneas
+# bloquean filas distintas en lugar de hacer fila sobre la misma.
+#
+# `reservado` sigue en la fila de inventario y `Inventario.cantidad` pasa a
+# ser un total cacheado (suma de las fracciones + reservado) que se
+# recalcula después de cada commit sin esperar bloqueos; stock.py y las
+# consultas que necesitan el valor exacto suman las fracciones.
+
+MAX_FRACCIONES = 64
+
+
+class FraccionesCambiaron(Exception):
+    """El inventario dejó de estar fraccionado mientras se operaba: reintentar"""
+
+
+def _repartir(total, fracciones):
+    base, resto = divmod(total, fracciones)
+    return [base + (1 if numero < resto else 0) for numero in range(fracciones)]
+
+
+def _barrer(inventario_id, delta):
+    """
+    Bloquea todas las fracciones (en orden, para no formar deadlocks entre
+    barridos), aplica el delta y vuelve a repartir el total en partes
+    iguales para que los próximos descuentos encuentren stock en cualquier
+    fracción. Devuelve None o, si no alcanza, lo disponible.
+    """
+    filas = list(
+        FraccionInventario.objects.select_for_update()
+        .filter(inventario_id=inventario_id).order_by('numero')
+    )
+    if not filas:
+        raise FraccionesCambiaron(inventario_id)
+
+    disponible = sum(fila.cantidad for fila in filas)
+    if disponible + delta < 0:
+        return disponible
+    for fila, cantidad in zip(filas, _repartir(disponible + delta, len(filas))):
+        fila.cantidad = cantidad
+    FraccionInventario.objects.bulk_update(filas, ['cantidad'])
+    return None
+
+
+def mover(inventario_id, fracciones, delta):
+    """
+    Suma o descuenta `delta` unidades de lo disponible. Un solo UPDATE toma
+    la primera fracción libre (SKIP LOCKED) con stock suficiente, empezando
+    por una al azar: nunca espera a otra venta. Si ninguna alcanza por sí
+    sola o todas están ocupadas, barre todas. Devuelve None o, si no
+    alcanza, lo disponible.
+
+    El intento va en un savepoint: en READ COMMITTED una fila que cambió
+    durante la sentencia puede quedar bloqueada aunque no se actualice, y
+    entrar al barrido con ese bloqueo podría formar un deadlock.
+    """
+    if not delta:
+        return None
+    condicion = {'cantidad__gte': -delta} if delta < 0 else {}
+    candidata = (
+        FraccionInventario.objects.filter(inventario_id=inventario_id, **condicion)
+        .order_by(Mod(F('numero') + (fracciones - random.randrange(fracciones)), fracciones))
+        .select_for_update(skip_locked=True)
+        .values('pk')[:1]
+    )
+    punto = transaction.savepoint()
+    if FraccionInventario.objects.filter(pk__in=candidata).update(cantidad=F('cantidad') + delta):
+        transaction.savepoint_commit(punto)
+        return None
+    transaction.savepoint_rollback(punto)
+    return _barrer(inventario_id, delta)
+
+
+def disponible(inventario_id, bloquear=False):
+    """
+    Suma de las fracciones. Con `bloquear` las toma en orden (como
+    _barrer) hasta el commit, así ninguna venta la cambia mientras tanto.
+    """
+    fracciones = FraccionInventario.objects.filter(inventario_id=inventario_id)
+    if bloquear:
+        return sum(fracciones.select_for_update().order_by('numero').values_list('cantidad', flat=True))
+    return fracciones.aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+def cantidad_exacta(prefijo=''):
+    """
+    Expresión para annotate(): el total cacheado si el inventario no está
+    fraccionado, o reservado + la suma de sus fracciones. `prefijo` es la
+    ruta al inventario desde el modelo consultado (p. ej. 'inventario__').
+    """
+    suma = (
+        FraccionInventario.objects.filter(inventario_id=OuterRef(f'{prefijo}id'))
+        .values('inventario_id').annotate(total=Sum('cantidad')).values('total')
+    )
+    return Case(
+        When(**{f'{prefijo}fracciones__gt': 0}, then=F(f'{prefijo}reservado') + Coalesce(Subquery(suma), 0)),
+        default=F(f'{prefijo}cantidad'),
+    )
+
+
+def _refrescar(filtro, parametros, espera=''):
+    inventarios, partes = Inventario._meta.db_table, FraccionInventario._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {inventarios} i
+            SET cantidad = i.reservado + coalesce(
+                    (SELECT sum(f.cantidad) FROM {partes} f WHERE f.inventario_id = i.id), 0
+                ),
+                fecha_actualizacion = now()
+            WHERE i.id IN (
+                SELECT id FROM {inventarios} WHERE fracciones > 0 AND {filtro} FOR UPDATE {espera}
+            )
+            """,
+            parametros
+        )
+        return cursor.rowcount
+
+
+def refrescar_total(inventario_id):
+    """
+    Recalcula el total cacheado de un inventario. Con SKIP LOCKED: si otra
+    transacción tiene la fila, no espera; el siguiente refresco (o
+    consolidar) lo deja al día.
+    """
+    _refrescar('id = %s', [inventario_id], espera='SKIP LOCKED')
+
+
+def consolidar():
+    """Recalcula el total cacheado de todos los inventarios fraccionados; devuelve cuántos"""
+    return _refrescar('TRUE', [])
+
+
+@transaction.atomic
+def configurar(producto_id, fracciones):
+    """
+    Cambia el número de fracciones de un inventario (0 vuelve a una sola
+    fila). Bloquea la fila y todas sus fracciones, recalcula lo disponible
+    y lo reparte de nuevo. Devuelve el inventario.
+    """
+    inventario = Inventario.objects.select_for_update().get(producto_id=producto_id, estado=True)
+    actuales = list(
+        FraccionInventario.objects.select_for_update()
+        .filter(inventario=inventario).order_by('numero')
+    )
+    if inventario.fracciones:
+        libre = sum(fila.cantidad for fila in actuales)
+    else:
+        libre = inventario.cantidad - inventario.reservado
+
+    FraccionInventario.objects.filter(inventario=inventario).delete()
+    if fracciones:
+        FraccionInventario.objects.bulk_create([
+            FraccionInventario(inventario=inventario, numero=numero, cantidad=cantidad)
+            for numero, cantidad in enumerate(_repartir(libre, fracciones))
+        ])
+    inventario.fracciones = fracciones
+    inventario.cantidad = libre + inventario.reservado
+    inventario.save(update_fields=['fracciones', 'cantidad', 'fecha_actualizacion'])
+    return inventario
+
+
+def fijar(inventario):
+    """
+    Deja las fracciones de acuerdo con `inventario.cantidad` recién
+    guardada (actualización manual de la cantidad).
+    """
+    filas = list(
+        FraccionInventario.objects.select_for_update()
+        .filter(inventario=inventario).order_by('numero')
+    )
+    for fila, cantidad in zip(filas, _repartir(inventario.cantidad - inventario.reservado, len(filas))):
+        fila.cantidad = cantidad
+    FraccionInventario.objects.bulk_update(filas, ['cantidad'])
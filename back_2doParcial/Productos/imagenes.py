@@ -0,0 +1,446 @@
+import hashlib
+import multiprocessing
+import random
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ImagenProducto, Producto
+from .signals import invalidar_catalogo
+from .variantes import VARIANTES, generar
+
+# Carga de imágenes en segundo plano: la petición solo copia el archivo a
+# una carpeta local (staging) y crea la ImagenProducto en 'pendiente'. Un
+# pool de hilos la sube después al almacenamiento configurado, con timeout
+# por subida, reintentos con espera exponencial y un circuito que deja de
+# intentar mientras el almacenamiento falla seguido. La petición ya no
+# espera a Cloudinary.
+#
+# Estados (ImagenProducto.estado_carga):
+#   pendiente -> subiendo -> lista
+#                         -> pendiente (reintento) ... -> error
+# El paso a 'subiendo' es un UPDATE condicional, así que aunque varios
+# procesos encolen la misma imagen solo uno la sube.
+#
+# Cada imagen guarda el SHA-256 de su contenido (hash_contenido): un archivo
+# que ya está en el almacenamiento reutiliza ese valor en lugar de subirse
+# otra vez, tanto al recibirlo como justo antes de subirlo.
+#
+# Al quedar lista se guardan en la fila su URL y las de sus variantes
+# (variantes.py), así los serializers leen columnas y no arman URLs.
+
+
+def _recurso(valor):
+    """CloudinaryResource de un valor guardado o recién subido"""
+    return ImagenProducto._meta.get_field('imagen').to_python(valor)
+
+
+_procesos = None
+_procesos_lock = threading.Lock()
+
+
+def procesos():
+    """
+    Pool de procesos para generar variantes (trabajo de CPU que con hilos
+    quedaría detrás del GIL). 'spawn' evita heredar conexiones y hilos del
+    proceso de Django.
+    """
+    global _procesos
+    with _procesos_lock:
+        if _procesos is None:
+            _procesos = ProcessPoolExecutor(
+                max_workers=settings.IMAGENES_PROCESOS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _procesos
+
+
+class AlmacenCloudinary:
+    """
+    Sube a Cloudinary con las opciones (carpeta, transformación) del campo.
+    Las variantes son transformaciones en la URL: Cloudinary las genera en
+    la primera descarga.
+    """
+    nombre = 'cloudinary'
+
+    def subir(self, ruta, timeout=None):
+        from cloudinary import uploader
+
+        campo = ImagenProducto._meta.get_field('imagen')
+        opciones = {'type': campo.type, 'resource_type': campo.resource_type, **campo.options}
+        return uploader.upload_resource(ruta, timeout=timeout, **opciones)
+
+    def url(self, valor):
+        return valor.url
+
+    def variantes(self, valor, timeout=None):
+        urls = {}
+        for variante, (ancho, alto, recorte) in VARIANTES.items():
+            opciones = {'width': ancho, 'height': alto, 'crop': recorte, 'quality': 'auto:good', 'secure': True}
+            urls[variante] = valor.build_url(**opciones)
+            urls[f'{variante}_webp'] = valor.build_url(format='webp', **opciones)
+        return urls
+
+
+class AlmacenArchivos:
+    """
+    Reemplazo local de Cloudinary: copia a una carpeta y guarda el valor con
+    el mismo formato que CloudinaryField ("image/upload/v<n>/<public_id>.<ext>").
+    `latencia` simula la red en benchmarks; si supera el timeout, falla igual
+    que una subida que no responde.
+    """
+    nombre = 'archivos'
+
+    def __init__(self, raiz, url_base, latencia=0):
+        self.raiz = Path(raiz)
+        self.url_base = url_base
+        self.latencia = latencia
+
+    def subir(self, ruta, timeout=None):
+        if self.latencia:
+            if timeout is not None and self.latencia > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f'La subida superó {timeout} s')
+            time.sleep(self.latencia)
+
+        origen = Path(ruta)
+        public_id = f'productos/{origen.stem}'
+        destino = self.raiz / f'{public_id}{origen.suffix}'
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(origen, destino)
+        return f'image/upload/v{int(time.time())}/{public_id}{origen.suffix}'
+
+    def url(self, valor):
+        sufijo = f'.{valor.format}' if valor.format else ''
+        return f'{self.url_base}{valor.public_id}{sufijo}'
+
+    def variantes(self, valor, timeout=None):
+        """Redimensiona el original guardado en el pool de procesos"""
+        sufijo = f'.{valor.format}' if valor.format else ''
+        origen = self.raiz / f'{valor.public_id}{sufijo}'
+        rutas = procesos().submit(generar, str(origen), str(self.raiz), valor.public_id).result(timeout)
+        return {clave: f'{self.url_base}{relativa}' for clave, relativa in rutas.items()}
+
+
+def obtener_almacen():
+    """Backend según IMAGENES_BACKEND en settings"""
+    if settings.IMAGENES_BACKEND == 'archivos':
+        return AlmacenArchivos(settings.IMAGENES_ARCHIVOS_DIR, settings.IMAGENES_ARCHIVOS_URL)
+    return AlmacenCloudinary()
+
+
+def url_imagen(valor):
+    """URL pública de un valor de CloudinaryField con el backend configurado"""
+    return obtener_almacen().url(_recurso(valor)) if valor else None
+
+
+def publicar(almacen, valor, timeout=None):
+    """
+    URL y variantes de una imagen ya subida, para guardarlas en la fila.
+    Devuelve (url, variantes, error): si las variantes fallan la imagen
+    igual se publica, sin ellas y con el motivo en `error`.
+    """
+    recurso = _recurso(valor)
+    try:
+        return almacen.url(recurso), almacen.variantes(recurso, timeout), ''
+    except Exception as error:
+        return almacen.url(recurso), {}, f'Variantes: {type(error).__name__}: {error}'[:500]
+
+
+class Circuito:
+    """
+    Circuit breaker: tras `fallos` errores seguidos se abre y rechaza
+    subidas durante `espera` segundos. Después deja pasar una sola de
+    prueba: si sale bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, fallos=5, espera=30, reloj=time.monotonic):
+        self.fallos = fallos
+        self.espera = espera
+        self.reloj = reloj
+        self._seguidos = 0
+        self._abierto_hasta = None
+        self._probando = None  # hilo que hace la subida de prueba
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self._abierto_hasta is None:
+            return 'cerrado'
+        return 'abierto' if self.reloj() < self._abierto_hasta or self._probando else 'semiabierto'
+
+    def permitir(self):
+        with self._lock:
+            if self._abierto_hasta is None:
+                return True
+            if self.reloj() < self._abierto_hasta or self._probando:
+                return False
+            self._probando = threading.get_ident()
+            return True
+
+    def restante(self):
+        """Segundos hasta que se pueda volver a probar"""
+        if self._abierto_hasta is None:
+            return 0
+        return max(self._abierto_hasta - self.reloj(), 0)
+
+    def liberar(self):
+        """El hilo que tenía la prueba no llegó a subir nada: otro puede probar"""
+        with self._lock:
+            if self._probando == threading.get_ident():
+                self._probando = None
+
+    def exito(self):
+        with self._lock:
+            self._seguidos = 0
+            self._abierto_hasta = None
+            self._probando = None
+
+    def fallo(self):
+        with self._lock:
+            self._seguidos += 1
+            if self._probando or self._seguidos >= self.fallos:
+                self._abierto_hasta = self.reloj() + self.espera
+            self._probando = None
+
+
+def guardar_en_staging(archivo):
+    """
+    Copia el archivo subido a IMAGENES_STAGING_DIR por partes, calculando el
+    SHA-256 en la misma pasada. Devuelve (ruta, hash).
+    """
+    carpeta = Path(settings.IMAGENES_STAGING_DIR)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    ruta = carpeta / f'{uuid.uuid4().hex}{Path(archivo.name).suffix.lower()}'
+    resumen = hashlib.sha256()
+    with open(ruta, 'wb') as destino:
+        for parte in archivo.chunks():
+            destino.write(parte)
+            resumen.update(parte)
+    return str(ruta), resumen.hexdigest()
+
+
+def ya_subidas(hashes):
+    """
+    {hash: {imagen, url, variantes}} de los contenidos que ya están en el
+    almacenamiento
+    """
+    if not hashes:
+        return {}
+    filas = (
+        ImagenProducto.objects
+        .filter(hash_contenido__in=hashes, estado_carga='lista', imagen__isnull=False)
+        .order_by('hash_contenido', 'id').distinct('hash_contenido')
+        .values('hash_contenido', 'imagen', 'url', 'variantes')
+    )
+    return {fila.pop('hash_contenido'): fila for fila in filas}
+
+
+def recibir_lote(archivos, producto, principal=None, destino=None):
+    """
+    Recibe varias imágenes de un producto. Cada archivo va a staging con su
+    hash; los repetidos dentro del lote se descartan y los que ya están en el
+    almacenamiento quedan 'lista' sin subirse. Todas las filas (y el cambio
+    de imagen principal, si `principal` es el índice de un archivo) se crean
+    en una transacción; las pendientes se encolan (en `destino` o en la cola
+    del proceso) al confirmarla.
+
+    Devuelve {'imagenes': [...], 'reutilizadas': n, 'duplicadas': [nombres]}.
+    """
+    recibidas, duplicadas, primera = [], [], {}
+    hash_principal = None
+    try:
+        for indice, archivo in enumerate(archivos):
+            ruta, resumen = guardar_en_staging(archivo)
+            if resumen in primera:
+                Path(ruta).unlink(missing_ok=True)
+                duplicadas.append(archivo.name)
+            else:
+                primera[resumen] = indice
+                recibidas.append((ruta, resumen))
+            if indice == principal:
+                hash_principal = resumen
+
+        subidas = ya_subidas(list(primera))
+        filas = [
+            ImagenProducto(
+                producto=producto,
+                es_principal=resumen == hash_principal,
+                hash_contenido=resumen,
+                estado_carga='lista' if resumen in subidas else 'pendiente',
+                archivo_temporal='' if resumen in subidas else ruta,
+                **subidas.get(resumen, {}),
+            )
+            for ruta, resumen in recibidas
+        ]
+        with transaction.atomic():
+            if hash_principal is not None:
+                ImagenProducto.objects.filter(producto=producto, es_principal=True, estado=True).update(es_principal=False)
+            ImagenProducto.objects.bulk_create(filas)
+            # bulk_create no envía post_save (ver signals.py)
+            Producto.objects.filter(pk=producto.pk).update(fecha_actualizacion=timezone.now())
+            invalidar_catalogo()
+    except Exception:
+        # Sin filas nadie va a leer ni limpiar estos archivos: no dejarlos en staging
+        for ruta, _ in recibidas:
+            Path(ruta).unlink(missing_ok=True)
+        raise
+
+    pendientes = [fila.pk for fila in filas if fila.estado_carga == 'pendiente']
+
+    def encolar():
+        for imagen_id in pendientes:
+            (destino or cola).encolar(imagen_id)
+    transaction.on_commit(encolar)
+
+    for ruta, resumen in recibidas:
+        if resumen in subidas:
+            Path(ruta).unlink(missing_ok=True)
+    return {'imagenes': filas, 'reutilizadas': len(filas) - len(pendientes), 'duplicadas': duplicadas}
+
+
+def recibir(archivo, producto, es_principal=False, destino=None):
+    """Recibe una sola imagen (ver recibir_lote). Devuelve la ImagenProducto"""
+    return recibir_lote([archivo], producto, principal=0 if es_principal else None, destino=destino)['imagenes'][0]
+
+
+class ColaImagenes:
+    """
+    Pool de hilos que sube las imágenes pendientes. Sin `almacen` usa el
+    de settings en cada subida.
+    """
+
+    def __init__(self, almacen=None, trabajadores=None, reintentos=None, timeout=None, circuito=None,
+                 espera_reintento=1):
+        self.almacen = almacen
+        self.trabajadores = trabajadores or settings.IMAGENES_TRABAJADORES
+        self.reintentos = reintentos or settings.IMAGENES_REINTENTOS
+        self.timeout = timeout or settings.IMAGENES_TIMEOUT
+        self.circuito = circuito or Circuito(settings.IMAGENES_CIRCUITO_FALLOS, settings.IMAGENES_CIRCUITO_ESPERA)
+        self.espera_reintento = espera_reintento
+        self._pool = None
+        self._en_curso = 0
+        self._vacia = threading.Condition()
+
+    def _ejecutor(self):
+        with self._vacia:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.trabajadores, thread_name_prefix='imagenes')
+            return self._pool
+
+    def encolar(self, imagen_id, espera=0):
+        """Programa la subida; con `espera` (segundos) la difiere sin ocupar un trabajador"""
+        with self._vacia:
+            self._en_curso += 1
+        if espera:
+            temporizador = threading.Timer(espera, self._enviar, [imagen_id])
+            temporizador.daemon = True
+            temporizador.start()
+        else:
+            self._enviar(imagen_id)
+
+    def _enviar(self, imagen_id):
+        self._ejecutor().submit(self._trabajar, imagen_id)
+
+    def _trabajar(self, imagen_id):
+        try:
+            self.procesar(imagen_id)
+        finally:
+            connections.close_all()
+            with self._vacia:
+                self._en_curso -= 1
+                self._vacia.notify_all()
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que no queden subidas encoladas ni reintentos programados"""
+        with self._vacia:
+            return self._vacia.wait_for(lambda: self._en_curso == 0, timeout)
+
+    def _espera_reintento(self, intentos):
+        # Exponencial con jitter para no reintentar todas a la vez
+        return min(self.espera_reintento * 2 ** (intentos - 1), 60) * random.uniform(0.5, 1)
+
+    def procesar(self, imagen_id):
+        """
+        Sube una imagen pendiente en el hilo actual. Devuelve el estado en
+        que quedó, o None si otra ejecución ya la había tomado.
+        """
+        if not self.circuito.permitir():
+            # Con el circuito abierto no se gasta un intento: se reprograma
+            self.encolar(imagen_id, espera=max(self.circuito.restante(), 0.1))
+            return 'pendiente'
+
+        tomada = ImagenProducto.objects.filter(pk=imagen_id, estado_carga='pendiente').update(
+            estado_carga='subiendo', intentos=F('intentos') + 1, fecha_intento=timezone.now()
+        )
+        if not tomada:
+            self.circuito.liberar()
+            return None
+        imagen = ImagenProducto.objects.get(pk=imagen_id)
+        almacen = self.almacen or obtener_almacen()
+
+        # Otra petición pudo subir el mismo contenido mientras esta esperaba
+        subida = ya_subidas([imagen.hash_contenido]).get(imagen.hash_contenido) if imagen.hash_contenido else None
+        if subida is not None:
+            self.circuito.liberar()
+            return self._terminar(imagen, subida['imagen'], subida['url'], subida['variantes'])
+
+        try:
+            valor = almacen.subir(imagen.archivo_temporal, timeout=self.timeout)
+        except Exception as error:
+            self.circuito.fallo()
+            imagen.error = f'{type(error).__name__}: {error}'[:500]
+            if imagen.intentos >= self.reintentos:
+                imagen.estado_carga = 'error'
+            else:
+                imagen.estado_carga = 'pendiente'
+            imagen.save(update_fields=['estado_carga', 'error'])
+            if imagen.estado_carga == 'pendiente':
+                self.encolar(imagen_id, espera=self._espera_reintento(imagen.intentos))
+            return imagen.estado_carga
+
+        self.circuito.exito()
+        url, variantes, error = publicar(almacen, valor, self.timeout)
+        return self._terminar(imagen, valor, url, variantes, error)
+
+    def _terminar(self, imagen, imagen_subida, url, variantes, error=''):
+        temporal = imagen.archivo_temporal
+        imagen.imagen = imagen_subida
+        imagen.url = url
+        imagen.variantes = variantes
+        imagen.estado_carga = 'lista'
+        imagen.archivo_temporal = ''
+        imagen.error = error
+        # save() y no update(): las señales invalidan la cache del catálogo
+        imagen.save(update_fields=['imagen', 'url', 'variantes', 'estado_carga', 'archivo_temporal', 'error'])
+        Path(temporal).unlink(missing_ok=True)
+        return 'lista'
+
+
+def recuperar(reintentar_errores=False, vencidas_en=None):
+    """
+    Devuelve a 'pendiente' las cargas cortadas por un reinicio ('subiendo'
+    desde hace más de `vencidas_en` segundos, por defecto el doble del
+    timeout) y, si se pide, las que terminaron con error. Devuelve los ids
+    pendientes.
+    """
+    vencidas_en = vencidas_en or settings.IMAGENES_TIMEOUT * 2
+    limite = timezone.now() - timedelta(seconds=vencidas_en)
+    ImagenProducto.objects.filter(estado_carga='subiendo', fecha_intento__lt=limite).update(estado_carga='pendiente')
+    if reintentar_errores:
+        ImagenProducto.objects.filter(estado_carga='error').exclude(archivo_temporal='').update(
+            estado_carga='pendiente', intentos=0
+        )
+    return list(
+        ImagenProducto.objects.filter(estado_carga='pendiente').order_by('id').values_list('id', flat=True)
+    )
+
+
+# Cola del proceso: la usan las vistas y el comando procesar_imagenes_pendientes
+cola = ColaImagenes()
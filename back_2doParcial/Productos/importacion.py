@@ -0,0 +1,220 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from django.db import IntegrityError, connection, transaction
+from Api_2doParcial.cache import cache_catalogo
+from Categorias.models import Categoria
+from Marcas.models import Marca
+from .models import Producto
+
+FORMATOS = ('csv', 'ndjson')
+LOTE_POR_DEFECTO = 1000
+LOTE_MAXIMO = 5000
+PRECIO_MAXIMO = Decimal('9999999.99')
+JSON_INVALIDO = 'JSON inválido'
+CODIFICACION_INVALIDA = 'Codificación inválida: el archivo debe estar en UTF-8'
+
+
+def _decodificar(archivo, invalidas):
+    """
+    Decodifica línea por línea como UTF-8. Las líneas que no lo son se
+    decodifican con reemplazos y su número se agrega a `invalidas`.
+    """
+    for numero, linea in enumerate(archivo, start=1):
+        try:
+            yield linea.decode('utf-8-sig' if numero == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            invalidas.add(numero)
+            yield linea.decode('utf-8', errors='replace')
+
+
+def leer_filas(archivo, formato):
+    """
+    Lee el archivo fila por fila sin cargarlo completo en memoria.
+    `archivo` es cualquier iterable de líneas en bytes (UploadedFile, open(..., 'rb')).
+    Las filas que no se pueden leer (JSON inválido, texto que no es UTF-8)
+    se devuelven como el mensaje de error en lugar del dict.
+    """
+    invalidas = set()
+    lineas = _decodificar(archivo, invalidas)
+    if formato == 'csv':
+        lector = csv.DictReader(lineas)
+        lector.fieldnames  # lee el encabezado
+        leidas = lector.line_num
+        for datos in lector:
+            # Un registro CSV puede ocupar varias líneas (campos entre comillas)
+            if invalidas.intersection(range(leidas + 1, lector.line_num + 1)):
+                yield CODIFICACION_INVALIDA
+            else:
+                yield datos
+            leidas = lector.line_num
+        return
+
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        if numero in invalidas:
+            yield CODIFICACION_INVALIDA
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            datos = None
+        yield datos if isinstance(datos, dict) else JSON_INVALIDO
+
+
+def _mapa(modelo, campo):
+    """Categorías o marcas activas por id y por nombre (en minúsculas), en una consulta"""
+    mapa = {}
+    for id_registro, nombre in modelo.objects.filter(estado=True).values_list('id', campo):
+        mapa[nombre.strip().lower()] = id_registro
+    for id_registro in list(mapa.values()):
+        mapa[str(id_registro)] = id_registro
+    return mapa
+
+
+def _valor(datos, *claves):
+    for clave in claves:
+        if datos.get(clave) not in (None, ''):
+            return str(datos[clave]).strip()
+    return ''
+
+
+def _validar(datos, categorias, marcas):
+    """Devuelve (Producto sin guardar, None) o (None, errores) para una fila"""
+    if isinstance(datos, str):
+        return None, {'fila': datos}
+
+    errores = {}
+    descripcion = _valor(datos, 'descripcion')
+    if not descripcion:
+        errores['descripcion'] = 'Este campo es requerido'
+    elif len(descripcion) > 255:
+        errores['descripcion'] = 'Máximo 255 caracteres'
+
+    try:
+        precio = Decimal(_valor(datos, 'precio')).quantize(Decimal('0.01'))
+        if precio < 0:
+            errores['precio'] = 'El precio no puede ser negativo'
+        elif precio > PRECIO_MAXIMO:
+            errores['precio'] = 'El precio excede el límite permitido'
+    except (InvalidOperation, ValueError):
+        errores['precio'] = 'Precio inválido'
+
+    categoria_id = categorias.get(_valor(datos, 'categoria', 'categoria_id').lower())
+    if categoria_id is None:
+        errores['categoria'] = 'Categoría no encontrada o inactiva'
+
+    marca_id = marcas.get(_valor(datos, 'marca', 'marca_id').lower())
+    if marca_id is None:
+        errores['marca'] = 'Marca no encontrada o inactiva'
+
+    if errores:
+        return None, errores
+    return Producto(descripcion=descripcion, precio=precio, categoria_id=categoria_id, marca_id=marca_id), None
+
+
+def _clave(producto):
+    return (producto.descripcion.lower(), producto.categoria_id, producto.marca_id)
+
+
+def _existentes(claves):
+    """
+    Las claves del lote que ya están en la base, en una consulta: un join
+    contra (VALUES ...) que busca cada clave completa en el índice
+    productos_duplicados_idx (lower(descripcion), categoria, marca).
+    """
+    valores = ', '.join(['(%s, %s, %s)'] * len(claves))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT DISTINCT v.descripcion, v.categoria_id, v.marca_id
+            FROM (VALUES {valores}) AS v(descripcion, categoria_id, marca_id)
+            JOIN {Producto._meta.db_table} AS p
+              ON lower(p.descripcion) = v.descripcion
+             AND p.categoria_id = v.categoria_id
+             AND p.marca_id = v.marca_id
+            """,
+            [valor for clave in claves for valor in clave]
+        )
+        return set(cursor.fetchall())
+
+
+def _guardar_lote(lote, resultado):
+    """
+    Descarta los duplicados del lote contra la base con una sola consulta
+    y guarda el resto con bulk_create.
+    """
+    existentes = _existentes({_clave(producto) for _, producto in lote})
+
+    nuevos = []
+    for fila, producto in lote:
+        if _clave(producto) in existentes:
+            resultado['errores'].append({
+                'fila': fila,
+                'errores': {'non_field_errors': 'Ya existe un producto con esta descripción, categoría y marca'}
+            })
+        else:
+            nuevos.append((fila, producto))
+
+    if not nuevos:
+        return
+
+    try:
+        with transaction.atomic():
+            Producto.objects.bulk_create([producto for _, producto in nuevos])
+        resultado['creados'] += len(nuevos)
+    except IntegrityError:
+        # Otro proceso insertó alguno de estos productos mientras tanto:
+        # reintentar fila por fila para aislar los conflictos
+        for fila, producto in nuevos:
+            try:
+                with transaction.atomic():
+                    producto.save()
+                resultado['creados'] += 1
+            except IntegrityError:
+                resultado['errores'].append({
+                    'fila': fila,
+                    'errores': {'non_field_errors': 'Ya existe un producto con esta descripción, categoría y marca'}
+                })
+
+
+def importar_productos(archivo, formato='csv', lote=LOTE_POR_DEFECTO):
+    """
+    Importación masiva de productos desde CSV o NDJSON.
+
+    Columnas: descripcion, precio, categoria y marca (por id o por nombre).
+    Valida cada fila, descarta duplicados (en el archivo y en la base) e
+    inserta en lotes de `lote` filas. Devuelve un reporte con el error de
+    cada fila rechazada; las filas válidas se guardan aunque otras fallen.
+    """
+    categorias = _mapa(Categoria, 'descripcion')
+    marcas = _mapa(Marca, 'nombre')
+    resultado = {'total': 0, 'creados': 0, 'errores': []}
+    vistos = set()
+    pendientes = []
+
+    for fila, datos in enumerate(leer_filas(archivo, formato), start=1):
+        resultado['total'] += 1
+        producto, errores = _validar(datos, categorias, marcas)
+        if producto is not None and _clave(producto) in vistos:
+            errores = {'non_field_errors': 'Producto repetido en el archivo'}
+        if errores:
+            resultado['errores'].append({'fila': fila, 'errores': errores})
+            continue
+
+        vistos.add(_clave(producto))
+        pendientes.append((fila, producto))
+        if len(pendientes) >= lote:
+            _guardar_lote(pendientes, resultado)
+            pendientes = []
+
+    if pendientes:
+        _guardar_lote(pendientes, resultado)
+
+    # bulk_create no envía post_save
+    if resultado['creados']:
+        cache_catalogo.invalidar()
+
+    return resultado
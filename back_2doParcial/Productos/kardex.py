@@ -0,0 +1,174 @@
+from datetime import datetime, time
+from decimal import Decimal
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import FraccionInventario, Inventario, MovimientoInventario, SnapshotInventario
+
+# Kardex de inventario: cada cambio de Inventario.cantidad deja un
+# MovimientoInventario en la misma transacción, y snapshot_inventario guarda
+# periódicamente la cantidad de todos los productos. El stock a una fecha es
+# el snapshot anterior más cercano más los movimientos entre ese snapshot y
+# la fecha: un rango acotado del índice (producto_id, fecha), no el
+# historial completo.
+
+
+def registrar(movimientos, motivo='', usuario=None, tipo=None):
+    """
+    Agrega [(producto_id, delta), ...] al kardex. Sin `tipo`, los deltas
+    positivos son entradas y los negativos salidas; los deltas en cero se
+    omiten. Se llama después de escribir el inventario, dentro de la misma
+    transacción (ver tomar_snapshot).
+    """
+    filas = [
+        MovimientoInventario(
+            producto_id=producto_id,
+            tipo=tipo or ('entrada' if delta > 0 else 'salida'),
+            cantidad=delta,
+            motivo=motivo,
+            usuario=usuario,
+        )
+        for producto_id, delta in movimientos if delta
+    ]
+    return MovimientoInventario.objects.bulk_create(filas) if filas else []
+
+
+def leer_fecha(valor):
+    """
+    Acepta una fecha y hora ISO o solo una fecha (hasta el final de ese día).
+    Sin valor devuelve ahora. Lanza ValueError si no se puede interpretar.
+    """
+    if not valor:
+        return timezone.now()
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(f'Fecha inválida: {valor}. Use AAAA-MM-DD o AAAA-MM-DDTHH:MM:SS')
+        fecha = datetime.combine(dia, time.max)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def stock_en(producto_id, fecha):
+    """
+    Cantidad de un producto a una fecha. Devuelve también desde qué snapshot
+    se partió y cuántos movimientos hubo que sumar.
+    """
+    snapshot = (
+        SnapshotInventario.objects
+        .filter(producto_id=producto_id, fecha__lte=fecha)
+        .order_by('-fecha')
+        .values('fecha', 'cantidad')
+        .first()
+    )
+    movimientos = MovimientoInventario.objects.filter(producto_id=producto_id, fecha__lte=fecha)
+    if snapshot is not None:
+        movimientos = movimientos.filter(fecha__gt=snapshot['fecha'])
+    suma = movimientos.aggregate(total=Sum('cantidad'), movimientos=Count('id'))
+
+    return {
+        'producto_id': producto_id,
+        'fecha': fecha,
+        'cantidad': (snapshot['cantidad'] if snapshot else 0) + (suma['total'] or 0),
+        'snapshot': snapshot['fecha'] if snapshot else None,
+        'movimientos': suma['movimientos'],
+    }
+
+
+SQL_VALORIZACION = """
+    WITH corte AS (
+        SELECT max(fecha) AS fecha FROM snapshots_inventario WHERE fecha <= %(fecha)s
+    ),
+    stock AS (
+        SELECT producto_id, sum(cantidad) AS cantidad
+        FROM (
+            SELECT s.producto_id, s.cantidad
+            FROM snapshots_inventario s JOIN corte ON s.fecha = corte.fecha
+            UNION ALL
+            SELECT m.producto_id, m.cantidad
+            FROM movimientos_inventario m, corte
+            WHERE m.fecha > coalesce(corte.fecha, '-infinity') AND m.fecha <= %(fecha)s
+        ) t
+        GROUP BY producto_id
+    )
+    SELECT p.categoria_id, c.descripcion, count(*), sum(st.cantidad), sum(st.cantidad * p.precio)
+    FROM stock st
+    JOIN productos p ON p.id = st.producto_id
+    JOIN categorias c ON c.id = p.categoria_id
+    WHERE st.cantidad <> 0
+    GROUP BY p.categoria_id, c.descripcion
+    ORDER BY 5 DESC, c.descripcion
+"""
+
+
+def valorizacion(fecha, using=DEFAULT_DB_ALIAS):
+    """
+    Unidades y valor del inventario a una fecha, por categoría. Parte del
+    último snapshot anterior a la fecha (todos los productos comparten el
+    corte) y suma solo los movimientos posteriores. El valor usa el precio
+    actual: los productos no guardan historial de precios.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(SQL_VALORIZACION, {'fecha': fecha})
+        filas = cursor.fetchall()
+
+    categorias = [
+        {'categoria_id': categoria_id, 'descripcion': descripcion, 'productos': productos,
+         'unidades': unidades, 'valor': valor}
+        for categoria_id, descripcion, productos, unidades, valor in filas
+    ]
+    return {
+        'fecha': fecha,
+        'unidades': sum(categoria['unidades'] for categoria in categorias),
+        'valor': sum((categoria['valor'] for categoria in categorias), start=Decimal('0')),
+        'categorias': categorias,
+    }
+
+
+def tomar_snapshot(using=DEFAULT_DB_ALIAS):
+    """
+    Guarda la cantidad actual de todos los inventarios con una misma fecha.
+
+    LOCK ... IN SHARE MODE espera a las transacciones que están escribiendo
+    el inventario o sus fracciones y frena las nuevas hasta el commit. Como cada movimiento se
+    inserta después de escribir el inventario y con clock_timestamp(), todo
+    movimiento con fecha <= la del snapshot ya está incluido en él y todo
+    movimiento posterior tiene una fecha mayor. Devuelve (fecha, filas).
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None, 0
+
+    inventarios, partes = Inventario._meta.db_table, FraccionInventario._meta.db_table
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {inventarios}, {partes} IN SHARE MODE')
+        cursor.execute('SELECT clock_timestamp()')
+        fecha = cursor.fetchone()[0]
+        # Inventarios fraccionados: la cantidad real es lo reservado más las fracciones
+        cursor.execute(
+            f"""
+            INSERT INTO {SnapshotInventario._meta.db_table} (producto_id, fecha, cantidad)
+            SELECT i.producto_id, %s, CASE WHEN i.fracciones > 0
+                THEN i.reservado + coalesce((SELECT sum(f.cantidad) FROM {partes} f WHERE f.inventario_id = i.id), 0)
+                ELSE i.cantidad END
+            FROM {inventarios} i
+            """,
+            [fecha]
+        )
+        return fecha, cursor.rowcount
+
+
+def snapshot_inicial(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    El inventario cargado antes del kardex no tiene movimientos: un primer
+    snapshot fija ese punto de partida. Se ejecuta en post_migrate.
+    """
+    if connections[using].vendor != 'postgresql':
+        return
+    if SnapshotInventario.objects.using(using).exists():
+        return
+    if Inventario.objects.using(using).exists():
+        tomar_snapshot(using)
@@ -0,0 +1,137 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from Productos.atributos import facetas_atributos, filtrar_atributos
+from Productos.models import CatalogoProducto, Producto
+
+# Atributo k toma 2 + 2 * (k % 10) valores distintos: hay atributos de pocos
+# valores (muy poco selectivos) y de muchos. Nombres y valores son ASCII en
+# minúscula salvo la inicial, así lower() coincide con normalizar().
+SQL_ESPECIFICACIONES = """
+    INSERT INTO especificaciones (producto_id, nombre, descripcion, estado, clave, valor)
+    SELECT id, 'Atributo ' || k, 'Valor ' || v, true, 'atributo ' || k, 'valor ' || v
+    FROM (
+        SELECT p.id, k, floor(random() * (2 + 2 * (k %% 10)))::int + 1 AS v
+        FROM unnest(%(ids)s::bigint[]) p(id)
+        CROSS JOIN generate_series(1, %(atributos)s) k
+    ) s
+"""
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el filtro por especificaciones con un volumen sintético: '
+        'contención sobre el índice GIN del catálogo contra un join por '
+        'atributo sobre especificaciones, y las facetas de una categoría. Los '
+        'datos se descartan al terminar salvo con --conservar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=100_000, help='Productos a los que se agregan especificaciones')
+        parser.add_argument('--atributos', type=int, default=20, help='Especificaciones por producto')
+        parser.add_argument('--consultas', type=int, default=20, help='Consultas a medir por modo')
+        parser.add_argument('--conservar', action='store_true', help='No descartar los datos generados')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El filtro por especificaciones requiere PostgreSQL')
+        if options['productos'] < 1 or options['atributos'] < 2 or options['consultas'] < 1:
+            raise CommandError('--productos y --consultas deben ser mayores a 0 y --atributos al menos 2')
+
+        ids = list(
+            Producto.objects.filter(estado=True).order_by('id').values_list('id', flat=True)[:options['productos']]
+        )
+        if not ids:
+            raise CommandError('No hay productos: cargue algunos antes de medir')
+
+        try:
+            with transaction.atomic():
+                self._medir(ids, options)
+                if not options['conservar']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write('Datos generados descartados')
+
+    def _cronometrar(self, titulo, funcion, repeticiones=1):
+        tiempos, resultados = [], []
+        for indice in range(repeticiones):
+            inicio = time.perf_counter()
+            resultados.append(funcion(indice))
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        if repeticiones == 1:
+            self.stdout.write(f'{titulo}: {tiempos[0]:.1f} ms')
+        else:
+            p95 = sorted(tiempos)[min(int(len(tiempos) * 0.95), len(tiempos) - 1)]
+            self.stdout.write(f'{titulo}: mediana {statistics.median(tiempos):.2f} ms, p95 {p95:.2f} ms')
+        return resultados
+
+    def _medir(self, ids, options):
+        atributos = options['atributos']
+        self.stdout.write(f'{len(ids)} productos, {atributos} especificaciones por producto')
+
+        with connection.cursor() as cursor:
+            self._cronometrar(
+                'Generar especificaciones (con refresco del catálogo)',
+                lambda _: cursor.execute(SQL_ESPECIFICACIONES, {'ids': ids, 'atributos': atributos})
+            )
+            cursor.execute('ANALYZE especificaciones')
+            cursor.execute('ANALYZE catalogo_productos')
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_relation_size('especificaciones')), "
+                "pg_size_pretty(pg_relation_size('especificaciones_atributo_idx')), "
+                "pg_size_pretty(pg_relation_size('catalogo_atributos_idx'))"
+            )
+            tabla, indice, gin = cursor.fetchone()
+            self.stdout.write(f'Especificaciones {tabla}, índice (clave, valor) {indice}, GIN del catálogo {gin}')
+
+        categoria_id = Producto.objects.get(pk=ids[0]).categoria_id
+        azar = random.Random(42)
+
+        def valor(k):
+            return f'valor {azar.randint(1, 2 + 2 * (k % 10))}'
+
+        # Dos atributos de un valor y uno con un O de dos valores, distintos en cada consulta
+        filtros = []
+        for _ in range(options['consultas']):
+            k1, k2, k3 = azar.sample(range(1, atributos + 1), 3) if atributos >= 3 else (1, 2, None)
+            filtro = {f'atributo {k1}': [valor(k1)], f'atributo {k2}': [valor(k2)]}
+            if k3 is not None:
+                filtro[f'atributo {k3}'] = sorted({valor(k3), valor(k3)})
+            filtros.append(filtro)
+
+        catalogo = CatalogoProducto.objects.filter(categoria_id=categoria_id)
+
+        def con_indice(indice):
+            productos = filtrar_atributos(catalogo, filtros[indice])
+            return productos.count(), list(productos.values_list('id', flat=True)[:20])
+
+        def sin_indice(indice):
+            # Un join a especificaciones por atributo, comparando sin mayúsculas como antes de normalizar
+            productos = Producto.objects.filter(categoria_id=categoria_id, estado=True)
+            for clave, valores in filtros[indice].items():
+                ids_atributo = Producto.objects.filter(
+                    especificaciones__estado=True, especificaciones__nombre__iexact=clave,
+                    especificaciones__descripcion__iregex=r'^(' + '|'.join(valores) + r')$'
+                ).values('id')
+                productos = productos.filter(id__in=ids_atributo)
+            return productos.count(), list(productos.order_by('-id').values_list('id', flat=True)[:20])
+
+        consultas = len(filtros)
+        rapidos = self._cronometrar('Filtro, contención en el GIN del catálogo', con_indice, consultas)
+        lentos = self._cronometrar('Filtro, join por atributo sobre especificaciones', sin_indice, consultas)
+        self.stdout.write(f'  productos por consulta: {statistics.mean(total for total, _ in rapidos):.0f} en promedio')
+        distintos = sum(rapido != lento for rapido, lento in zip(rapidos, lentos))
+        if distintos:
+            self.stderr.write(self.style.ERROR(f'{distintos} consultas no coinciden entre ambos modos'))
+
+        self._cronometrar('Facetas de la categoría sin filtros', lambda _: facetas_atributos(catalogo, {}))
+        self._cronometrar(
+            'Facetas de la categoría con filtros',
+            lambda indice: facetas_atributos(catalogo, filtros[indice]), min(consultas, 5)
+        )
@@ -0,0 +1,116 @@
+import os
+import statistics
+import tempfile
+import time
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from Categorias.models import Categoria
+from Marcas.models import Marca
+from Productos.imagenes import AlmacenArchivos, Circuito, ColaImagenes, guardar_en_staging, recibir, recibir_lote
+from Productos.models import ImagenProducto, Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la latencia de recibir imágenes subiéndolas dentro de la '
+        'petición, con la cola en segundo plano y por lotes (incluido el reenvío '
+        'de archivos ya subidos), sobre el backend de archivos con latencia '
+        'simulada (no usa la red). Crea un producto temporal y lo borra al terminar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--imagenes', type=int, default=50, help='Imágenes por modo')
+        parser.add_argument('--kb', type=int, default=200, help='Tamaño de cada imagen')
+        parser.add_argument('--latencia-ms', type=float, default=300, help='Latencia simulada del almacenamiento')
+        parser.add_argument('--trabajadores', type=int, default=4, help='Hilos de la cola')
+
+    def handle(self, *args, **options):
+        if options['imagenes'] < 1 or options['trabajadores'] < 1:
+            raise CommandError('--imagenes y --trabajadores deben ser mayores a 0')
+
+        categoria = Categoria.objects.create(descripcion=f'Benchmark imágenes {time.time_ns()}')
+        marca = Marca.objects.create(nombre=f'Benchmark imágenes {time.time_ns()}')
+        producto = Producto.objects.create(descripcion='Benchmark imágenes', precio='1.00', categoria=categoria, marca=marca)
+        contenido = os.urandom(options['kb'] * 1024)
+        try:
+            with tempfile.TemporaryDirectory() as carpeta, \
+                    override_settings(IMAGENES_STAGING_DIR=os.path.join(carpeta, 'staging')):
+                almacen = AlmacenArchivos(carpeta, '/media/benchmark/', latencia=options['latencia_ms'] / 1000)
+                self.stdout.write(
+                    f"{options['imagenes']} imágenes de {options['kb']} KB, "
+                    f"{options['latencia_ms']} ms por subida, {options['trabajadores']} trabajadores"
+                )
+                self._sincrono(producto, contenido, almacen, options)
+                self._cola(producto, contenido, almacen, options)
+                self._lotes(producto, contenido, almacen, options)
+        finally:
+            ImagenProducto.objects.filter(producto=producto).delete()
+            Producto.objects.filter(pk=producto.pk).delete()
+            Categoria.objects.filter(pk=categoria.pk).delete()
+            Marca.objects.filter(pk=marca.pk).delete()
+
+    def _archivo(self, contenido, numero):
+        # Contenido distinto por número para que la deduplicación no intervenga
+        return SimpleUploadedFile(f'imagen-{numero}.jpg', contenido + numero.to_bytes(4, 'big'), content_type='image/jpeg')
+
+    def _nueva_cola(self, almacen, options):
+        return ColaImagenes(
+            almacen=almacen, trabajadores=options['trabajadores'],
+            circuito=Circuito(fallos=options['imagenes'] + 1)
+        )
+
+    def _informar(self, titulo, latencias, total):
+        latencias.sort()
+        self.stdout.write(
+            f'{titulo}: petición mediana {statistics.median(latencias) * 1000:.1f} ms, '
+            f'p95 {latencias[min(int(len(latencias) * 0.95), len(latencias) - 1)] * 1000:.1f} ms, '
+            f'todas subidas en {total:.2f} s'
+        )
+
+    def _sincrono(self, producto, contenido, almacen, options):
+        latencias = []
+        inicio = time.perf_counter()
+        for numero in range(options['imagenes']):
+            comienzo = time.perf_counter()
+            with transaction.atomic():
+                ruta, _ = guardar_en_staging(self._archivo(contenido, numero))
+                ImagenProducto.objects.create(producto=producto, imagen=almacen.subir(ruta))
+                os.unlink(ruta)
+            latencias.append(time.perf_counter() - comienzo)
+        self._informar('Subida en la petición', latencias, time.perf_counter() - inicio)
+
+    def _cola(self, producto, contenido, almacen, options):
+        cola = self._nueva_cola(almacen, options)
+        latencias = []
+        inicio = time.perf_counter()
+        for numero in range(options['imagenes'], options['imagenes'] * 2):
+            comienzo = time.perf_counter()
+            with transaction.atomic():
+                recibir(self._archivo(contenido, numero), producto, destino=cola)
+            latencias.append(time.perf_counter() - comienzo)
+        cola.esperar()
+        total = time.perf_counter() - inicio
+        self._informar('Cola en segundo plano', latencias, total)
+
+        sin_subir = ImagenProducto.objects.filter(producto=producto).exclude(estado_carga='lista').count()
+        if sin_subir:
+            self.stderr.write(self.style.ERROR(f'{sin_subir} imágenes no quedaron listas'))
+
+    def _lotes(self, producto, contenido, almacen, options):
+        numeros = range(options['imagenes'] * 2, options['imagenes'] * 3)
+        tamanio = settings.IMAGENES_MAX_LOTE
+        for titulo in ('Lotes nuevos', 'Lotes reenviados'):
+            cola = self._nueva_cola(almacen, options)
+            latencias, reutilizadas = [], 0
+            inicio = time.perf_counter()
+            for desde in range(0, len(numeros), tamanio):
+                archivos = [self._archivo(contenido, numero) for numero in numeros[desde:desde + tamanio]]
+                comienzo = time.perf_counter()
+                reutilizadas += recibir_lote(archivos, producto, destino=cola)['reutilizadas']
+                latencias.append(time.perf_counter() - comienzo)
+            cola.esperar()
+            self._informar(f'{titulo} de {tamanio}', latencias, time.perf_counter() - inicio)
+            self.stdout.write(f'  {reutilizadas} de {len(numeros)} reutilizadas sin subir')
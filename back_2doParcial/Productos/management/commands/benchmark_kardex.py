@@ -0,0 +1,151 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from Productos.kardex import stock_en, valorizacion
+from Productos.models import MovimientoInventario, Producto
+
+SQL_MOVIMIENTOS = """
+    INSERT INTO movimientos_inventario (producto_id, tipo, cantidad, motivo, fecha)
+    SELECT (%(ids)s::bigint[])[1 + g %% cardinality(%(ids)s::bigint[])],
+           CASE WHEN r < 5 THEN 'salida' ELSE 'entrada' END,
+           CASE WHEN r < 5 THEN r - 5 ELSE r - 4 END,
+           'benchmark',
+           %(inicio)s::timestamptz + g * %(paso)s::interval
+    FROM (SELECT g, floor(random() * 15)::int AS r FROM generate_series(1, %(filas)s) g) s
+"""
+
+# Un snapshot por producto y por corte: suma acumulada de los movimientos de
+# cada tramo (inicio + (k-1)*cada, inicio + k*cada]
+SQL_SNAPSHOTS = """
+    WITH tramos AS (
+        SELECT producto_id,
+               ceil(extract(epoch FROM fecha - %(inicio)s::timestamptz) / %(cada)s)::int AS tramo,
+               sum(cantidad) AS suma
+        FROM movimientos_inventario
+        WHERE motivo = 'benchmark'
+        GROUP BY 1, 2
+    )
+    INSERT INTO snapshots_inventario (producto_id, fecha, cantidad)
+    SELECT p.id, %(inicio)s::timestamptz + t.tramo * %(cada)s * interval '1 second',
+           sum(coalesce(tr.suma, 0)) OVER (PARTITION BY p.id ORDER BY t.tramo)
+    FROM unnest(%(ids)s::bigint[]) p(id)
+    CROSS JOIN generate_series(1, %(cortes)s) t(tramo)
+    LEFT JOIN tramos tr ON tr.producto_id = p.id AND tr.tramo = t.tramo
+"""
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el kardex con un volumen sintético: stock a una fecha con y sin '
+        'snapshots, listado de movimientos y valorización. Los datos se '
+        'descartan al terminar salvo con --conservar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=50_000_000, help='Movimientos a generar')
+        parser.add_argument('--productos', type=int, default=10_000, help='Productos entre los que se reparten')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historia')
+        parser.add_argument('--snapshot-cada', type=int, default=7, help='Días entre snapshots')
+        parser.add_argument('--consultas', type=int, default=200, help='Consultas de stock a medir')
+        parser.add_argument('--conservar', action='store_true', help='No descartar los datos generados')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El kardex requiere PostgreSQL')
+        if options['filas'] < 1 or options['productos'] < 1 or options['dias'] < 1 or options['snapshot_cada'] < 1:
+            raise CommandError('--filas, --productos, --dias y --snapshot-cada deben ser mayores a 0')
+
+        ids = list(Producto.objects.order_by('id').values_list('id', flat=True)[:options['productos']])
+        if not ids:
+            raise CommandError('No hay productos: cargue algunos antes de medir')
+
+        try:
+            with transaction.atomic():
+                self._medir(ids, options)
+                if not options['conservar']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write('Datos generados descartados')
+
+    def _cronometrar(self, titulo, funcion, repeticiones=1):
+        tiempos = []
+        for indice in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(indice)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        if repeticiones == 1:
+            self.stdout.write(f'{titulo}: {tiempos[0]:.1f} ms')
+        else:
+            p95 = sorted(tiempos)[int(len(tiempos) * 0.95) - 1]
+            self.stdout.write(f'{titulo}: mediana {statistics.median(tiempos):.2f} ms, p95 {p95:.2f} ms')
+
+    def _medir(self, ids, options):
+        filas, dias, cada = options['filas'], options['dias'], options['snapshot_cada']
+        fin = timezone.now() - timedelta(days=1)
+        inicio = fin - timedelta(days=dias)
+        parametros = {
+            'ids': ids, 'inicio': inicio, 'filas': filas,
+            'paso': timedelta(days=dias) / filas,
+            'cada': cada * 86400, 'cortes': dias // cada,
+        }
+        self.stdout.write(f'{filas} movimientos, {len(ids)} productos, {dias} días, snapshot cada {cada} días')
+
+        with connection.cursor() as cursor:
+            self._cronometrar('Generar movimientos', lambda _: cursor.execute(SQL_MOVIMIENTOS, parametros))
+            self._cronometrar('Generar snapshots', lambda _: cursor.execute(SQL_SNAPSHOTS, parametros))
+            # Los rangos recién insertados no están resumidos hasta el próximo autovacuum
+            cursor.execute("SELECT brin_summarize_new_values('movimientos_fecha_brin')")
+            cursor.execute('ANALYZE movimientos_inventario')
+            cursor.execute('ANALYZE snapshots_inventario')
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_relation_size('movimientos_inventario')), "
+                "pg_size_pretty(pg_relation_size('movimientos_producto_fecha_idx')), "
+                "pg_size_pretty(pg_relation_size('movimientos_fecha_brin'))"
+            )
+            tabla, indice, brin = cursor.fetchone()
+            self.stdout.write(f'Tabla {tabla}, índice (producto_id, fecha) {indice}, BRIN fecha {brin}')
+
+        azar = random.Random(42)
+        muestras = [
+            (azar.choice(ids), inicio + timedelta(seconds=azar.uniform(0, dias * 86400)))
+            for _ in range(options['consultas'])
+        ]
+
+        con_snapshots, completos = [], []
+
+        def con_snapshot(indice):
+            con_snapshots.append(stock_en(*muestras[indice]))
+
+        def sin_snapshot(indice):
+            producto_id, fecha = muestras[indice]
+            completos.append(MovimientoInventario.objects.filter(
+                producto_id=producto_id, fecha__lte=fecha
+            ).aggregate(total=Sum('cantidad'))['total'] or 0)
+
+        consultas = len(muestras)
+        self._cronometrar('Stock a una fecha, snapshot + rango', con_snapshot, consultas)
+        promedio = statistics.mean(resultado['movimientos'] for resultado in con_snapshots)
+        self.stdout.write(f'  movimientos sumados por consulta: {promedio:.0f} en promedio')
+        self._cronometrar('Stock a una fecha, historial completo', sin_snapshot, consultas)
+        distintos = sum(
+            resultado['cantidad'] != completo for resultado, completo in zip(con_snapshots, completos)
+        )
+        if distintos:
+            self.stderr.write(self.style.ERROR(f'{distintos} consultas no coinciden con el historial completo'))
+
+        def listado(indice):
+            producto_id, fecha = muestras[indice]
+            return list(MovimientoInventario.objects.filter(producto_id=producto_id, fecha__lte=fecha)[:50])
+
+        self._cronometrar('Listado de movimientos (50, hasta una fecha)', listado, consultas)
+        self._cronometrar('Valorización a mitad del período', lambda _: valorizacion(inicio + (fin - inicio) / 2))
+        self._cronometrar('Valorización al final del período', lambda _: valorizacion(fin))
@@ -0,0 +1,100 @@
+import statistics
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from Categorias.models import Categoria
+from Marcas.models import Marca
+from Productos.fracciones import MAX_FRACCIONES, configurar
+from Productos.models import Inventario, MovimientoInventario, Producto
+from Productos.stock import StockInsuficiente, ajustar, cantidad_real
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara ventas simultáneas de un mismo producto con el stock en una '
+        'sola fila y fraccionado. Crea un producto temporal y lo borra al terminar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trabajadores', type=int, default=8, help='Hilos vendiendo a la vez')
+        parser.add_argument('--ventas', type=int, default=2000, help='Ventas de una unidad por modo')
+        parser.add_argument('--fracciones', type=int, default=16, help='Fracciones del modo fraccionado')
+        parser.add_argument(
+            '--trabajo-ms', type=float, default=2.0,
+            help='Resto de la transacción de venta (pedido, pago...) con el bloqueo tomado'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El benchmark requiere PostgreSQL')
+        if options['trabajadores'] < 1 or options['ventas'] < 1:
+            raise CommandError('--trabajadores y --ventas deben ser mayores a 0')
+        if not 1 <= options['fracciones'] <= MAX_FRACCIONES:
+            raise CommandError(f'--fracciones debe estar entre 1 y {MAX_FRACCIONES}')
+
+        categoria = Categoria.objects.create(descripcion=f'Benchmark stock {time.time_ns()}')
+        marca = Marca.objects.create(nombre=f'Benchmark stock {time.time_ns()}')
+        producto = Producto.objects.create(descripcion='Benchmark stock', precio='1.00', categoria=categoria, marca=marca)
+        Inventario.objects.create(cantidad=0, ubicacion='Benchmark', producto=producto)
+        try:
+            self.stdout.write(
+                f"{options['ventas']} ventas, {options['trabajadores']} trabajadores, "
+                f"{options['trabajo_ms']} ms de trabajo por venta"
+            )
+            for titulo, fracciones in (('Una fila', 0), (f"{options['fracciones']} fracciones", options['fracciones'])):
+                self._medir(titulo, producto.id, fracciones, options)
+        finally:
+            MovimientoInventario.objects.filter(producto=producto).delete()
+            Producto.objects.filter(pk=producto.pk).delete()
+            Categoria.objects.filter(pk=categoria.pk).delete()
+            Marca.objects.filter(pk=marca.pk).delete()
+
+    def _medir(self, titulo, producto_id, fracciones, options):
+        # Justo el stock para todas las ventas: al final las fracciones se vacían y se barren
+        Inventario.objects.filter(producto_id=producto_id).update(cantidad=options['ventas'], reservado=0)
+        configurar(producto_id, fracciones)
+
+        trabajo = options['trabajo_ms'] / 1000
+        trabajadores = options['trabajadores']
+        latencias, vendidas, rechazadas = [], [], []
+
+        def vender(ventas):
+            propias = []
+            rechazos = 0
+            try:
+                with connection.cursor() as cursor:
+                    for _ in range(ventas):
+                        inicio = time.perf_counter()
+                        try:
+                            with transaction.atomic():
+                                ajustar(producto_id, 'decrementar', 1, 'benchmark')
+                                if trabajo:
+                                    cursor.execute('SELECT pg_sleep(%s)', [trabajo])
+                        except StockInsuficiente:
+                            rechazos += 1
+                        propias.append(time.perf_counter() - inicio)
+            finally:
+                connections.close_all()
+            latencias.extend(propias)
+            vendidas.append(ventas - rechazos)
+            rechazadas.append(rechazos)
+
+        reparto = [options['ventas'] // trabajadores + (1 if i < options['ventas'] % trabajadores else 0)
+                   for i in range(trabajadores)]
+        hilos = [threading.Thread(target=vender, args=(ventas,)) for ventas in reparto]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        inventario = cantidad_real(Inventario.objects.get(producto_id=producto_id))
+        latencias.sort()
+        self.stdout.write(
+            f'{titulo}: {sum(vendidas) / duracion:.0f} ventas/s, '
+            f'latencia mediana {statistics.median(latencias) * 1000:.1f} ms, '
+            f'p95 {latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms, '
+            f'{sum(vendidas)} vendidas, {sum(rechazadas)} rechazadas, stock final {inventario.cantidad}'
+        )
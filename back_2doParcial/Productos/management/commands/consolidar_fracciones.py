@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from Productos.fracciones import consolidar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el total cacheado de los inventarios fraccionados'
+
+    def handle(self, *args, **options):
+        total = consolidar()
+        self.stdout.write(self.style.SUCCESS(f'{total} inventarios fraccionados consolidados'))
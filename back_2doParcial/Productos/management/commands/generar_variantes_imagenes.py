@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from Productos.imagenes import obtener_almacen, publicar
+from Productos.models import ImagenProducto
+
+
+class Command(BaseCommand):
+    help = (
+        'Guarda la URL y las variantes de las imágenes listas que no las '
+        'tienen (subidas antes de las variantes o con variantes fallidas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Regenerar también las que ya tienen variantes')
+
+    def handle(self, *args, **options):
+        imagenes = ImagenProducto.objects.filter(estado_carga='lista', imagen__isnull=False)
+        if not options['todas']:
+            imagenes = imagenes.filter(variantes={})
+
+        almacen = obtener_almacen()
+        publicadas, fallidas = 0, 0
+        for imagen in imagenes.order_by('id').iterator():
+            imagen.url, imagen.variantes, imagen.error = publicar(almacen, imagen.imagen)
+            imagen.save(update_fields=['url', 'variantes', 'error'])
+            if imagen.error:
+                fallidas += 1
+                self.stderr.write(f'Imagen {imagen.pk}: {imagen.error}')
+            else:
+                publicadas += 1
+        self.stdout.write(self.style.SUCCESS(f'{publicadas} imágenes con variantes, {fallidas} fallidas'))
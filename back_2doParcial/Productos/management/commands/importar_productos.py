@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from Productos.importacion import FORMATOS, LOTE_POR_DEFECTO, importar_productos
+
+
+class Command(BaseCommand):
+    help = 'Importa productos en lote desde un archivo CSV o NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo a importar')
+        parser.add_argument('--formato', choices=FORMATOS, help='Por defecto se deduce de la extensión')
+        parser.add_argument('--lote', type=int, default=LOTE_POR_DEFECTO, help='Filas por INSERT')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or ('ndjson' if ruta.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a 0')
+
+        try:
+            with open(ruta, 'rb') as archivo:
+                resultado = importar_productos(archivo, formato, options['lote'])
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+
+        for error in resultado['errores']:
+            self.stderr.write(f"Fila {error['fila']}: {error['errores']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} de {resultado['total']} productos importados, "
+            f"{len(resultado['errores'])} con errores"
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from Productos.imagenes import cola, recuperar
+from Productos.models import ImagenProducto
+
+
+class Command(BaseCommand):
+    help = (
+        'Vuelve a encolar las imágenes pendientes o cortadas por un reinicio '
+        'y espera a que terminen de subirse'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reintentar-errores', action='store_true', help='Incluir las que terminaron con error')
+        parser.add_argument('--timeout', type=float, default=None, help='Segundos máximos de espera')
+
+    def handle(self, *args, **options):
+        ids = recuperar(reintentar_errores=options['reintentar_errores'])
+        self.stdout.write(f'{len(ids)} imágenes pendientes')
+        for imagen_id in ids:
+            cola.encolar(imagen_id)
+        if not cola.esperar(options['timeout']):
+            self.stderr.write(self.style.WARNING('Quedaron subidas en curso al vencer el timeout'))
+
+        estados = dict(
+            ImagenProducto.objects.filter(pk__in=ids)
+            .values_list('estado_carga').annotate(total=Count('id')).order_by()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Listas: {estados.get('lista', 0)}, pendientes: {estados.get('pendiente', 0)}, "
+            f"con error: {estados.get('error', 0)}"
+        ))
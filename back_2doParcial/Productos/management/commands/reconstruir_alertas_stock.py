@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from Productos.alertas import instalar_alertas, reconstruir_alertas
+from Productos.models import AlertaStock
+
+
+class Command(BaseCommand):
+    help = 'Reinstala los triggers de alertas de stock y las recalcula completas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias de la base de datos')
+
+    def handle(self, *args, **options):
+        instalar_alertas(using=options['database'])
+        reconstruir_alertas(using=options['database'])
+        total = AlertaStock.objects.using(options['database']).count()
+        self.stdout.write(self.style.SUCCESS(f'Alertas de stock reconstruidas: {total} productos bajo su punto de reorden'))
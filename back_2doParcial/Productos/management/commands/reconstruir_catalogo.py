@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from Productos.catalogo import instalar_catalogo, reconstruir_catalogo
+from Productos.models import CatalogoProducto
+
+
+class Command(BaseCommand):
+    help = 'Reinstala los triggers del catálogo de lectura y lo recalcula completo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias de la base de datos')
+
+    def handle(self, *args, **options):
+        instalar_catalogo(using=options['database'])
+        reconstruir_catalogo(using=options['database'])
+        total = CatalogoProducto.objects.using(options['database']).count()
+        self.stdout.write(self.style.SUCCESS(f'Catálogo reconstruido: {total} productos activos'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from Productos.kardex import tomar_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Guarda un snapshot de la cantidad de todos los inventarios (programarlo, por ejemplo, cada noche)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias de la base de datos')
+
+    def handle(self, *args, **options):
+        fecha, filas = tomar_snapshot(using=options['database'])
+        if fecha is None:
+            self.stdout.write(self.style.WARNING('El kardex requiere PostgreSQL'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Snapshot {fecha.isoformat()}: {filas} inventarios'))
@@ -1,7 +1,12 @@
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from Categorias.models import Categoria
 from Marcas.models import Marca
 from cloudinary.models import CloudinaryField # type: ignore
+from .normalizacion import normalizar_atributo
 
 class Producto(models.Model):
     descripcion = models.CharField(max_length=255)
@@ -19,11 +24,21 @@ class Producto(models.Model):
     estado = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
+    # Mantenido por trigger en la base de datos (ver busqueda.py)
+    busqueda = SearchVectorField(null=True, editable=False)
     
     class Meta:
         db_table = 'productos'
         ordering = ['-id']
         unique_together = ['descripcion', 'categoria', 'marca']
+        indexes = [
+            GinIndex(fields=['busqueda'], name='productos_busqueda_idx'),
+            # Filtros y conteos del catálogo con facetas (ver facetas.py)
+            models.Index(fields=['estado', 'categoria', 'marca', 'precio'], name='productos_facetas_idx'),
+            models.Index(fields=['estado', 'marca', 'precio'], name='productos_marca_precio_idx'),
+            # Duplicados de la importación masiva (ver importacion.py)
+            models.Index(Lower('descripcion'), 'categoria', 'marca', name='productos_duplicados_idx'),
+        ]
 
     def delete(self, *args, **kwargs):
         self.estado = False
@@ -45,12 +60,29 @@ class Especificacion(models.Model):
         related_name='especificaciones'
     )
     estado = models.BooleanField(default=True)
+    # nombre y descripcion normalizados para filtrar (ver normalizacion.py y atributos.py)
+    clave = models.CharField(max_length=100, blank=True, editable=False)
+    valor = models.CharField(max_length=100, blank=True, editable=False)
     
     class Meta:
         db_table = 'especificaciones'
         ordering = ['id']
         verbose_name = 'Especificación'
         verbose_name_plural = 'Especificaciones'
+        indexes = [
+            # Productos con un atributo dado y nombres para mostrar de las facetas
+            models.Index(
+                fields=['clave', 'valor', 'producto'], name='especificaciones_atributo_idx',
+                condition=Q(estado=True) & ~Q(valor='')
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.clave, self.valor = normalizar_atributo(self.nombre, self.descripcion)
+        campos = kwargs.get('update_fields')
+        if campos is not None and {'nombre', 'descripcion'} & set(campos):
+            kwargs['update_fields'] = {*campos, 'clave', 'valor'}
+        super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         self.estado = False
@@ -64,19 +96,40 @@ class Especificacion(models.Model):
         return f"{self.nombre} - {self.producto.descripcion}"
 
 class ImagenProducto(models.Model):
+    CARGA_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('subiendo', 'Subiendo'),
+        ('lista', 'Lista'),
+        ('error', 'Error'),
+    ]
+
     producto = models.ForeignKey(
         Producto,
         on_delete=models.CASCADE,
         related_name='imagenes'
     )
+    # Vacía hasta que la cola de imagenes.py la sube al almacenamiento
     imagen = CloudinaryField(
         'imagen',
         folder='productos/',
         transformation=[
             {'width': 800, 'height': 600, 'crop': 'limit'},
             {'quality': 'auto:good'}
-        ]
+        ],
+        null=True,
+        blank=True
     )
+    estado_carga = models.CharField(max_length=10, choices=CARGA_CHOICES, default='lista')
+    # Copia local del archivo recibido mientras la carga no termina
+    archivo_temporal = models.CharField(max_length=255, blank=True)
+    # SHA-256 del contenido: los archivos repetidos reutilizan la imagen ya subida
+    hash_contenido = models.CharField(max_length=64, blank=True)
+    # Guardadas al publicarse la imagen; variantes: {'miniatura': url, 'miniatura_webp': url, ...}
+    url = models.CharField(max_length=500, blank=True)
+    variantes = models.JSONField(default=dict, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    fecha_intento = models.DateTimeField(null=True, blank=True)
     es_principal = models.BooleanField(default=False)
     estado = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -86,6 +139,17 @@ class ImagenProducto(models.Model):
         ordering = ['-es_principal', 'id']
         verbose_name = 'Imagen de Producto'
         verbose_name_plural = 'Imágenes de Productos'
+        indexes = [
+            # Recuperación de cargas interrumpidas (procesar_imagenes_pendientes)
+            models.Index(
+                fields=['estado_carga', 'fecha_intento'], name='imagenes_carga_pendiente_idx',
+                condition=Q(estado_carga__in=['pendiente', 'subiendo'])
+            ),
+            models.Index(
+                fields=['hash_contenido'], name='imagenes_hash_lista_idx',
+                condition=Q(estado_carga='lista') & ~Q(hash_contenido='')
+            ),
+        ]
 
     def delete(self, *args, **kwargs):
         self.estado = False
@@ -100,6 +164,13 @@ class ImagenProducto(models.Model):
     
 class Inventario(models.Model):
     cantidad = models.IntegerField(default=0)
+    # Unidades apartadas por pedidos en curso; disponible = cantidad - reservado
+    reservado = models.IntegerField(default=0)
+    # 0: el stock vive en esta fila. N > 0: lo disponible se reparte en N
+    # FraccionInventario y `cantidad` es un total cacheado (ver fracciones.py)
+    fracciones = models.PositiveSmallIntegerField(default=0)
+    # Con cantidad <= punto_reorden el producto entra en alertas_stock; None = sin seguimiento
+    punto_reorden = models.IntegerField(null=True, blank=True)
     ubicacion = models.CharField(max_length=100)
     producto = models.OneToOneField(
         Producto,
@@ -114,6 +185,14 @@ class Inventario(models.Model):
         ordering = ['id']
         verbose_name = 'Inventario'
         verbose_name_plural = 'Inventarios'
+        indexes = [
+            # Solo las filas bajo su punto de reorden: unas pocas entradas aunque el catálogo crezca
+            models.Index(
+                fields=['ubicacion', 'id'],
+                condition=Q(estado=True, cantidad__lte=F('punto_reorden')),
+                name='inventario_bajo_stock_idx'
+            ),
+        ]
 
     def delete(self, *args, **kwargs):
         self.estado = False
@@ -124,4 +203,180 @@ class Inventario(models.Model):
         self.save()
 
     def __str__(self):
-        return f"Inventario - {self.producto.descripcion} ({self.cantidad})"
\ No newline at end of file
+        return f"Inventario - {self.producto.descripcion} ({self.cantidad})"
+
+
+class AlertaStock(models.Model):
+    """
+    Inventarios activos en o por debajo de su punto de reorden, mantenida
+    por triggers en la base de datos (ver alertas.py). Solo lectura.
+    """
+    inventario = models.OneToOneField(
+        Inventario,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='alerta_stock'
+    )
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    ubicacion = models.CharField(max_length=100)
+    cantidad = models.IntegerField()
+    punto_reorden = models.IntegerField()
+    # Desde cuándo está bajo el punto de reorden
+    fecha = models.DateTimeField()
+
+    class Meta:
+        db_table = 'alertas_stock'
+        ordering = ['ubicacion', 'id']
+        indexes = [
+            models.Index(fields=['ubicacion', 'id'], name='alertas_stock_ubicacion_idx'),
+        ]
+
+    @property
+    def faltante(self):
+        return self.punto_reorden - self.cantidad
+
+    def __str__(self):
+        return f"Alerta - {self.producto_id} ({self.cantidad}/{self.punto_reorden})"
+
+
+class FraccionInventario(models.Model):
+    """Una parte del disponible de un inventario fraccionado"""
+    inventario = models.ForeignKey(
+        Inventario,
+        on_delete=models.CASCADE,
+        related_name='fracciones_stock',
+        db_index=False  # cubierto por la restricción única
+    )
+    numero = models.PositiveSmallIntegerField()
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'fracciones_inventario'
+        ordering = ['inventario', 'numero']
+        constraints = [
+            models.UniqueConstraint(fields=['inventario', 'numero'], name='fracciones_inventario_numero_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Fracción {self.numero} - {self.inventario_id} ({self.cantidad})"
+
+
+class Reloj(models.Func):
+    """
+    clock_timestamp() de PostgreSQL: la hora real de la sentencia. now() es
+    la del inicio de la transacción y desordenaría movimientos y snapshots
+    de transacciones largas.
+    """
+    template = 'clock_timestamp()'
+    output_field = models.DateTimeField()
+
+
+class MovimientoInventario(models.Model):
+    """
+    Kardex: un movimiento por cada cambio de `Inventario.cantidad`. Solo se
+    agregan filas; nunca se editan ni se borran.
+    """
+    TIPOS = [
+        ('entrada', 'Entrada'),
+        ('salida', 'Salida'),
+        ('ajuste', 'Ajuste'),
+    ]
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.PROTECT,
+        related_name='movimientos',
+        db_index=False  # cubierto por el índice (producto, fecha)
+    )
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    # Con signo: lo que sumó o restó a la cantidad
+    cantidad = models.IntegerField()
+    motivo = models.CharField(max_length=255, blank=True)
+    usuario = models.ForeignKey(
+        'Usuarios.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_inventario'
+    )
+    fecha = models.DateTimeField(db_default=Reloj())
+
+    class Meta:
+        db_table = 'movimientos_inventario'
+        ordering = ['-fecha', '-id']
+        verbose_name = 'Movimiento de inventario'
+        verbose_name_plural = 'Movimientos de inventario'
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='movimientos_producto_fecha_idx'),
+            # La tabla crece en orden de fecha: un BRIN ocupa unos KB y sirve a los cortes por fecha.
+            # autosummarize: autovacuum resume los rangos nuevos, que sin resumir se leen siempre
+            BrinIndex(fields=['fecha'], name='movimientos_fecha_brin', autosummarize=True),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} - {self.producto_id}"
+
+
+class SnapshotInventario(models.Model):
+    """Cantidad de cada producto en un corte; el stock a una fecha parte del corte anterior más cercano"""
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.PROTECT,
+        related_name='snapshots',
+        db_index=False  # cubierto por el índice (producto, fecha)
+    )
+    fecha = models.DateTimeField()
+    cantidad = models.IntegerField()
+
+    class Meta:
+        db_table = 'snapshots_inventario'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='snapshots_producto_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='snapshots_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.fecha:%Y-%m-%d %H:%M} - {self.producto_id} ({self.cantidad})"
+
+
+class CatalogoProducto(models.Model):
+    """
+    Modelo de lectura del catálogo: una fila por producto activo, mantenida
+    por triggers en la base de datos (ver catalogo.py). Solo lectura.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    descripcion = models.CharField(max_length=255)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    categoria_id = models.BigIntegerField()
+    nombre_categoria = models.CharField(max_length=255)
+    marca_id = models.BigIntegerField()
+    nombre_marca = models.CharField(max_length=100)
+    cantidad = models.IntegerField(null=True)
+    ubicacion = models.CharField(max_length=100, null=True)
+    imagen_principal = CloudinaryField('imagen', null=True)
+    especificaciones = models.JSONField(default=list)
+    # {clave: [valores]} normalizados de las especificaciones filtrables (ver atributos.py)
+    atributos = models.JSONField(default=dict)
+    fecha_actualizacion = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = 'catalogo_productos'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['categoria_id', '-id'], name='catalogo_categoria_idx'),
+            models.Index(fields=['marca_id', '-id'], name='catalogo_marca_idx'),
+            # atributos @> '{"ram": ["16gb"], "color": ["negro"]}': la intersección la resuelve el índice
+            GinIndex(fields=['atributos'], opclasses=['jsonb_path_ops'], name='catalogo_atributos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.descripcion} - {self.nombre_marca}"
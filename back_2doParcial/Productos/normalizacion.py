@@ -0,0 +1,23 @@
+import re
+import unicodedata
+
+# Normalización de nombres y valores de especificaciones para filtrar:
+# "Memoria RAM" -> "memoria ram", "16 GB" -> "16gb", "Tamaño" -> "tamano".
+# Se aplica igual al guardar (Especificacion.save) y al leer los filtros
+# de la petición (atributos.py), así "RAM: 16 gb" encuentra "RAM: 16GB".
+
+VALOR_MAX = 100  # descripciones más largas son texto libre, no un valor filtrable
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter)).lower()
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    # Número y unidad juntos: "16 gb" y "16gb" son el mismo valor
+    return re.sub(r'(\d) (?=[a-z])', r'\1', texto)
+
+
+def normalizar_atributo(nombre, descripcion):
+    """(clave, valor) de una especificación; valor vacío si no es filtrable"""
+    valor = normalizar(descripcion)
+    return normalizar(nombre)[:100], valor if len(valor) <= VALOR_MAX else ''
@@ -1,11 +1,18 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Producto, Especificacion, Inventario
+from .models import Producto, Especificacion, Inventario, MovimientoInventario, AlertaStock
 from Categorias.models import Categoria
 from Marcas.models import Marca
-from .models import ImagenProducto
+from .models import ImagenProducto, CatalogoProducto
+from Api_2doParcial.campos import CamposDinamicosMixin
+from .imagenes import recibir, url_imagen
+from .especificaciones import MAX_ESPECIFICACIONES
+from .variantes import VARIANTES
 
 class ImagenProductoSerializer(serializers.ModelSerializer):
     imagen_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    srcset_webp = serializers.SerializerMethodField()
     producto_descripcion = serializers.CharField(source='producto.descripcion', read_only=True)
     
     class Meta:
@@ -14,16 +21,36 @@ class ImagenProductoSerializer(serializers.ModelSerializer):
             'id',
             'imagen',
             'imagen_url',
+            'variantes',
+            'srcset',
+            'srcset_webp',
             'producto',
             'producto_descripcion',
             'es_principal',
+            'estado_carga',
+            'error',
             'estado',
             'fecha_creacion'
         ]
-        read_only_fields = ['estado', 'fecha_creacion']
+        read_only_fields = ['variantes', 'estado_carga', 'error', 'estado', 'fecha_creacion']
 
     def get_imagen_url(self, obj):
-        return obj.imagen.url if obj.imagen else None
+        # Las imágenes anteriores a las columnas precalculadas no tienen url guardada
+        return obj.url or url_imagen(obj.imagen)
+
+    def _srcset(self, obj, sufijo):
+        # "url 150w, url 400w, url 800w": el cliente elige el tamaño según el ancho en pantalla
+        candidatos = [
+            f"{obj.variantes[nombre + sufijo]} {ancho}w"
+            for nombre, (ancho, _, _) in VARIANTES.items() if nombre + sufijo in obj.variantes
+        ]
+        return ', '.join(candidatos) or None
+
+    def get_srcset(self, obj):
+        return self._srcset(obj, '')
+
+    def get_srcset_webp(self, obj):
+        return self._srcset(obj, '_webp')
 
 class ImagenProductoCreateSerializer(serializers.Serializer):
     imagen = serializers.ImageField()
@@ -38,20 +65,25 @@ class ImagenProductoCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Producto no encontrado o inactivo")
 
     def create(self, validated_data):
-        # Si se marca como principal, desmarcar otras imágenes principales
-        if validated_data.get('es_principal'):
-            ImagenProducto.objects.filter(
-                producto=validated_data['producto_id'],
-                es_principal=True,
-                estado=True
-            ).update(es_principal=False)
-        
-        return ImagenProducto.objects.create(
-            imagen=validated_data['imagen'],
-            producto=validated_data['producto_id'],
+        # recibir desmarca la principal anterior y deja la subida en la cola de imagenes.py
+        return recibir(
+            validated_data['imagen'],
+            validated_data['producto_id'],
             es_principal=validated_data.get('es_principal', False)
         )
 
+class ImagenesLoteSerializer(serializers.Serializer):
+    imagenes = serializers.ListField(
+        child=serializers.ImageField(), allow_empty=False, max_length=settings.IMAGENES_MAX_LOTE
+    )
+    # Índice en `imagenes` de la que pasa a ser principal
+    principal = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        if data.get('principal') is not None and data['principal'] >= len(data['imagenes']):
+            raise serializers.ValidationError({'principal': 'Debe ser el índice de una de las imágenes enviadas'})
+        return data
+
 # Serializers para Especificaciones
 class EspecificacionSerializer(serializers.ModelSerializer):
     producto_descripcion = serializers.CharField(source='producto.descripcion', read_only=True)
@@ -87,8 +119,19 @@ class EspecificacionCreateSerializer(serializers.Serializer):
             producto=validated_data['producto_id']
         )
 
+class EspecificacionDeseadaSerializer(serializers.Serializer):
+    # Sin id se empareja con una activa del mismo nombre o se crea
+    id = serializers.IntegerField(required=False, allow_null=True)
+    nombre = serializers.CharField(max_length=100)
+    descripcion = serializers.CharField()
+
+class EspecificacionesSincronizarSerializer(serializers.Serializer):
+    especificaciones = serializers.ListField(
+        child=EspecificacionDeseadaSerializer(), allow_empty=True, max_length=MAX_ESPECIFICACIONES
+    )
+
 # Serializers para Inventario
-class InventarioSerializer(serializers.ModelSerializer):
+class InventarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     producto_descripcion = serializers.CharField(source='producto.descripcion', read_only=True)
     
     class Meta:
@@ -96,18 +139,49 @@ class InventarioSerializer(serializers.ModelSerializer):
         fields = [
             'id',
             'cantidad',
+            'reservado',
+            'fracciones',
+            'punto_reorden',
             'ubicacion',
             'producto',
             'producto_descripcion',
             'estado',
             'fecha_actualizacion'
         ]
-        read_only_fields = ['estado', 'fecha_actualizacion']
+        read_only_fields = ['reservado', 'fracciones', 'estado', 'fecha_actualizacion']
+
+    def validate_cantidad(self, value):
+        if self.instance is not None and value < self.instance.reservado:
+            raise serializers.ValidationError("La cantidad no puede ser menor que lo reservado")
+        return value
+
+    def validate_punto_reorden(self, value):
+        if value is not None and value < 0:
+            raise serializers.ValidationError("El punto de reorden no puede ser negativo")
+        return value
+
+class AlertaStockSerializer(serializers.ModelSerializer):
+    producto_descripcion = serializers.CharField(source='producto.descripcion', read_only=True)
+    faltante = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = AlertaStock
+        fields = [
+            'inventario',
+            'producto',
+            'producto_descripcion',
+            'cantidad',
+            'punto_reorden',
+            'faltante',
+            'fecha'
+        ]
+        read_only_fields = fields
 
 class InventarioCreateSerializer(serializers.Serializer):
     cantidad = serializers.IntegerField()
     ubicacion = serializers.CharField(max_length=100)
     producto_id = serializers.IntegerField()
+    punto_reorden = serializers.IntegerField(required=False, allow_null=True, min_value=0)
 
     def validate_producto_id(self, value):
         try:
@@ -126,11 +200,44 @@ class InventarioCreateSerializer(serializers.Serializer):
         return Inventario.objects.create(
             cantidad=validated_data['cantidad'],
             ubicacion=validated_data['ubicacion'],
-            producto=validated_data['producto_id']
+            producto=validated_data['producto_id'],
+            punto_reorden=validated_data.get('punto_reorden')
         )
 
+class MovimientoInventarioSerializer(serializers.ModelSerializer):
+    usuario_username = serializers.CharField(source='usuario.username', read_only=True, default=None)
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id', 'producto', 'tipo', 'cantidad', 'motivo', 'usuario', 'usuario_username', 'fecha']
+        read_only_fields = fields
+
 # Serializers para Producto 
-class ProductoSerializer(serializers.ModelSerializer):
+class UrlCloudinaryField(serializers.Field):
+    """URL pública de un CloudinaryField (según el backend de imágenes), solo lectura"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return url_imagen(value)
+
+class CatalogoProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    categoria = serializers.IntegerField(source='categoria_id', read_only=True)
+    marca = serializers.IntegerField(source='marca_id', read_only=True)
+    imagen_principal = UrlCloudinaryField()
+
+    class Meta:
+        model = CatalogoProducto
+        fields = [
+            'id', 'descripcion', 'precio', 'categoria', 'nombre_categoria',
+            'marca', 'nombre_marca', 'cantidad', 'ubicacion', 'imagen_principal',
+            'especificaciones', 'fecha_actualizacion'
+        ]
+        read_only_fields = fields
+
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombre_categoria = serializers.CharField(source='categoria.descripcion', read_only=True)
     nombre_marca = serializers.CharField(source='marca.nombre', read_only=True)
     especificaciones = EspecificacionSerializer(many=True, read_only=True)
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from Api_2doParcial.cache import cache_catalogo
+from Categorias.models import Categoria
+from Marcas.models import Marca
+from .models import Producto, Especificacion, ImagenProducto, Inventario
+
+# Modelos cuyo cambio altera alguna respuesta cacheada del catálogo.
+# Las eliminaciones lógicas y restauraciones pasan por save(), así que
+# post_save también las cubre.
+MODELOS_CATALOGO = [Producto, Especificacion, ImagenProducto, Inventario, Categoria, Marca]
+
+
+def invalidar_catalogo(sender=None, **kwargs):
+    cache_catalogo.invalidar()
+    # Invalidar de nuevo al confirmar la transacción, por si otra petición
+    # volvió a llenar la cache con datos anteriores mientras tanto
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(cache_catalogo.invalidar)
+
+
+def tocar_producto(sender, instance, **kwargs):
+    """
+    Especificaciones e imágenes no tienen fecha propia: su cambio actualiza
+    fecha_actualizacion del producto, que es el validador de los GET condicionales.
+    """
+    Producto.objects.filter(pk=instance.producto_id).update(fecha_actualizacion=timezone.now())
+
+
+def conectar():
+    for modelo in (Especificacion, ImagenProducto):
+        post_save.connect(tocar_producto, sender=modelo, dispatch_uid=f'tocar_producto_save_{modelo.__name__}')
+        post_delete.connect(tocar_producto, sender=modelo, dispatch_uid=f'tocar_producto_delete_{modelo.__name__}')
+
+    for modelo in MODELOS_CATALOGO:
+        post_save.connect(invalidar_catalogo, sender=modelo, dispatch_uid=f'cache_catalogo_save_{modelo.__name__}')
+        post_delete.connect(invalidar_catalogo, sender=modelo, dispatch_uid=f'cache_catalogo_delete_{modelo.__name__}')
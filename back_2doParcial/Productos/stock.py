@@ -0,0 +1,222 @@
+from collections import defaultdict
+from functools import partial
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+from .models import Inventario
+from .signals import invalidar_catalogo
+from . import fracciones, kardex
+
+
+class InventarioNoEncontrado(Exception):
+    def __init__(self, producto_id):
+        self.producto_id = producto_id
+        super().__init__(f'Inventario no encontrado para el producto {producto_id}')
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto_id, disponible):
+        self.producto_id = producto_id
+        self.disponible = disponible
+        super().__init__(f'Stock insuficiente para el producto {producto_id}')
+
+
+# operación -> (signo sobre cantidad, signo sobre reservado, límite).
+# El límite es lo que no puede quedar negativo: el disponible
+# (cantidad - reservado) o lo reservado.
+OPERACIONES = {
+    'incrementar': (1, 0, None),
+    'decrementar': (-1, 0, 'disponible'),
+    'reservar': (0, 1, 'disponible'),
+    'liberar': (0, -1, 'reservado'),
+    # Venta de unidades reservadas: salen del stock y de la reserva a la vez
+    'confirmar': (-1, -1, 'reservado'),
+}
+
+# Las columnas cantidad y reservado son int4
+CANTIDAD_MAXIMA = 2**31 - 1
+
+# Lotes: delta positivo -> primera operación, negativo -> segunda
+TIPOS_LOTE = {
+    'stock': ('incrementar', 'decrementar'),
+    'reserva': ('reservar', 'liberar'),
+}
+
+
+def _limite(limite, cantidad, reservado):
+    return cantidad - reservado if limite == 'disponible' else reservado
+
+
+def _aplicar(producto_id, operacion, cantidad):
+    """
+    Un único UPDATE condicional: la fila se bloquea y se valida en la misma
+    sentencia, así dos ventas simultáneas no pueden pisarse ni dejar el
+    stock negativo.
+    """
+    signo_cantidad, signo_reservado, limite = OPERACIONES[operacion]
+    condicion = Q()
+    if limite == 'disponible':
+        condicion = Q(cantidad__gte=F('reservado') + cantidad)
+    elif limite == 'reservado':
+        condicion = Q(reservado__gte=cantidad)
+
+    cambios = {'fecha_actualizacion': Now()}
+    if signo_cantidad:
+        cambios['cantidad'] = F('cantidad') + signo_cantidad * cantidad
+    if signo_reservado:
+        cambios['reservado'] = F('reservado') + signo_reservado * cantidad
+
+    if Inventario.objects.filter(condicion, producto_id=producto_id, estado=True, fracciones=0).update(**cambios):
+        return
+
+    # Solo en el caso de error o de inventario fraccionado: distinguir entre
+    # inexistente, fraccionado y sin stock
+    fila = (
+        Inventario.objects.filter(producto_id=producto_id, estado=True)
+        .values('id', 'cantidad', 'reservado', 'fracciones').first()
+    )
+    if fila is None:
+        raise InventarioNoEncontrado(producto_id)
+    if fila['fracciones']:
+        _aplicar_fracciones(fila, producto_id, operacion, cantidad)
+        return
+    raise StockInsuficiente(producto_id, _limite(limite, fila['cantidad'], fila['reservado']))
+
+
+def _mover_fracciones(inventario_id, producto_id, numero_fracciones, delta):
+    disponible = fracciones.mover(inventario_id, numero_fracciones, delta)
+    if disponible is not None:
+        raise StockInsuficiente(producto_id, disponible)
+    # Después del commit y sin esperar: el total cacheado no vuelve a ser una fila caliente
+    transaction.on_commit(partial(fracciones.refrescar_total, inventario_id))
+
+
+def _aplicar_fracciones(fila, producto_id, operacion, cantidad):
+    """
+    Inventario fraccionado: lo disponible está en las fracciones y lo
+    reservado en la fila principal. Reservar pasa unidades de las
+    fracciones a la reserva, liberar las devuelve y confirmar solo las
+    descuenta de la reserva. La fila principal se toca antes que las
+    fracciones, en el mismo orden que ajustar_lote y fracciones.configurar.
+    """
+    signo_cantidad, signo_reservado, _ = OPERACIONES[operacion]
+    if signo_reservado:
+        condicion = Q(reservado__gte=cantidad) if signo_reservado < 0 else Q()
+        if not Inventario.objects.filter(condicion, pk=fila['id']).update(
+            reservado=F('reservado') + signo_reservado * cantidad, fecha_actualizacion=Now()
+        ):
+            reservado = Inventario.objects.values_list('reservado', flat=True).get(pk=fila['id'])
+            raise StockInsuficiente(producto_id, reservado)
+    _mover_fracciones(fila['id'], producto_id, fila['fracciones'], (signo_cantidad - signo_reservado) * cantidad)
+
+
+def ajustar(producto_id, operacion, cantidad, motivo='', usuario=None):
+    """
+    Aplica una operación de stock y devuelve el inventario actualizado. Las
+    que cambian la cantidad quedan en el kardex; el motivo por defecto es
+    el nombre de la operación.
+    """
+    for intento in range(3):
+        try:
+            with transaction.atomic():
+                _aplicar(producto_id, operacion, cantidad)
+                signo_cantidad = OPERACIONES[operacion][0]
+                kardex.registrar([(producto_id, signo_cantidad * cantidad)], motivo or operacion, usuario)
+                invalidar_catalogo()
+            break
+        except fracciones.FraccionesCambiaron:
+            # Se desactivó el fraccionamiento en medio de la operación: con la fila ya
+            # actualizada, el siguiente intento va por el camino de una sola fila
+            if intento == 2:
+                raise
+    return cantidad_real(Inventario.objects.select_related('producto').get(producto_id=producto_id, estado=True))
+
+
+def cantidad_real(inventario):
+    """Para inventarios fraccionados, reemplaza el total cacheado por la suma de las fracciones"""
+    if inventario.fracciones:
+        inventario.cantidad = inventario.reservado + fracciones.disponible(inventario.pk)
+    return inventario
+
+
+def _guardar(inventarios, fecha):
+    """
+    Un solo UPDATE ... FROM (VALUES ...) para todas las filas del lote.
+    bulk_update arma un CASE por fila y columna, que en lotes grandes cuesta
+    más en Python que en la base.
+    """
+    if not inventarios:
+        return
+    valores = ', '.join(['(%s, %s, %s)'] * len(inventarios))
+    parametros = [valor for inventario in inventarios for valor in (inventario.pk, inventario.cantidad, inventario.reservado)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Inventario._meta.db_table} AS i
+            SET cantidad = v.cantidad, reservado = v.reservado, fecha_actualizacion = %s
+            FROM (VALUES {valores}) AS v(id, cantidad, reservado)
+            WHERE i.id = v.id
+            """,
+            [fecha, *parametros]
+        )
+
+
+def ajustar_lote(movimientos, tipo='stock', motivo='', usuario=None):
+    """
+    Aplica [(producto_id, delta), ...] en una sola transacción: o se aplican
+    todos o ninguno. Los deltas del mismo producto se suman.
+
+    Las filas se bloquean con un SELECT ... FOR UPDATE ordenado por
+    producto_id, así dos lotes que comparten productos toman los bloqueos en
+    el mismo orden y no pueden formar un deadlock. Con las filas bloqueadas
+    se validan en memoria y se guardan con un solo UPDATE. Los lotes de
+    stock dejan un movimiento de kardex por producto.
+    """
+    positiva, negativa = TIPOS_LOTE[tipo]
+    totales = defaultdict(int)
+    for producto_id, delta in movimientos:
+        totales[producto_id] += delta
+
+    with transaction.atomic():
+        inventarios = list(
+            Inventario.objects.select_related('producto')
+            .select_for_update(of=('self',))
+            .filter(producto_id__in=totales, estado=True)
+            .order_by('producto_id')
+        )
+        por_producto = {inventario.producto_id: inventario for inventario in inventarios}
+        ahora = timezone.now()
+        modificados = []
+
+        for producto_id in sorted(totales):
+            inventario = por_producto.get(producto_id)
+            if inventario is None:
+                raise InventarioNoEncontrado(producto_id)
+            delta = totales[producto_id]
+            if not delta:
+                continue
+
+            signo_cantidad, signo_reservado, limite = OPERACIONES[positiva if delta > 0 else negativa]
+            cantidad = abs(delta)
+            if inventario.fracciones:
+                # Lo disponible se valida y se descuenta en las fracciones; lo reservado, aquí
+                if signo_reservado < 0 and inventario.reservado < cantidad:
+                    raise StockInsuficiente(producto_id, inventario.reservado)
+                _mover_fracciones(
+                    inventario.pk, producto_id, inventario.fracciones, (signo_cantidad - signo_reservado) * cantidad
+                )
+            elif limite and _limite(limite, inventario.cantidad, inventario.reservado) < cantidad:
+                raise StockInsuficiente(producto_id, _limite(limite, inventario.cantidad, inventario.reservado))
+            inventario.cantidad += signo_cantidad * cantidad
+            inventario.reservado += signo_reservado * cantidad
+            inventario.fecha_actualizacion = ahora
+            modificados.append(inventario)
+
+        _guardar(modificados, ahora)
+        if tipo == 'stock':
+            deltas = [(producto_id, totales[producto_id]) for producto_id in sorted(totales)]
+            kardex.registrar(deltas, motivo or 'lote', usuario)
+        invalidar_catalogo()
+
+    return [cantidad_real(inventario) for inventario in inventarios]
@@ -1,3 +1,1406 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import time
+from importlib.util import find_spec
+from unittest import skipUnless
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F, Sum
+from concurrent.futures import ThreadPoolExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from Categorias.models import Categoria
+from Marcas.models import Marca
+from .atributos import normalizar_especificaciones
+from .models import (
+    Producto, Especificacion, Inventario, CatalogoProducto, MovimientoInventario,
+    SnapshotInventario, FraccionInventario, AlertaStock, ImagenProducto
+)
 
-# Create your tests here.
+
+class CatalogoConsultasTest(TestCase):
+    """El listado de productos debe usar un número constante de consultas"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Electrónicos')
+        self.marca = Marca.objects.create(nombre='Samsung')
+
+    def crear_productos(self, cantidad):
+        inicio = Producto.objects.count()
+        for i in range(inicio, inicio + cantidad):
+            producto = Producto.objects.create(
+                descripcion=f'Producto {i}',
+                precio='10.00',
+                categoria=self.categoria,
+                marca=self.marca
+            )
+            Especificacion.objects.create(nombre='Color', descripcion='Negro', producto=producto)
+            Especificacion.objects.create(nombre='RAM', descripcion='16GB', producto=producto)
+            Inventario.objects.create(cantidad=5, ubicacion='Almacén A', producto=producto)
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries), response
+
+    def test_listar_productos_consultas_constantes(self):
+        url = reverse('listar-productos')
+        self.crear_productos(2)
+        consultas_pocos, _ = self.contar_consultas(url)
+
+        self.crear_productos(20)
+        consultas_muchos, response = self.contar_consultas(url)
+
+        self.assertEqual(consultas_pocos, consultas_muchos)
+        self.assertEqual(len(response.data), 22)
+
+    def test_filtros_y_busqueda_consultas_constantes(self):
+        urls = [
+            reverse('listar-todos-productos'),
+            reverse('buscar-productos') + '?q=Producto',
+            reverse('productos-por-categoria', args=[self.categoria.id]),
+            reverse('productos-por-marca', args=[self.marca.id]),
+            reverse('productos-por-categoria-marca', args=[self.categoria.id, self.marca.id]),
+        ]
+        self.crear_productos(2)
+        pocos = [self.contar_consultas(url)[0] for url in urls]
+
+        self.crear_productos(15)
+        muchos = [self.contar_consultas(url)[0] for url in urls]
+
+        self.assertEqual(pocos, muchos)
+
+    def test_anidados_solo_activos(self):
+        self.crear_productos(1)
+        producto = Producto.objects.get()
+        producto.especificaciones.first().delete()
+
+        _, response = self.contar_consultas(reverse('obtener-producto', args=[producto.id]))
+
+        self.assertEqual(len(response.data['especificaciones']), 1)
+        self.assertEqual(response.data['nombre_marca'], 'Samsung')
+        self.assertEqual(response.data['inventario']['cantidad'], 5)
+
+
+class BusquedaProductosTest(TestCase):
+    """Búsqueda por texto completo: sin tildes, por prefijo y ordenada por relevancia"""
+
+    def setUp(self):
+        telefonos = Categoria.objects.create(descripcion='Teléfonos')
+        accesorios = Categoria.objects.create(descripcion='Accesorios')
+        samsung = Marca.objects.create(nombre='Samsung')
+        self.galaxy = Producto.objects.create(
+            descripcion='Galaxy S23 teléfono', precio='999.99', categoria=telefonos, marca=samsung
+        )
+        self.funda = Producto.objects.create(
+            descripcion='Funda para Galaxy', precio='19.99', categoria=accesorios, marca=samsung
+        )
+
+    def buscar(self, texto):
+        response = self.client.get(reverse('buscar-productos'), {'q': texto})
+        self.assertEqual(response.status_code, 200)
+        return [producto['id'] for producto in response.data]
+
+    def test_sin_tildes_y_por_prefijo(self):
+        self.assertEqual(self.buscar('telefono'), [self.galaxy.id])
+        self.assertEqual(self.buscar('tele'), [self.galaxy.id])
+        self.assertEqual(self.buscar('FUND'), [self.funda.id])
+
+    def test_descripcion_pesa_mas_que_categoria(self):
+        cargador = Producto.objects.create(
+            descripcion='Cargador rápido', precio='29.99',
+            categoria=self.galaxy.categoria, marca=self.galaxy.marca
+        )
+        self.assertEqual(self.buscar('telefono'), [self.galaxy.id, cargador.id])
+
+    def test_cambio_de_marca_actualiza_busqueda(self):
+        marca = self.galaxy.marca
+        marca.nombre = 'Motorola'
+        marca.save()
+        self.assertEqual(set(self.buscar('motorola')), {self.galaxy.id, self.funda.id})
+
+    def test_paginado(self):
+        response = self.client.get(reverse('buscar-productos'), {'q': 'galaxy', 'limit': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class CacheCatalogoTest(TestCase):
+    """Las respuestas del catálogo se sirven desde cache hasta que cambia un modelo"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Lácteos')
+        self.marca = Marca.objects.create(nombre='PIL')
+        self.producto = Producto.objects.create(
+            descripcion='Leche entera', precio='8.50', categoria=self.categoria, marca=self.marca
+        )
+
+    def test_segunda_lectura_desde_cache(self):
+        url = reverse('obtener-producto', args=[self.producto.id])
+        self.client.get(url)
+        # Solo la versión de la cache: el ETag también sale de ella
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['descripcion'], 'Leche entera')
+
+    def test_invalidacion_llega_a_otros_workers(self):
+        from rest_framework.decorators import api_view
+        from rest_framework.response import Response
+        from rest_framework.test import APIRequestFactory
+        from Api_2doParcial.cache import CacheLRU, CacheVersionada, VersionesBase
+
+        # Otro worker: sus propias entradas en memoria, la misma versión compartida
+        otro = CacheVersionada('catalogo', CacheLRU(versiones=VersionesBase()))
+        llamadas = []
+
+        @api_view(['GET'])
+        @otro.cachear
+        def vista(request):
+            llamadas.append(1)
+            return Response({'n': len(llamadas)})
+
+        pedir = lambda: vista(APIRequestFactory().get('/catalogo/')).data['n']
+        self.assertEqual((pedir(), pedir()), (1, 1))
+        # Una escritura en este proceso invalida la cache del otro
+        self.marca.nombre = 'Pil Andina'
+        self.marca.save()
+        self.assertEqual((pedir(), pedir()), (2, 2))
+
+    def test_compartida_sobre_locmem(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from Api_2doParcial.cache import CacheCompartida
+        with self.assertRaises(ImproperlyConfigured):
+            CacheCompartida('default')
+
+    def test_invalida_al_guardar_y_eliminar(self):
+        url = reverse('listar-productos')
+        self.assertEqual(len(self.client.get(url).data), 1)
+
+        self.marca.nombre = 'Pil Andina'
+        self.marca.save()
+        self.assertEqual(self.client.get(url).data[0]['nombre_marca'], 'Pil Andina')
+
+        self.producto.delete()
+        self.assertEqual(self.client.get(url).data, [])
+
+    def test_estadisticas(self):
+        url = reverse('listar-categorias')
+        antes = self.client.get(reverse('estadisticas-cache')).data
+        self.client.get(url)
+        self.client.get(url)
+        despues = self.client.get(reverse('estadisticas-cache')).data
+        self.assertEqual(despues['fallos'] - antes['fallos'], 1)
+        self.assertEqual(despues['aciertos'] - antes['aciertos'], 1)
+
+
+class GetCondicionalTest(TestCase):
+    """ETag: 304 mientras no cambie el producto ni sus relaciones"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Bebidas')
+        self.marca = Marca.objects.create(nombre='Coca-Cola')
+        self.producto = Producto.objects.create(
+            descripcion='Coca-Cola 2L', precio='15.00', categoria=self.categoria, marca=self.marca
+        )
+        self.url = reverse('obtener-producto', args=[self.producto.id])
+
+    def test_304_sin_cambios(self):
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertNotIn('Last-Modified', response.headers)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_304_sin_agregado(self):
+        url = reverse('listar-productos')
+        etag = self.client.get(url).headers['ETag']
+        # En las vistas cacheadas el ETag sale de la versión de la cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Inventario.objects.create(producto=self.producto, cantidad=5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_cambio_en_especificacion_invalida_etag(self):
+        etag = self.client.get(self.url).headers['ETag']
+        Especificacion.objects.create(nombre='Envase', descripcion='PET', producto=self.producto)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_cambio_en_marca_invalida_listado(self):
+        url = reverse('listar-productos')
+        etag = self.client.get(url).headers['ETag']
+        self.marca.nombre = 'Coca Cola Company'
+        self.marca.save()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_fila_eliminada_invalida_listado(self):
+        Producto.objects.create(descripcion='Fanta 2L', precio='14.00', categoria=self.categoria, marca=self.marca)
+        url = reverse('listar-productos')
+        etag = self.client.get(url).headers['ETag']
+        # Eliminar una fila no mueve la fecha más reciente del conjunto
+        self.producto.delete()
+
+        ahora = http_date(time.time() + 60)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=ahora)
+        self.assertEqual((response.status_code, len(response.data)), (200, 1))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=ahora).status_code, 200)
+
+    def test_categorias(self):
+        url = reverse('listar-categorias')
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ImportacionProductosTest(TestCase):
+    """Importación masiva con reporte de errores por fila"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Lácteos')
+        self.marca = Marca.objects.create(nombre='PIL')
+        Producto.objects.create(descripcion='Leche entera', precio='8.50', categoria=self.categoria, marca=self.marca)
+
+    def importar(self, nombre, contenido, **extra):
+        if isinstance(contenido, str):
+            contenido = contenido.encode('utf-8')
+        archivo = SimpleUploadedFile(nombre, contenido)
+        return self.client.post(reverse('importar-productos'), {'archivo': archivo, **extra})
+
+    def test_csv_por_lotes(self):
+        contenido = (
+            'descripcion,precio,categoria,marca\n'
+            'Yogurt bebible,12.00,lácteos,PIL\n'
+            f'Queso,30.50,{self.categoria.id},{self.marca.id}\n'
+            'Leche entera,8.50,Lácteos,PIL\n'
+            'Mantequilla,-1,Lácteos,PIL\n'
+            'Yogurt bebible,12.00,Lácteos,PIL\n'
+            'Dulce de leche,15,Lácteos,Otra\n'
+            'Leche deslactosada,9.90,Lácteos,PIL\n'
+        )
+        response = self.importar('productos.csv', contenido, lote=2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 7)
+        self.assertEqual(response.data['creados'], 3)
+        self.assertEqual([error['fila'] for error in response.data['errores']], [4, 5, 6, 3])
+        self.assertIn('marca', response.data['errores'][2]['errores'])
+        self.assertEqual(Producto.objects.count(), 4)
+
+    def test_ndjson(self):
+        contenido = (
+            '{"descripcion": "Queso", "precio": "30.50", "categoria_id": %d, "marca_id": %d}\n'
+            'no es json\n'
+        ) % (self.categoria.id, self.marca.id)
+        response = self.importar('productos.ndjson', contenido)
+
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual(response.data['errores'], [{'fila': 2, 'errores': {'fila': 'JSON inválido'}}])
+
+    def test_filas_que_no_son_utf8(self):
+        invalida = {'fila': 'Codificación inválida: el archivo debe estar en UTF-8'}
+        contenido = (
+            'descripcion,precio,categoria,marca\n'.encode('utf-8')
+            + 'Café,12.00,Lácteos,PIL\n'.encode('latin-1')
+            + '"Queso\nfresco",30.50,Lácteos,PIL\n'.encode('utf-8')
+            + '"Flan\nde dulce de leche",9,Lácteos,PIL\n'.encode('latin-1')
+            + 'Yogurt,12.00,Lácteos,PIL\n'.encode('utf-8')
+        )
+        response = self.importar('productos.csv', contenido)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['creados'], 2)
+        self.assertEqual(response.data['errores'], [{'fila': 1, 'errores': invalida}, {'fila': 3, 'errores': invalida}])
+
+        contenido = (
+            '{"descripcion": "Flan", "precio": "9", "categoria": "Lácteos", "marca": "PIL"}\n'.encode('latin-1')
+            + '{"descripcion": "Crema", "precio": "9", "categoria": "Lácteos", "marca": "PIL"}\n'.encode('utf-8')
+        )
+        response = self.importar('productos.ndjson', contenido)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual(response.data['errores'], [{'fila': 1, 'errores': invalida}])
+
+    def test_duplicados_por_clave_completa(self):
+        from .importacion import LOTE_MAXIMO
+        otra = Categoria.objects.create(descripcion='Bebidas')
+        contenido = (
+            'descripcion,precio,categoria,marca\n'
+            'LECHE ENTERA,8.50,Lácteos,PIL\n'
+            'Leche entera,8.50,Bebidas,PIL\n'
+        )
+        response = self.importar('productos.csv', contenido)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual([error['fila'] for error in response.data['errores']], [1])
+        self.assertTrue(Producto.objects.filter(descripcion='Leche entera', categoria=otra).exists())
+
+        for lote in (0, LOTE_MAXIMO + 1, 'x'):
+            self.assertEqual(self.importar('productos.csv', contenido, lote=lote).status_code, 400)
+
+
+class ExportacionProductosTest(TestCase):
+    """Exportación en streaming de todos los productos, con su inventario"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(descripcion='Lácteos')
+        marca = Marca.objects.create(nombre='PIL')
+        self.leche = Producto.objects.create(descripcion='Leche', precio='8.50', categoria=categoria, marca=marca)
+        Inventario.objects.create(producto=self.leche, cantidad=12, ubicacion='A1')
+        self.queso = Producto.objects.create(
+            descripcion='Queso, fresco', precio='30.00', categoria=categoria, marca=marca, estado=False
+        )
+
+    def test_csv(self):
+        response = self.client.get(reverse('exportar-productos'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="productos.csv"')
+
+        filas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(filas[0][:8], [
+            'id', 'descripcion', 'precio', 'categoria', 'nombre_categoria', 'marca', 'nombre_marca', 'cantidad'
+        ])
+        self.assertEqual([fila[:3] for fila in filas[1:]], [
+            [str(self.leche.id), 'Leche', '8.50'], [str(self.queso.id), 'Queso, fresco', '30.00']
+        ])
+        self.assertEqual(filas[1][7:10], ['12', 'A1', 'True'])
+        # Sin inventario las columnas quedan vacías
+        self.assertEqual(filas[2][7:10], ['', '', 'False'])
+
+    def test_ndjson(self):
+        response = self.client.get(reverse('exportar-productos'), {'formato': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="productos.ndjson"')
+
+        filas = [json.loads(linea) for linea in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([fila['id'] for fila in filas], [self.leche.id, self.queso.id])
+        self.assertEqual(filas[0]['precio'], '8.50')
+        self.assertEqual(filas[0]['nombre_marca'], 'PIL')
+        self.assertIsNone(filas[1]['cantidad'])
+
+    def test_inventario_fraccionado(self):
+        from .fracciones import configurar
+        configurar(self.leche.id, 3)
+        # Ventas en las fracciones que todavía no llegaron al total cacheado
+        inventario = Inventario.objects.get(producto=self.leche)
+        FraccionInventario.objects.filter(inventario=inventario).update(cantidad=F('cantidad') - 1)
+        Inventario.objects.filter(pk=inventario.pk).update(reservado=2)
+
+        response = self.client.get(reverse('exportar-productos'), {'formato': 'ndjson'})
+        filas = [json.loads(linea) for linea in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(Inventario.objects.get(pk=inventario.pk).cantidad, 12)
+        self.assertEqual(filas[0]['cantidad'], 2 + 9)
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.client.get(reverse('exportar-productos'), {'formato': 'xml'}).status_code, 400)
+
+
+class FacetasProductosTest(TestCase):
+    """Catálogo con facetas: filtros combinados y conteos en consultas acotadas"""
+
+    def setUp(self):
+        self.celulares = Categoria.objects.create(descripcion='Celulares')
+        self.tablets = Categoria.objects.create(descripcion='Tablets')
+        self.samsung = Marca.objects.create(nombre='Samsung')
+        self.apple = Marca.objects.create(nombre='Apple')
+        datos = [
+            ('Galaxy A15', '80.00', self.celulares, self.samsung, 3),
+            ('Galaxy S24', '900.00', self.celulares, self.samsung, 0),
+            ('iPhone 15', '1200.00', self.celulares, self.apple, 2),
+            ('Galaxy Tab', '450.00', self.tablets, self.samsung, 1),
+            ('iPad Air', '700.00', self.tablets, self.apple, 4),
+        ]
+        for descripcion, precio, categoria, marca, cantidad in datos:
+            producto = Producto.objects.create(
+                descripcion=descripcion, precio=precio, categoria=categoria, marca=marca
+            )
+            Inventario.objects.create(cantidad=cantidad, ubicacion='Almacén A', producto=producto)
+        self.url = reverse('facetas-productos')
+
+    def conteos(self, faceta, clave='id'):
+        return {fila[clave]: fila['total'] for fila in faceta}
+
+    def test_filtros_combinados(self):
+        response = self.client.get(self.url, {
+            'categoria': self.celulares.id, 'marca': self.samsung.id, 'en_stock': 'true'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual([p['descripcion'] for p in response.data['results']], ['Galaxy A15'])
+
+    def test_cada_faceta_ignora_su_propio_filtro(self):
+        response = self.client.get(self.url, {'categoria': self.celulares.id, 'precio_max': '1000'})
+        facetas = response.data['facetas']
+
+        self.assertEqual(response.data['total'], 2)
+        # Categorías: con el filtro de precio pero no el de categoría
+        self.assertEqual(self.conteos(facetas['categorias']), {self.celulares.id: 2, self.tablets.id: 2})
+        self.assertEqual(self.conteos(facetas['marcas']), {self.samsung.id: 2})
+        # Precios: con el filtro de categoría pero no el de precio
+        self.assertEqual(self.conteos(facetas['precios'], 'desde'), {
+            '0': 1, '100': 0, '500': 1, '1000': 1, '5000': 0
+        })
+
+    def test_consultas_acotadas(self):
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get(self.url, {'en_stock': '1', 'precio_min': '50'})
+        Producto.objects.create(
+            descripcion='Redmi 13', precio='150.00', categoria=self.celulares,
+            marca=Marca.objects.create(nombre='Xiaomi')
+        )
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.get(self.url, {'en_stock': '1', 'precio_min': '40'})
+
+        self.assertEqual(len(pocos.captured_queries), len(muchos.captured_queries))
+        self.assertEqual(len(response.data['facetas']['marcas']), 2)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(self.url, {'categoria': 'abc'}).status_code, 400)
+        response = self.client.get(self.url, {'precio_min': '10', 'precio_max': '5'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+        for valor in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            self.assertEqual(self.client.get(self.url, {'precio_min': valor, 'precio_max': '5'}).status_code, 400)
+            self.assertEqual(self.client.get(self.url, {'precio_max': valor}).status_code, 400)
+
+
+class CamposDinamicosTest(TestCase):
+    """?fields= y ?expand= recortan la respuesta y las consultas"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(descripcion='Audio')
+        marca = Marca.objects.create(nombre='Sony')
+        for i in range(3):
+            producto = Producto.objects.create(
+                descripcion=f'Audífonos {i}', precio='99.90', categoria=categoria, marca=marca
+            )
+            Especificacion.objects.create(nombre='Color', descripcion='Negro', producto=producto)
+            Inventario.objects.create(cantidad=i, ubicacion='Almacén B', producto=producto)
+        self.url = reverse('listar-productos')
+
+    def test_solo_campos_pedidos(self):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(self.url, {'fields': 'id,descripcion,precio'})
+
+        self.assertEqual(set(response.data[0]), {'id', 'descripcion', 'precio'})
+        select = [q['sql'] for q in contexto.captured_queries if 'FROM "productos"' in q['sql']][-1]
+        self.assertNotIn('JOIN', select)
+        self.assertNotIn('fecha_creacion', select)
+        self.assertFalse(any('especificaciones' in q['sql'] for q in contexto.captured_queries))
+
+    def test_expand_agrega_anidados(self):
+        response = self.client.get(self.url, {'fields': 'id,nombre_marca', 'expand': 'inventario'})
+
+        self.assertEqual(set(response.data[0]), {'id', 'nombre_marca', 'inventario'})
+        self.assertEqual(response.data[0]['nombre_marca'], 'Sony')
+        self.assertEqual(response.data[0]['inventario']['producto_descripcion'], 'Audífonos 2')
+
+    def test_sin_parametros_respuesta_completa(self):
+        response = self.client.get(self.url)
+        self.assertIn('especificaciones', response.data[0])
+        self.assertIn('imagenes', response.data[0])
+
+    def test_inventario_y_campo_desconocido(self):
+        response = self.client.get(reverse('listar-inventarios'), {'fields': 'cantidad,producto_descripcion'})
+        self.assertEqual(set(response.data[0]), {'cantidad', 'producto_descripcion'})
+
+        response = self.client.get(self.url, {'fields': 'id,clave_secreta'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('clave_secreta', response.data['error'])
+
+
+class CatalogoLecturaTest(TestCase):
+    """El modelo de lectura se mantiene al día con los triggers"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Monitores')
+        self.marca = Marca.objects.create(nombre='LG')
+        self.producto = Producto.objects.create(
+            descripcion='UltraGear 27', precio='320.00', categoria=self.categoria, marca=self.marca
+        )
+        self.inventario = Inventario.objects.create(cantidad=7, ubicacion='Almacén C', producto=self.producto)
+        Especificacion.objects.create(nombre='Tamaño', descripcion='27"', producto=self.producto)
+
+    def test_fila_desnormalizada(self):
+        fila = CatalogoProducto.objects.get(pk=self.producto.id)
+
+        self.assertEqual((fila.nombre_categoria, fila.nombre_marca, fila.cantidad), ('Monitores', 'LG', 7))
+        self.assertEqual(fila.especificaciones[0]['nombre'], 'Tamaño')
+        self.assertIsNone(fila.imagen_principal)
+
+    def test_cambios_en_marca_stock_y_estado(self):
+        self.marca.nombre = 'LG Electronics'
+        self.marca.save()
+        Inventario.objects.filter(pk=self.inventario.pk).update(cantidad=2)
+        fila = CatalogoProducto.objects.get(pk=self.producto.id)
+        self.assertEqual((fila.nombre_marca, fila.cantidad), ('LG Electronics', 2))
+
+        self.producto.delete()
+        self.assertFalse(CatalogoProducto.objects.filter(pk=self.producto.id).exists())
+        self.producto.restaurar()
+        self.assertTrue(CatalogoProducto.objects.filter(pk=self.producto.id).exists())
+
+    def test_endpoint_una_consulta(self):
+        url = reverse('listar-catalogo')
+        self.client.get(url, {'categoria': self.categoria.id})
+        with self.assertNumQueries(2):  # versión de la cache + listado
+            response = self.client.get(url, {'categoria': self.categoria.id, 'fields': 'id,nombre_marca'})
+
+        self.assertEqual(response.data, [{'id': self.producto.id, 'nombre_marca': 'LG'}])
+        for marca in ('x', '²'):
+            response = self.client.get(url, {'marca': marca})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'marca debe ser un id numérico')
+
+
+class AtributosCatalogoTest(TestCase):
+    """Filtro por especificaciones normalizadas y sus facetas dentro de una categoría"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Laptops')
+        marca = Marca.objects.create(nombre='Lenovo')
+        self.productos = {}
+        for nombre, ram, color in [
+            ('ThinkPad', '16 GB', 'Negro'), ('IdeaPad', '16GB', 'Plateado'),
+            ('Yoga', '32 GB', 'Negro'), ('Legion', '8 GB', 'Negro'),
+        ]:
+            producto = Producto.objects.create(
+                descripcion=nombre, precio='900.00', categoria=self.categoria, marca=marca
+            )
+            Especificacion.objects.create(nombre='Memoria RAM', descripcion=ram, producto=producto)
+            Especificacion.objects.create(nombre='Color', descripcion=color, producto=producto)
+            self.productos[nombre] = producto
+
+    def ids(self, **parametros):
+        response = self.client.get(reverse('listar-catalogo'), {'categoria': self.categoria.id, **parametros})
+        self.assertEqual(response.status_code, 200)
+        return sorted(fila['descripcion'] for fila in response.data)
+
+    def test_normalizacion_al_guardar(self):
+        especificacion = Especificacion.objects.get(producto=self.productos['ThinkPad'], nombre='Memoria RAM')
+        self.assertEqual((especificacion.clave, especificacion.valor), ('memoria ram', '16gb'))
+
+        especificacion.descripcion = 'Dieciséis'
+        especificacion.save(update_fields=['descripcion'])
+        especificacion.refresh_from_db()
+        self.assertEqual(especificacion.valor, 'dieciseis')
+        self.assertEqual(
+            CatalogoProducto.objects.get(pk=self.productos['ThinkPad'].id).atributos['memoria ram'],
+            ['dieciseis']
+        )
+
+    def test_filtro_y_o(self):
+        self.assertEqual(self.ids(esp='memoria ram: 16gb'), ['IdeaPad', 'ThinkPad'])
+        self.assertEqual(self.ids(esp=['Memoria RAM:16 GB', 'color:negro']), ['ThinkPad'])
+        self.assertEqual(self.ids(esp='Memoria RAM:16GB|32GB'), ['IdeaPad', 'ThinkPad', 'Yoga'])
+        self.assertEqual(self.ids(esp=['Memoria RAM:16GB|32GB', 'Color:Negro']), ['ThinkPad', 'Yoga'])
+        self.assertEqual(self.ids(esp='Color:Rojo'), [])
+
+        self.assertEqual(self.client.get(reverse('listar-catalogo'), {'esp': 'Color'}).status_code, 400)
+
+    def test_especificacion_eliminada_deja_de_filtrar(self):
+        Especificacion.objects.get(producto=self.productos['Yoga'], nombre='Color').delete()
+        self.assertEqual(self.ids(esp='Color:Negro'), ['Legion', 'ThinkPad'])
+
+    def test_facetas_excluyen_su_propio_filtro(self):
+        url = reverse('facetas-atributos-catalogo')
+        response = self.client.get(url, {'categoria': self.categoria.id, 'esp': 'Memoria RAM:16GB'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 2)
+
+        facetas = {faceta['clave']: faceta for faceta in response.data['atributos']}
+        self.assertEqual(facetas['memoria ram']['nombre'], 'Memoria RAM')
+        ram = {valor['valor']: (valor['total'], valor['seleccionado']) for valor in facetas['memoria ram']['valores']}
+        self.assertEqual(ram, {'16gb': (2, True), '32gb': (1, False), '8gb': (1, False)})
+        color = {valor['descripcion']: valor['total'] for valor in facetas['color']['valores']}
+        self.assertEqual(color, {'Negro': 1, 'Plateado': 1})
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_normalizar_especificaciones_existentes(self):
+        Especificacion.objects.update(clave='', valor='')
+        self.assertEqual(normalizar_especificaciones(), 8)
+        self.assertEqual(self.ids(esp='Color:Plateado'), ['IdeaPad'])
+
+
+class SincronizarEspecificacionesTest(TestCase):
+    """La ficha completa de especificaciones se aplica en una petición"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(descripcion='Laptops')
+        marca = Marca.objects.create(nombre='Dell')
+        self.producto = Producto.objects.create(descripcion='XPS 13', precio='1200.00', categoria=categoria, marca=marca)
+        self.color = Especificacion.objects.create(nombre='Color', descripcion='Negro', producto=self.producto)
+        self.ram = Especificacion.objects.create(nombre='RAM', descripcion='16GB', producto=self.producto)
+        self.peso = Especificacion.objects.create(nombre='Peso', descripcion='1.2 kg', producto=self.producto)
+        self.url = reverse('sincronizar-especificaciones', args=[self.producto.id])
+
+    def sincronizar(self, especificaciones, url=None):
+        return self.client.put(
+            url or self.url, {'especificaciones': especificaciones}, content_type='application/json'
+        )
+
+    def test_crea_actualiza_y_elimina(self):
+        response = self.sincronizar([
+            {'id': self.color.id, 'nombre': 'Color', 'descripcion': 'Azul'},
+            {'nombre': 'ram', 'descripcion': '16GB'},
+            {'nombre': 'Batería', 'descripcion': '60 Wh'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['creadas'], response.data['actualizadas'], response.data['eliminadas']), (1, 2, 1)
+        )
+        self.assertEqual(
+            [(fila['nombre'], fila['descripcion']) for fila in response.data['especificaciones']],
+            [('Color', 'Azul'), ('ram', '16GB'), ('Batería', '60 Wh')]
+        )
+        self.assertEqual(response.data['especificaciones'][1]['id'], self.ram.id)
+
+        self.peso.refresh_from_db()
+        self.assertFalse(self.peso.estado)
+        self.assertEqual(
+            CatalogoProducto.objects.get(pk=self.producto.id).atributos,
+            {'color': ['azul'], 'ram': ['16gb'], 'bateria': ['60wh']}
+        )
+
+    def test_sin_cambios_no_escribe(self):
+        especificaciones = [
+            {'id': fila.id, 'nombre': fila.nombre, 'descripcion': fila.descripcion}
+            for fila in (self.color, self.ram, self.peso)
+        ]
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.sincronizar(especificaciones)
+        self.assertEqual((response.data['creadas'], response.data['actualizadas'], response.data['eliminadas']), (0, 0, 0))
+        escrituras = [consulta['sql'] for consulta in contexto.captured_queries if consulta['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(escrituras, [])
+
+    def test_consultas_constantes(self):
+        def contar(cantidad):
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.sincronizar([
+                    {'nombre': f'Atributo {numero}', 'descripcion': f'Valor {cantidad}'} for numero in range(cantidad)
+                ])
+            self.assertEqual(response.status_code, 200)
+            return len(contexto.captured_queries)
+
+        self.assertEqual(contar(3), contar(30))
+        self.assertEqual(Especificacion.objects.filter(producto=self.producto, estado=True).count(), 30)
+
+    def test_errores(self):
+        otro = Producto.objects.create(
+            descripcion='Otro', precio='1.00', categoria=self.producto.categoria, marca=self.producto.marca
+        )
+        ajena = Especificacion.objects.create(nombre='Color', descripcion='Rojo', producto=otro)
+
+        response = self.sincronizar([{'id': ajena.id, 'nombre': 'Color', 'descripcion': 'Rojo'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], f'Especificaciones que no son activas de este producto: {ajena.id}')
+        self.assertEqual(self.sincronizar([{'nombre': 'Color'}]).status_code, 400)
+        self.assertEqual(
+            self.sincronizar([], url=reverse('sincronizar-especificaciones', args=[999999])).status_code, 404
+        )
+        self.assertTrue(Especificacion.objects.filter(pk=self.peso.pk, estado=True).exists())
+
+
+class ProductosLoteTest(TestCase):
+    """Varios productos por id en una petición, en el orden pedido"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(descripcion='Audio')
+        self.marca = Marca.objects.create(nombre='Sony')
+        self.productos = [self.crear(f'Audífono {numero}', f'{numero}9.99') for numero in range(1, 4)]
+        self.url = reverse('obtener-productos-lote')
+
+    def crear(self, descripcion, precio):
+        producto = Producto.objects.create(
+            descripcion=descripcion, precio=precio, categoria=self.categoria, marca=self.marca
+        )
+        Especificacion.objects.create(nombre='Color', descripcion='Negro', producto=producto)
+        Inventario.objects.create(cantidad=3, ubicacion='Almacén A', producto=producto)
+        return producto
+
+    def test_orden_faltantes_y_total(self):
+        primero, segundo, tercero = self.productos
+        tercero.delete()
+        ids = f'{segundo.id},999999,{tercero.id},{primero.id},{segundo.id}'
+        response = self.client.get(self.url, {'ids': ids, 'cantidades': '2,1,1,3,1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([fila['id'] for fila in response.data['productos']], [segundo.id, primero.id])
+        self.assertEqual(response.data['productos'][0]['especificaciones'][0]['descripcion'], 'Negro')
+        self.assertEqual(response.data['no_encontrados'], [999999])
+        self.assertEqual(response.data['inactivos'], [tercero.id])
+        self.assertEqual(response.data['total'], '149.94')  # 3 x 29.99 + 3 x 19.99
+
+    def test_consultas_constantes_y_fields(self):
+        self.client.get(self.url, {'ids': self.productos[0].id})
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get(self.url, {'ids': self.productos[0].id})
+        for numero in range(20):
+            self.productos.append(self.crear(f'Parlante {numero}', '5.00'))
+        ids = ','.join(str(producto.id) for producto in self.productos)
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.get(self.url, {'ids': ids})
+        self.assertEqual(len(pocos.captured_queries), len(muchos.captured_queries))
+        self.assertEqual(len(response.data['productos']), 23)
+        self.assertNotIn('total', response.data)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'ids': ids, 'cantidades': ','.join(['1'] * 23), 'fields': 'id'})
+        self.assertEqual(response.data['productos'][0], {'id': self.productos[0].id})
+        self.assertEqual(response.data['total'], '189.97')
+
+    def test_parametros_invalidos(self):
+        casos = (
+            {}, {'ids': '1,x'}, {'ids': '1,²'}, {'ids': '1,2', 'cantidades': '1'}, {'ids': '1', 'cantidades': '0'},
+        )
+        for parametros in casos:
+            self.assertEqual(self.client.get(self.url, parametros).status_code, 400, parametros)
+        response = self.client.get(self.url, {'ids': '1', 'cantidades': '²'})
+        self.assertEqual(response.data['error'], 'cantidades debe tener un entero positivo por cada id')
+        with self.settings(PRODUCTOS_MAX_LOTE=2):
+            self.assertEqual(self.client.get(self.url, {'ids': '1,2,3'}).status_code, 400)
+
+
+class AjusteStockTest(TestCase):
+    """Ajustes atómicos: nunca dejan el disponible negativo"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(descripcion='Periféricos')
+        marca = Marca.objects.create(nombre='Logitech')
+        self.productos = [
+            Producto.objects.create(descripcion=f'Mouse {i}', precio='25.00', categoria=categoria, marca=marca)
+            for i in range(2)
+        ]
+        for producto in self.productos:
+            Inventario.objects.create(cantidad=5, ubicacion='Almacén A', producto=producto)
+
+    def post(self, nombre, producto, cantidad):
+        return self.client.post(
+            reverse(nombre, args=[producto.id]), {'cantidad': cantidad}, content_type='application/json'
+        )
+
+    def test_reservar_confirmar_y_liberar(self):
+        producto = self.productos[0]
+        self.assertEqual(self.post('reservar-stock', producto, 3).data['reservado'], 3)
+
+        response = self.post('decrementar-stock', producto, 3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['disponible'], 2)
+
+        response = self.post('confirmar-stock', producto, 2)
+        self.assertEqual((response.data['cantidad'], response.data['reservado']), (3, 1))
+        response = self.post('liberar-stock', producto, 1)
+        self.assertEqual((response.data['cantidad'], response.data['reservado']), (3, 0))
+        self.assertEqual(self.post('incrementar-stock', producto, 4).data['cantidad'], 7)
+
+    def test_errores(self):
+        self.assertEqual(self.post('incrementar-stock', self.productos[0], 0).status_code, 400)
+        self.assertEqual(self.post('incrementar-stock', self.productos[0], 2**40).status_code, 400)
+        # Cada cantidad es válida pero el stock resultante no entra en int4
+        self.assertEqual(self.post('incrementar-stock', self.productos[0], 2**31 - 1).status_code, 400)
+        self.assertEqual(Inventario.objects.get(producto=self.productos[0]).cantidad, 5)
+        self.productos[1].inventario.delete()
+        self.assertEqual(self.post('incrementar-stock', self.productos[1], 1).status_code, 404)
+
+    def test_lote_todo_o_nada(self):
+        url = reverse('ajustar-stock-lote')
+        primero, segundo = self.productos
+        response = self.client.post(url, {'movimientos': [
+            {'producto_id': segundo.id, 'delta': -2},
+            {'producto_id': primero.id, 'delta': -9},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Inventario.objects.get(producto=segundo).cantidad, 5)
+
+        response = self.client.post(url, {'tipo': 'reserva', 'movimientos': [
+            {'producto_id': segundo.id, 'delta': 2},
+            {'producto_id': primero.id, 'delta': 4},
+            {'producto_id': primero.id, 'delta': -1},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['reservado'] for i in response.data['inventarios']], [3, 2])
+
+    def test_lote_fuera_de_rango(self):
+        url = reverse('ajustar-stock-lote')
+        primero, segundo = self.productos
+        for movimientos in (
+            [{'producto_id': primero.id, 'delta': 2**40}],
+            [{'producto_id': primero.id, 'delta': -2**40}],
+            [{'producto_id': segundo.id, 'delta': 1}, {'producto_id': primero.id, 'delta': 2**31 - 1}],
+            [{'producto_id': primero.id, 'delta': 2**31 - 10}, {'producto_id': primero.id, 'delta': 2**31 - 10}],
+        ):
+            response = self.client.post(url, {'movimientos': movimientos}, content_type='application/json')
+            self.assertEqual(response.status_code, 400, movimientos)
+        self.assertEqual([i.cantidad for i in Inventario.objects.order_by('producto_id')], [5, 5])
+
+
+class CatalogoConcurrenteTest(TransactionTestCase):
+    """Escrituras simultáneas sobre un producto no dejan su fila del catálogo atrasada"""
+
+    def test_alta_de_inventario_durante_edicion_de_precio(self):
+        from django.db import connections, transaction
+
+        producto = Producto.objects.create(
+            descripcion='Monitor', precio='50.00',
+            categoria=Categoria.objects.create(descripcion='Monitores'),
+            marca=Marca.objects.create(nombre='LG')
+        )
+
+        # El alta de inventario no toca el producto (ver signals.py): solo el trigger refresca su fila
+        def crear_inventario():
+            try:
+                Inventario.objects.create(cantidad=7, ubicacion='Almacén A', producto=producto)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with transaction.atomic():
+                Producto.objects.filter(pk=producto.pk).update(precio='60.00')
+                futuro = pool.submit(crear_inventario)
+                # El alta queda esperando a que esta edición termine
+                time.sleep(0.5)
+            futuro.result()
+
+        fila = CatalogoProducto.objects.get(pk=producto.pk)
+        self.assertEqual((str(fila.precio), fila.cantidad), ('60.00', 7))
+
+
+class AjusteStockConcurrenteTest(TransactionTestCase):
+    """Decrementos en paralelo sobre la misma fila: no se pierden ni sobrevenden"""
+
+    def test_sin_sobreventa(self):
+        from django.db import connections
+        from .stock import StockInsuficiente, ajustar
+
+        producto = Producto.objects.create(
+            descripcion='Teclado', precio='40.00',
+            categoria=Categoria.objects.create(descripcion='Teclados'),
+            marca=Marca.objects.create(nombre='Redragon')
+        )
+        Inventario.objects.create(cantidad=10, ubicacion='Almacén A', producto=producto)
+
+        def vender(_):
+            try:
+                ajustar(producto.id, 'decrementar', 1)
+                return True
+            except StockInsuficiente:
+                return False
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ventas = list(pool.map(vender, range(25)))
+
+        self.assertEqual(sum(ventas), 10)
+        self.assertEqual(Inventario.objects.get(producto=producto).cantidad, 0)
+
+    def test_sin_sobreventa_fraccionado(self):
+        from django.db import connections
+        from .fracciones import configurar
+        from .stock import StockInsuficiente, ajustar, cantidad_real
+
+        producto = Producto.objects.create(
+            descripcion='Mouse', precio='20.00',
+            categoria=Categoria.objects.create(descripcion='Mouses'),
+            marca=Marca.objects.create(nombre='Genius')
+        )
+        Inventario.objects.create(cantidad=12, ubicacion='Almacén A', producto=producto)
+        configurar(producto.id, 4)
+
+        def vender(_):
+            try:
+                ajustar(producto.id, 'decrementar', 1)
+                return True
+            except StockInsuficiente:
+                return False
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ventas = list(pool.map(vender, range(30)))
+
+        self.assertEqual(sum(ventas), 12)
+        self.assertEqual(cantidad_real(Inventario.objects.get(producto=producto)).cantidad, 0)
+
+
+class KardexInventarioTest(TestCase):
+    """Cada cambio de cantidad queda en el kardex; el stock histórico parte del último snapshot"""
+
+    def setUp(self):
+        from Usuarios.models import Usuario
+        self.usuario = Usuario.objects.create(
+            username='bodega', correo='bodega@example.com', password='secreta', tipo_usuario='empleado'
+        )
+        categoria = Categoria.objects.create(descripcion='Audio')
+        marca = Marca.objects.create(nombre='Sony')
+        self.producto = Producto.objects.create(
+            descripcion='Audífonos', precio='50.00', categoria=categoria, marca=marca
+        )
+        response = self.client.post(reverse('crear-inventario'), {
+            'cantidad': 10, 'ubicacion': 'Almacén A', 'producto_id': self.producto.id
+        }, content_type='application/json')
+        self.inventario_id = response.data['id']
+
+    headers = {}
+
+    def post(self, nombre, cantidad, **extra):
+        return self.client.post(
+            reverse(nombre, args=[self.producto.id]), {'cantidad': cantidad, **extra},
+            content_type='application/json', **self.headers
+        )
+
+    def movimientos(self):
+        return list(
+            MovimientoInventario.objects.filter(producto=self.producto)
+            .order_by('id').values_list('tipo', 'cantidad', 'motivo')
+        )
+
+    def test_registra_cada_cambio_de_cantidad(self):
+        from Usuarios.jwt_utils import generate_token
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {generate_token(self.usuario)}'}
+        self.post('incrementar-stock', 5, motivo='Compra')
+        self.post('reservar-stock', 3)
+        self.post('confirmar-stock', 2)
+        self.client.put(
+            reverse('actualizar-inventario', args=[self.inventario_id]), {'cantidad': 20},
+            content_type='application/json'
+        )
+        self.client.post(reverse('ajustar-stock-lote'), {'movimientos': [
+            {'producto_id': self.producto.id, 'delta': -4},
+        ]}, content_type='application/json')
+
+        self.assertEqual(self.movimientos(), [
+            ('entrada', 10, 'inventario inicial'),
+            ('entrada', 5, 'Compra'),
+            ('salida', -2, 'confirmar'),
+            ('ajuste', 7, 'ajuste manual'),
+            ('salida', -4, 'lote'),
+        ])
+        self.assertEqual(MovimientoInventario.objects.filter(usuario=self.usuario).count(), 2)
+        total = MovimientoInventario.objects.filter(producto=self.producto).aggregate(total=Sum('cantidad'))['total']
+        self.assertEqual(total, Inventario.objects.get(producto=self.producto).cantidad)
+
+    def test_stock_a_una_fecha_desde_snapshot(self):
+        from .kardex import stock_en, tomar_snapshot
+        self.post('decrementar-stock', 3)
+        fecha_snapshot, filas = tomar_snapshot()
+        self.assertEqual(filas, 1)
+        self.post('incrementar-stock', 8)
+
+        antes = stock_en(self.producto.id, fecha_snapshot)
+        self.assertEqual((antes['cantidad'], antes['movimientos']), (7, 0))
+        response = self.client.get(reverse('stock-producto-en-fecha', args=[self.producto.id]))
+        self.assertEqual(response.data['cantidad'], 15)
+        self.assertEqual((response.data['snapshot'], response.data['movimientos']), (fecha_snapshot, 1))
+
+        response = self.client.get(reverse('stock-producto-en-fecha', args=[self.producto.id]), {'fecha': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_listado_y_valorizacion(self):
+        self.post('decrementar-stock', 1)
+        self.post('decrementar-stock', 2)
+        response = self.client.get(reverse('movimientos-producto', args=[self.producto.id]), {'limit': 2})
+        self.assertEqual([m['cantidad'] for m in response.data['results']], [-2, -1])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(reverse('valorizar-inventario'))
+        self.assertEqual((response.data['unidades'], response.data['valor']), (7, '350.00'))
+
+
+class InventarioFraccionadoTest(TestCase):
+    """Stock repartido en fracciones: mismas reglas que con una sola fila"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(descripcion='Consolas')
+        marca = Marca.objects.create(nombre='Nintendo')
+        self.producto = Producto.objects.create(
+            descripcion='Switch', precio='300.00', categoria=categoria, marca=marca
+        )
+        self.inventario = Inventario.objects.create(cantidad=10, reservado=2, ubicacion='Almacén A', producto=self.producto)
+
+    def fraccionar(self, numero):
+        return self.client.post(
+            reverse('fraccionar-inventario', args=[self.producto.id]), {'fracciones': numero},
+            content_type='application/json'
+        )
+
+    def post(self, nombre, cantidad):
+        return self.client.post(
+            reverse(nombre, args=[self.producto.id]), {'cantidad': cantidad}, content_type='application/json'
+        )
+
+    def partes(self):
+        return list(FraccionInventario.objects.filter(inventario=self.inventario).values_list('cantidad', flat=True))
+
+    def test_reparte_y_vuelve_a_una_fila(self):
+        response = self.fraccionar(3)
+        self.assertEqual((response.data['fracciones'], response.data['cantidad']), (3, 10))
+        self.assertEqual(self.partes(), [3, 3, 2])
+        self.assertEqual(self.fraccionar(99).status_code, 400)
+
+        self.post('decrementar-stock', 1)
+        response = self.fraccionar(0)
+        self.assertEqual((response.data['fracciones'], response.data['cantidad']), (0, 9))
+        self.assertEqual(self.partes(), [])
+
+    def test_barrido_cuando_una_fraccion_no_alcanza(self):
+        self.fraccionar(4)
+        # Ninguna fracción tiene 5 por sí sola: se barren y se reparte lo que queda
+        response = self.post('decrementar-stock', 5)
+        self.assertEqual((response.data['cantidad'], response.data['reservado']), (5, 2))
+        self.assertEqual(self.partes(), [1, 1, 1, 0])
+
+        response = self.post('decrementar-stock', 4)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['disponible'], 3)
+
+    def test_reservas_y_total_cacheado(self):
+        self.fraccionar(2)
+        self.assertEqual(self.post('reservar-stock', 3).data['reservado'], 5)
+        self.assertEqual(sum(self.partes()), 5)
+        response = self.post('confirmar-stock', 4)
+        self.assertEqual((response.data['cantidad'], response.data['reservado']), (6, 1))
+        self.assertEqual(self.post('liberar-stock', 2).status_code, 409)
+
+        # Sin transacción abierta en el test el refresco va en on_commit: se fuerza aquí
+        from .fracciones import consolidar
+        consolidar()
+        self.assertEqual(Inventario.objects.get(pk=self.inventario.pk).cantidad, 6)
+
+    def test_actualizacion_manual_y_snapshot(self):
+        from .kardex import tomar_snapshot
+        self.fraccionar(3)
+        self.post('decrementar-stock', 2)
+        response = self.client.put(
+            reverse('actualizar-inventario', args=[self.inventario.pk]), {'cantidad': 20},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.partes(), [6, 6, 6])
+        ajuste = MovimientoInventario.objects.filter(producto=self.producto, tipo='ajuste').get()
+        self.assertEqual(ajuste.cantidad, 12)
+
+        tomar_snapshot()
+        self.assertEqual(SnapshotInventario.objects.get(producto=self.producto).cantidad, 20)
+
+    def test_actualizacion_sin_cantidad_no_toca_fracciones(self):
+        self.inventario.reservado = 0
+        self.inventario.save()
+        self.fraccionar(2)
+        self.post('decrementar-stock', 4)
+        # Sin commit en el test el total cacheado sigue en 10; lo real son 6
+        self.assertEqual(Inventario.objects.get(pk=self.inventario.pk).cantidad, 10)
+        response = self.client.put(
+            reverse('actualizar-inventario', args=[self.inventario.pk]), {'ubicacion': 'B'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['ubicacion'], response.data['cantidad']), ('B', 6))
+        self.assertEqual(sum(self.partes()), 6)
+        self.assertFalse(MovimientoInventario.objects.filter(producto=self.producto, tipo='ajuste').exists())
+
+
+class AlertasStockTest(TestCase):
+    """alertas_stock sigue a los inventarios que cruzan su punto de reorden"""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(descripcion='Cables')
+        marca = Marca.objects.create(nombre='Ugreen')
+        self.inventarios = {}
+        for nombre, ubicacion, cantidad, punto in [
+            ('HDMI', 'Almacén B', 10, 5),
+            ('USB-C', 'Almacén A', 3, 5),
+            ('VGA', 'Almacén A', 1, None),
+            ('DisplayPort', 'Almacén A', 2, 4),
+        ]:
+            producto = Producto.objects.create(descripcion=nombre, precio='8.00', categoria=categoria, marca=marca)
+            self.inventarios[nombre] = Inventario.objects.create(
+                cantidad=cantidad, ubicacion=ubicacion, producto=producto, punto_reorden=punto
+            )
+
+    def alertas(self):
+        return dict(AlertaStock.objects.values_list('producto__descripcion', 'cantidad'))
+
+    def ajustar(self, operacion, inventario, cantidad):
+        return self.client.post(
+            reverse(f'{operacion}-stock', args=[inventario.producto_id]), {'cantidad': cantidad},
+            content_type='application/json'
+        )
+
+    def test_entra_y_sale_al_cruzar_el_umbral(self):
+        self.assertEqual(self.alertas(), {'USB-C': 3, 'DisplayPort': 2})
+
+        hdmi = self.inventarios['HDMI']
+        self.ajustar('decrementar', hdmi, 5)
+        fecha = AlertaStock.objects.get(inventario=hdmi).fecha
+        self.ajustar('decrementar', hdmi, 2)
+        alerta = AlertaStock.objects.get(inventario=hdmi)
+        self.assertEqual((alerta.cantidad, alerta.fecha), (3, fecha))
+
+        self.ajustar('incrementar', hdmi, 10)
+        self.assertNotIn('HDMI', self.alertas())
+
+        self.inventarios['USB-C'].delete()
+        self.client.put(
+            reverse('actualizar-inventario', args=[self.inventarios['DisplayPort'].pk]), {'punto_reorden': 1},
+            content_type='application/json'
+        )
+        self.assertEqual(self.alertas(), {})
+
+    def test_agrupadas_por_ubicacion(self):
+        Inventario.objects.filter(pk=self.inventarios['HDMI'].pk).update(cantidad=0)
+        response = self.client.get(reverse('inventario-bajo-stock'), {'limit': 2})
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['ubicaciones'], [
+            {'ubicacion': 'Almacén A', 'total': 2}, {'ubicacion': 'Almacén B', 'total': 1}
+        ])
+        grupos = response.data['results']
+        self.assertEqual([g['ubicacion'] for g in grupos], ['Almacén A'])
+        self.assertEqual([a['faltante'] for a in grupos[0]['alertas']], [2, 2])
+
+        siguiente = self.client.get(response.data['next'])
+        self.assertEqual(siguiente.data['results'][0]['alertas'][0]['producto_descripcion'], 'HDMI')
+
+    def test_recorrido_por_clave(self):
+        url = reverse('inventario-bajo-stock')
+        for inventario in self.inventarios.values():
+            Inventario.objects.filter(pk=inventario.pk).update(cantidad=0, punto_reorden=5)
+        esperado = list(AlertaStock.objects.order_by('ubicacion', 'id').values_list('producto__descripcion', flat=True))
+
+        def descripciones(response):
+            return [a['producto_descripcion'] for g in response.data['results'] for a in g['alertas']]
+
+        vistas, response = [], self.client.get(url, {'limit': 1})
+        paginas = [response]
+        while response.data['next']:
+            vistas += descripciones(response)
+            response = self.client.get(response.data['next'])
+            paginas.append(response)
+        vistas += descripciones(response)
+        self.assertEqual(vistas, esperado)
+
+        # Hacia atrás desde la última página
+        anterior = self.client.get(paginas[-1].data['previous'])
+        self.assertEqual(descripciones(anterior), esperado[-2:-1])
+
+        # Una alerta que sale antes del cursor no corre la página siguiente
+        segunda = paginas[1]
+        Inventario.objects.filter(pk=self.inventarios[esperado[0]].pk).update(cantidad=10)
+        self.assertEqual(descripciones(self.client.get(segunda.data['next'])), esperado[2:3])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'no-es-un-cursor'}).status_code, 404)
+
+
+class ImagenesAsincronasTest(TransactionTestCase):
+    """La imagen se acepta en staging y la cola la sube al backend de archivos"""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = carpeta.name
+        ajustes = override_settings(
+            IMAGENES_BACKEND='archivos',
+            IMAGENES_STAGING_DIR=f'{self.carpeta}/staging',
+            IMAGENES_ARCHIVOS_DIR=f'{self.carpeta}/imagenes',
+            IMAGENES_ARCHIVOS_URL='/media/imagenes/',
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.producto = Producto.objects.create(
+            descripcion='Parlante', precio='60.00',
+            categoria=Categoria.objects.create(descripcion='Audio'),
+            marca=Marca.objects.create(nombre='JBL')
+        )
+        Inventario.objects.create(cantidad=5, ubicacion='Almacén A', producto=self.producto)
+
+    def cola(self, almacen, **opciones):
+        from .imagenes import ColaImagenes
+        return ColaImagenes(almacen=almacen, trabajadores=2, reintentos=3, espera_reintento=0.01, **opciones)
+
+    def recibir(self, cola, contenido=b'\xff\xd8imagen'):
+        from .imagenes import recibir
+        archivo = SimpleUploadedFile('frente.JPG', contenido, content_type='image/jpeg')
+        imagen = recibir(archivo, self.producto, es_principal=True, destino=cola)
+        self.assertTrue(cola.esperar(timeout=10))
+        imagen.refresh_from_db()
+        return imagen
+
+    def test_sube_en_segundo_plano(self):
+        from .imagenes import AlmacenArchivos
+        from .serializers import CatalogoProductoSerializer, ImagenProductoSerializer
+
+        cola = self.cola(AlmacenArchivos(f'{self.carpeta}/imagenes', '/media/imagenes/', latencia=0.05))
+        imagen = self.recibir(cola)
+        temporal = os.listdir(f'{self.carpeta}/staging')
+
+        self.assertEqual((imagen.estado_carga, imagen.intentos, imagen.archivo_temporal), ('lista', 1, ''))
+        self.assertEqual(temporal, [])
+        url = ImagenProductoSerializer(imagen).data['imagen_url']
+        self.assertRegex(url, r'^/media/imagenes/productos/[0-9a-f]{32}\.jpg$')
+        self.assertTrue(os.path.exists(f"{self.carpeta}/imagenes/{url.removeprefix('/media/imagenes/')}"))
+
+        catalogo = CatalogoProductoSerializer(CatalogoProducto.objects.get(pk=self.producto.pk)).data
+        self.assertEqual(catalogo['imagen_principal'], url)
+
+    def test_reintenta_y_marca_error(self):
+        from .imagenes import AlmacenArchivos, Circuito
+
+        class AlmacenInestable(AlmacenArchivos):
+            def __init__(self, fallas, *args):
+                super().__init__(*args)
+                self.fallas = fallas
+
+            def subir(self, ruta, timeout=None):
+                if self.fallas:
+                    self.fallas -= 1
+                    raise ConnectionError('sin conexión')
+                return super().subir(ruta, timeout)
+
+        destino = (f'{self.carpeta}/imagenes', '/media/imagenes/')
+        imagen = self.recibir(self.cola(AlmacenInestable(2, *destino)))
+        self.assertEqual((imagen.estado_carga, imagen.intentos), ('lista', 3))
+        self.assertNotIn('ConnectionError', imagen.error)
+
+        imagen = self.recibir(self.cola(AlmacenInestable(3, *destino), circuito=Circuito(fallos=10)), b'otra')
+        self.assertEqual((imagen.estado_carga, imagen.intentos), ('error', 3))
+        self.assertIn('ConnectionError', imagen.error)
+        self.assertTrue(imagen.archivo_temporal)
+
+        # Una subida que no responde dentro del timeout cuenta como fallo
+        lenta = AlmacenArchivos(*destino, latencia=5)
+        imagen = self.recibir(self.cola(lenta, timeout=0.05, circuito=Circuito(fallos=10)), b'lenta')
+        self.assertEqual(imagen.estado_carga, 'error')
+        self.assertIn('TimeoutError', imagen.error)
+
+    def test_lote_deduplicado(self):
+        from .imagenes import AlmacenArchivos, recibir_lote
+
+        class AlmacenContado(AlmacenArchivos):
+            subidas = 0
+
+            def subir(self, ruta, timeout=None):
+                AlmacenContado.subidas += 1
+                return super().subir(ruta, timeout)
+
+        anterior = ImagenProducto.objects.create(producto=self.producto, imagen='image/upload/v1/productos/vieja.jpg', es_principal=True)
+        cola = self.cola(AlmacenContado(f'{self.carpeta}/imagenes', '/media/imagenes/'))
+        archivo = lambda nombre, contenido: SimpleUploadedFile(nombre, contenido, content_type='image/jpeg')
+
+        resultado = recibir_lote(
+            [archivo('a.jpg', b'a'), archivo('b.jpg', b'b'), archivo('a-copia.jpg', b'a')],
+            self.producto, principal=2, destino=cola
+        )
+        self.assertTrue(cola.esperar(timeout=10))
+        self.assertEqual((resultado['reutilizadas'], resultado['duplicadas']), (0, ['a-copia.jpg']))
+        self.assertEqual(AlmacenContado.subidas, 2)
+        principal = ImagenProducto.objects.get(producto=self.producto, es_principal=True)
+        self.assertEqual((principal.pk, principal.estado_carga), (resultado['imagenes'][0].pk, 'lista'))
+        anterior.refresh_from_db()
+        self.assertFalse(anterior.es_principal)
+
+        # Otro producto con la misma galería: nada se vuelve a subir
+        otro = Producto.objects.create(
+            descripcion='Parlante mini', precio='30.00', categoria=self.producto.categoria, marca=self.producto.marca
+        )
+        resultado = recibir_lote([archivo('b.jpg', b'b'), archivo('a.jpg', b'a')], otro, destino=cola)
+        self.assertTrue(cola.esperar(timeout=10))
+        self.assertEqual(resultado['reutilizadas'], 2)
+        self.assertEqual(AlmacenContado.subidas, 2)
+        self.assertEqual(
+            sorted(ImagenProducto.objects.filter(producto=otro).values_list('estado_carga', 'archivo_temporal')),
+            [('lista', ''), ('lista', '')]
+        )
+        self.assertEqual(os.listdir(f'{self.carpeta}/staging'), [])
+
+    def test_lote_fallido_no_deja_staging(self):
+        from django.db import IntegrityError
+        from .imagenes import AlmacenArchivos, recibir_lote
+
+        cola = self.cola(AlmacenArchivos(f'{self.carpeta}/imagenes', '/media/imagenes/'))
+        # Producto inexistente: la FK falla al confirmar, después de escribir en staging
+        inexistente = Producto(pk=self.producto.pk + 1000, descripcion='Fantasma', precio='1.00')
+        archivos = [SimpleUploadedFile(f'{n}.jpg', n.encode(), content_type='image/jpeg') for n in 'ab']
+        with self.assertRaises(IntegrityError):
+            recibir_lote(archivos, inexistente, destino=cola)
+        self.assertEqual(os.listdir(f'{self.carpeta}/staging'), [])
+        self.assertFalse(ImagenProducto.objects.exists())
+
+    def test_variantes_cloudinary(self):
+        import cloudinary
+        from .imagenes import AlmacenCloudinary, publicar
+        from .serializers import ImagenProductoSerializer
+
+        anterior = cloudinary.config().cloud_name
+        cloudinary.config(cloud_name='demo')
+        self.addCleanup(cloudinary.config, cloud_name=anterior)
+
+        valor = 'image/upload/v12/productos/frente.jpg'
+        url, variantes, error = publicar(AlmacenCloudinary(), valor)
+        imagen = ImagenProducto.objects.create(producto=self.producto, imagen=valor, url=url, variantes=variantes)
+
+        datos = ImagenProductoSerializer(ImagenProducto.objects.get(pk=imagen.pk)).data
+        self.assertEqual((datos['imagen_url'], error), ('http://res.cloudinary.com/demo/image/upload/v12/productos/frente.jpg', ''))
+        base = 'https://res.cloudinary.com/demo/image/upload'
+        self.assertEqual(datos['srcset'], ', '.join([
+            f'{base}/c_fill,h_150,q_auto:good,w_150/v12/productos/frente.jpg 150w',
+            f'{base}/c_limit,h_300,q_auto:good,w_400/v12/productos/frente.jpg 400w',
+            f'{base}/c_limit,h_600,q_auto:good,w_800/v12/productos/frente.jpg 800w',
+        ]))
+        self.assertTrue(datos['variantes']['miniatura_webp'].endswith('/v12/productos/frente.webp'))
+        self.assertEqual(datos['srcset_webp'].count('.webp '), 3)
+
+    @skipUnless(find_spec('PIL'), 'Las variantes locales requieren Pillow')
+    def test_variantes_archivos(self):
+        from io import BytesIO
+        from PIL import Image
+        from .imagenes import AlmacenArchivos
+
+        contenido = BytesIO()
+        Image.new('RGB', (1600, 900), 'teal').save(contenido, 'JPEG')
+        cola = self.cola(AlmacenArchivos(f'{self.carpeta}/imagenes', '/media/imagenes/'))
+        imagen = self.recibir(cola, contenido.getvalue())
+
+        self.assertEqual((imagen.estado_carga, imagen.error), ('lista', ''))
+        self.assertEqual(len(imagen.variantes), 6)
+        tamanios = {}
+        for clave, url in imagen.variantes.items():
+            with Image.open(f"{self.carpeta}/imagenes/{url.removeprefix('/media/imagenes/')}") as variante:
+                tamanios[clave] = (variante.format, variante.size)
+        self.assertEqual(tamanios['miniatura'], ('JPEG', (150, 150)))
+        self.assertEqual(tamanios['tarjeta_webp'], ('WEBP', (400, 225)))
+        self.assertEqual(tamanios['detalle'], ('JPEG', (800, 450)))
+
+    def test_circuito(self):
+        from .imagenes import Circuito
+
+        ahora = [0]
+        circuito = Circuito(fallos=2, espera=30, reloj=lambda: ahora[0])
+        circuito.fallo()
+        self.assertTrue(circuito.permitir())
+        circuito.fallo()
+        self.assertEqual((circuito.estado, circuito.permitir()), ('abierto', False))
+
+        ahora[0] = 31
+        self.assertTrue(circuito.permitir())
+        self.assertFalse(circuito.permitir())  # una sola subida de prueba
+        circuito.fallo()
+        self.assertEqual((circuito.estado, circuito.restante()), ('abierto', 30))
+
+        ahora[0] = 62
+        self.assertTrue(circuito.permitir())
+        circuito.exito()
+        self.assertEqual(circuito.estado, 'cerrado')
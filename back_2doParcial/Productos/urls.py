@@ -6,7 +6,13 @@ urlpatterns = [
     path('productos/', views.listar_productos, name='listar-productos'),
     path('productos/todos/', views.listar_todos_productos, name='listar-todos-productos'),
     path('productos/crear/', views.crear_producto, name='crear-producto'),
+    path('productos/importar/', views.importar_productos, name='importar-productos'),
+    path('productos/exportar/', views.exportar_productos, name='exportar-productos'),
     path('productos/buscar/', views.buscar_productos, name='buscar-productos'),
+    path('productos/lote/', views.obtener_productos_lote, name='obtener-productos-lote'),
+    path('productos/facetas/', views.facetas_productos, name='facetas-productos'),
+    path('productos/catalogo/', views.listar_catalogo, name='listar-catalogo'),
+    path('productos/catalogo/atributos/', views.facetas_atributos_catalogo, name='facetas-atributos-catalogo'),
     path('productos/categoria/<int:categoria_id>/', views.listar_productos_por_categoria, name='productos-por-categoria'),
     path('productos/marca/<int:marca_id>/', views.listar_productos_por_marca, name='productos-por-marca'),
     path('productos/categoria/<int:categoria_id>/marca/<int:marca_id>/', views.listar_productos_por_categoria_marca, name='productos-por-categoria-marca'),
@@ -14,10 +20,12 @@ urlpatterns = [
     path('productos/<int:pk>/actualizar/', views.actualizar_producto, name='actualizar-producto'),
     path('productos/<int:pk>/eliminar/', views.eliminar_producto, name='eliminar-producto'),
     path('productos/<int:pk>/restaurar/', views.restaurar_producto, name='restaurar-producto'),
+    path('cache/estadisticas/', views.estadisticas_cache, name='estadisticas-cache'),
     
     # === RUTAS PARA ESPECIFICACIONES ===
     path('especificaciones/', views.listar_especificaciones, name='listar-especificaciones'),
     path('especificaciones/producto/<int:producto_id>/', views.listar_especificaciones_producto, name='especificaciones-por-producto'),
+    path('especificaciones/producto/<int:producto_id>/sincronizar/', views.sincronizar_especificaciones, name='sincronizar-especificaciones'),
     path('especificaciones/crear/', views.crear_especificacion, name='crear-especificacion'),
     path('especificaciones/<int:pk>/actualizar/', views.actualizar_especificacion, name='actualizar-especificacion'),
     path('especificaciones/<int:pk>/eliminar/', views.eliminar_especificacion, name='eliminar-especificacion'),
@@ -27,6 +35,17 @@ urlpatterns = [
     path('inventario/', views.listar_inventarios, name='listar-inventarios'),
     path('inventario/producto/<int:producto_id>/', views.obtener_inventario_producto, name='inventario-por-producto'),
     path('inventario/crear/', views.crear_inventario, name='crear-inventario'),
+    path('inventario/bajo-stock/', views.listar_bajo_stock, name='inventario-bajo-stock'),
+    path('inventario/ajustar/', views.ajustar_stock_lote, name='ajustar-stock-lote'),
+    path('inventario/producto/<int:producto_id>/incrementar/', views.ajustar_stock, {'operacion': 'incrementar'}, name='incrementar-stock'),
+    path('inventario/producto/<int:producto_id>/decrementar/', views.ajustar_stock, {'operacion': 'decrementar'}, name='decrementar-stock'),
+    path('inventario/producto/<int:producto_id>/reservar/', views.ajustar_stock, {'operacion': 'reservar'}, name='reservar-stock'),
+    path('inventario/producto/<int:producto_id>/liberar/', views.ajustar_stock, {'operacion': 'liberar'}, name='liberar-stock'),
+    path('inventario/producto/<int:producto_id>/confirmar/', views.ajustar_stock, {'operacion': 'confirmar'}, name='confirmar-stock'),
+    path('inventario/producto/<int:producto_id>/fracciones/', views.fraccionar_inventario, name='fraccionar-inventario'),
+    path('inventario/producto/<int:producto_id>/movimientos/', views.listar_movimientos_producto, name='movimientos-producto'),
+    path('inventario/producto/<int:producto_id>/stock/', views.stock_producto_en_fecha, name='stock-producto-en-fecha'),
+    path('inventario/valorizacion/', views.valorizar_inventario, name='valorizar-inventario'),
     path('inventario/<int:pk>/actualizar/', views.actualizar_inventario, name='actualizar-inventario'),
     path('inventario/<int:pk>/eliminar/', views.eliminar_inventario, name='eliminar-inventario'),
     path('inventario/<int:pk>/restaurar/', views.restaurar_inventario, name='restaurar-inventario'),
@@ -34,6 +53,8 @@ urlpatterns = [
     # === RUTAS PARA IMÁGENES DE PRODUCTOS ===
     path('imagenes-producto/producto/<int:producto_id>/', views.listar_imagenes_producto, name='imagenes-por-producto'),
     path('imagenes-producto/crear/', views.crear_imagen_producto, name='crear-imagen-producto'),
+    path('imagenes-producto/producto/<int:producto_id>/lote/', views.crear_imagenes_lote, name='crear-imagenes-lote'),
+    path('imagenes-producto/<int:pk>/', views.obtener_imagen_producto, name='obtener-imagen-producto'),
     path('imagenes-producto/<int:pk>/actualizar/', views.actualizar_imagen_producto, name='actualizar-imagen-producto'),
     path('imagenes-producto/<int:pk>/eliminar/', views.eliminar_imagen_producto, name='eliminar-imagen-producto'),
     path('imagenes-producto/<int:pk>/restaurar/', views.restaurar_imagen_producto, name='restaurar-imagen-producto'),
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+# Tamaños que se publican de cada imagen: nombre -> (ancho, alto, recorte).
+# 'limit' achica conservando la proporción dentro de la caja; 'fill' llena la
+# caja recortando al centro. Cada variante sale en el formato original y en WebP.
+#
+# Este módulo no importa Django: generar() corre en los procesos del pool de
+# imagenes.py, que arrancan con 'spawn' y no cargan el proyecto.
+VARIANTES = {
+    'miniatura': (150, 150, 'fill'),
+    'tarjeta': (400, 300, 'limit'),
+    'detalle': (800, 600, 'limit'),
+}
+
+CALIDAD = 82
+
+
+def generar(origen, carpeta, public_id):
+    """
+    Genera las variantes de `origen` en `carpeta` con Pillow y devuelve
+    {clave: ruta relativa a la carpeta}.
+    """
+    from PIL import Image, ImageOps
+
+    origen = Path(origen)
+    extension = origen.suffix.lstrip('.').lower() or 'jpg'
+    rutas = {}
+    with Image.open(origen) as original:
+        imagen = ImageOps.exif_transpose(original)
+        for variante, (ancho, alto, recorte) in VARIANTES.items():
+            if recorte == 'fill':
+                copia = ImageOps.fit(imagen, (ancho, alto))
+            else:
+                copia = imagen.copy()
+                copia.thumbnail((ancho, alto))
+            for clave, formato in ((variante, extension), (f'{variante}_webp', 'webp')):
+                relativa = f'{public_id}_{variante}.{formato}'
+                salida = copia
+                if formato in ('jpg', 'jpeg') and salida.mode not in ('RGB', 'L'):
+                    salida = salida.convert('RGB')
+                salida.save(Path(carpeta) / relativa, quality=CALIDAD)
+                rutas[clave] = relativa
+    return rutas
@@ -1,15 +1,43 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
-from .models import Producto, Especificacion, Inventario
+from collections import defaultdict
+from itertools import groupby
+from operator import attrgetter
+from decimal import Decimal
+from django.conf import settings
+from django.db import DataError, transaction
+from django.db.models import Count
+from .models import Producto, Especificacion, Inventario, CatalogoProducto, MovimientoInventario, AlertaStock
 from .serializers import (
     ProductoSerializer, ProductoCreateSerializer,
-    EspecificacionSerializer, EspecificacionCreateSerializer,
-    InventarioSerializer, InventarioCreateSerializer
+    EspecificacionSerializer, EspecificacionCreateSerializer, EspecificacionesSincronizarSerializer,
+    InventarioSerializer, InventarioCreateSerializer,
+    CatalogoProductoSerializer, MovimientoInventarioSerializer, AlertaStockSerializer
 )
 from .models import ImagenProducto
-from .serializers import (ImagenProductoSerializer, ImagenProductoCreateSerializer)
+from .serializers import (ImagenProductoSerializer, ImagenProductoCreateSerializer, ImagenesLoteSerializer)
+from .imagenes import recibir_lote
+from .consultas import catalogo_queryset, version_catalogo, version_inventario
+from .busqueda import buscar
+from .facetas import leer_filtros, filtrar, calcular_facetas
+from .atributos import leer_atributos, filtrar_atributos, facetas_atributos
+from .especificaciones import sincronizar
+from .stock import (
+    CANTIDAD_MAXIMA, TIPOS_LOTE, InventarioNoEncontrado, StockInsuficiente, ajustar, ajustar_lote, cantidad_real
+)
+from .fracciones import (
+    MAX_FRACCIONES, cantidad_exacta, configurar as configurar_fracciones, disponible as fracciones_disponible,
+    fijar as fijar_fracciones
+)
+from .kardex import leer_fecha, registrar, stock_en, valorizacion
+from .importacion import FORMATOS, LOTE_MAXIMO, LOTE_POR_DEFECTO, importar_productos as importar
+from Api_2doParcial.paginacion import paginar, PaginacionBusqueda, PaginacionClaves, PaginacionCursor
+from Api_2doParcial.cache import cache_catalogo
+from Api_2doParcial.condicional import condicional
+from Api_2doParcial.exportacion import exportar
+from Api_2doParcial.campos import leer_campos, optimizar
+from Usuarios.decorators import usuario_del_token
 
 
 # =========================================================================
@@ -19,22 +47,65 @@ from .serializers import (ImagenProductoSerializer, ImagenProductoCreateSerializ
 @api_view(['GET'])
 def listar_imagenes_producto(request, producto_id):
     """Listar todas las imágenes de un producto"""
-    imagenes = ImagenProducto.objects.filter(producto_id=producto_id, estado=True)
+    imagenes = ImagenProducto.objects.select_related('producto').filter(producto_id=producto_id, estado=True)
     serializer = ImagenProductoSerializer(imagenes, many=True)
     return Response(serializer.data)
 
 @api_view(['POST'])
 def crear_imagen_producto(request):
-    """Subir nueva imagen para un producto"""
+    """
+    Recibir una imagen para un producto. Responde 202 con estado_carga
+    'pendiente': la subida al almacenamiento sigue en segundo plano. Si el
+    mismo contenido ya estaba subido responde 201 con la imagen lista.
+    """
     serializer = ImagenProductoCreateSerializer(data=request.data)
     
     if serializer.is_valid():
         imagen_producto = serializer.save()
         response_serializer = ImagenProductoSerializer(imagen_producto)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        lista = imagen_producto.estado_carga == 'lista'
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED if lista else status.HTTP_202_ACCEPTED)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# POST /api/productos/imagenes-producto/producto/{producto_id}/lote/ - Varias imágenes en una petición
+@api_view(['POST'])
+def crear_imagenes_lote(request, producto_id):
+    """
+    Recibir la galería de un producto (multipart, campo `imagenes` repetido).
+    Los archivos ya subidos antes se reutilizan y los repetidos en la misma
+    petición se descartan; el resto se sube en segundo plano.
+    """
+    try:
+        producto = Producto.objects.get(pk=producto_id, estado=True)
+    except Producto.DoesNotExist:
+        return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = ImagenesLoteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    resultado = recibir_lote(
+        serializer.validated_data['imagenes'], producto,
+        principal=serializer.validated_data.get('principal')
+    )
+    pendientes = len(resultado['imagenes']) - resultado['reutilizadas']
+    return Response({
+        'imagenes': ImagenProductoSerializer(resultado['imagenes'], many=True).data,
+        'reutilizadas': resultado['reutilizadas'],
+        'duplicadas': resultado['duplicadas'],
+    }, status=status.HTTP_202_ACCEPTED if pendientes else status.HTTP_201_CREATED)
+
+# GET /api/productos/imagenes-producto/{pk}/ - Estado de carga de una imagen
+@api_view(['GET'])
+def obtener_imagen_producto(request, pk):
+    """Consultar una imagen, por ejemplo para seguir su estado de carga"""
+    try:
+        imagen_producto = ImagenProducto.objects.select_related('producto').get(pk=pk, estado=True)
+    except ImagenProducto.DoesNotExist:
+        return Response({'error': 'Imagen no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ImagenProductoSerializer(imagen_producto).data)
+
 @api_view(['PUT'])
 def actualizar_imagen_producto(request, pk):
     """Actualizar información de una imagen (ej: marcar como principal)"""
@@ -114,16 +185,41 @@ def marcar_imagen_principal(request, pk):
 
 @api_view(['GET'])
 def listar_especificaciones(request):
-    especificaciones = Especificacion.objects.filter(estado=True)
+    especificaciones = Especificacion.objects.select_related('producto').filter(estado=True)
     serializer = EspecificacionSerializer(especificaciones, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 def listar_especificaciones_producto(request, producto_id):
-    especificaciones = Especificacion.objects.filter(producto_id=producto_id, estado=True)
+    especificaciones = Especificacion.objects.select_related('producto').filter(producto_id=producto_id, estado=True)
     serializer = EspecificacionSerializer(especificaciones, many=True)
     return Response(serializer.data)
 
+# PUT /api/productos/especificaciones/producto/{producto_id}/sincronizar/ - Ficha completa en una petición
+@api_view(['PUT'])
+def sincronizar_especificaciones(request, producto_id):
+    """
+    Recibe la lista completa de especificaciones del producto: crea, actualiza
+    y elimina lo necesario en una transacción y devuelve la lista final.
+    """
+    serializer = EspecificacionesSincronizarSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        resultado = sincronizar(producto_id, serializer.validated_data['especificaciones'])
+    except Producto.DoesNotExist:
+        return Response({'error': 'Producto no encontrado o inactivo'}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'especificaciones': EspecificacionSerializer(resultado['especificaciones'], many=True).data,
+        'creadas': resultado['creadas'],
+        'actualizadas': resultado['actualizadas'],
+        'eliminadas': resultado['eliminadas'],
+    })
+
 @api_view(['POST'])
 def crear_especificacion(request):
     serializer = EspecificacionCreateSerializer(data=request.data)
@@ -170,42 +266,238 @@ def restaurar_especificacion(request, pk):
 # =========================================================================
 
 @api_view(['GET'])
+@condicional(lambda request: version_inventario(Inventario.objects.filter(estado=True)))
 def listar_inventarios(request):
-    inventarios = Inventario.objects.filter(estado=True)
-    serializer = InventarioSerializer(inventarios, many=True)
+    campos = leer_campos(request, InventarioSerializer)
+    inventarios = optimizar(Inventario.objects.select_related('producto').filter(estado=True), InventarioSerializer, campos)
+    pagina = paginar(request, inventarios, InventarioSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = InventarioSerializer(inventarios, many=True, campos=campos)
     return Response(serializer.data)
 
 @api_view(['GET'])
+@condicional(lambda request, producto_id: version_inventario(
+    Inventario.objects.filter(producto_id=producto_id, estado=True)
+))
 def obtener_inventario_producto(request, producto_id):
+    campos = leer_campos(request, InventarioSerializer)
     try:
-        inventario = Inventario.objects.get(producto_id=producto_id, estado=True)
-        serializer = InventarioSerializer(inventario)
+        inventario = optimizar(
+            Inventario.objects.select_related('producto'), InventarioSerializer, campos
+        ).get(producto_id=producto_id, estado=True)
+        serializer = InventarioSerializer(cantidad_real(inventario), campos=campos)
         return Response(serializer.data)
     except Inventario.DoesNotExist:
         return Response({'error': 'Inventario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
+def _motivo(request):
+    """Motivo opcional del movimiento de kardex (campo 'motivo' del body)"""
+    motivo = request.data.get('motivo')
+    return motivo[:255] if isinstance(motivo, str) else ''
+
 @api_view(['POST'])
 def crear_inventario(request):
     serializer = InventarioCreateSerializer(data=request.data)
     if serializer.is_valid():
-        inventario = serializer.save()
+        with transaction.atomic():
+            inventario = serializer.save()
+            registrar(
+                [(inventario.producto_id, inventario.cantidad)],
+                _motivo(request) or 'inventario inicial', usuario_del_token(request)
+            )
         response_serializer = InventarioSerializer(inventario)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['PUT'])
+@transaction.atomic
 def actualizar_inventario(request, pk):
     try:
-        inventario = Inventario.objects.get(pk=pk, estado=True)
+        # Bloqueada hasta el commit: la diferencia que va al kardex no puede pisarse con otro ajuste
+        inventario = Inventario.objects.select_for_update().get(pk=pk, estado=True)
     except Inventario.DoesNotExist:
         return Response({'error': 'Inventario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    producto_anterior, cantidad_anterior = inventario.producto_id, inventario.cantidad
     
     serializer = InventarioSerializer(inventario, data=request.data, partial=True)
     if serializer.is_valid():
+        if inventario.fracciones:
+            # El total guardado es el cacheado y puede estar atrasado: el real sale de las fracciones
+            cantidad_anterior = inventario.reservado + fracciones_disponible(inventario.pk, bloquear=True)
+            if 'cantidad' not in serializer.validated_data:
+                inventario.cantidad = cantidad_anterior
         serializer.save()
+        if inventario.fracciones and 'cantidad' in serializer.validated_data:
+            fijar_fracciones(inventario)
+        diferencias = defaultdict(int)
+        diferencias[producto_anterior] -= cantidad_anterior
+        diferencias[inventario.producto_id] += inventario.cantidad
+        registrar(
+            diferencias.items(), _motivo(request) or 'ajuste manual', usuario_del_token(request), tipo='ajuste'
+        )
         return Response(serializer.data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# POST /api/productos/inventario/producto/{producto_id}/{operacion}/ - Ajuste atómico de stock
+# operacion: incrementar, decrementar, reservar, liberar o confirmar. Body: {"cantidad": n, "motivo": "..."}
+@api_view(['POST'])
+def ajustar_stock(request, producto_id, operacion):
+    cantidad = request.data.get('cantidad')
+    if not isinstance(cantidad, int) or isinstance(cantidad, bool) or not 0 < cantidad <= CANTIDAD_MAXIMA:
+        return Response(
+            {'error': f'cantidad debe ser un entero entre 1 y {CANTIDAD_MAXIMA}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        inventario = ajustar(producto_id, operacion, cantidad, _motivo(request), usuario_del_token(request))
+    except InventarioNoEncontrado as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except DataError:
+        # El resultado no entra en la columna (stock ya cerca del máximo)
+        return Response(
+            {'error': f'El stock resultante excede el máximo de {CANTIDAD_MAXIMA}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except StockInsuficiente as e:
+        return Response(
+            {'error': str(e), 'producto_id': e.producto_id, 'disponible': e.disponible},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(InventarioSerializer(inventario).data)
+
+# POST /api/productos/inventario/ajustar/ - Varios ajustes en una transacción
+# Body: {"tipo": "stock"|"reserva", "movimientos": [{"producto_id": 1, "delta": -2}, ...], "motivo": "..."}
+@api_view(['POST'])
+def ajustar_stock_lote(request):
+    tipo = request.data.get('tipo', 'stock')
+    movimientos = request.data.get('movimientos')
+    if tipo not in TIPOS_LOTE:
+        return Response({'error': 'tipo debe ser stock o reserva'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(movimientos, list) or not movimientos:
+        return Response({'error': 'movimientos debe ser una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+
+    pares = []
+    for indice, movimiento in enumerate(movimientos):
+        producto_id = movimiento.get('producto_id') if isinstance(movimiento, dict) else None
+        delta = movimiento.get('delta') if isinstance(movimiento, dict) else None
+        if not all(isinstance(valor, int) and not isinstance(valor, bool) for valor in (producto_id, delta)):
+            return Response(
+                {'error': f'Movimiento {indice}: producto_id y delta deben ser enteros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if abs(delta) > CANTIDAD_MAXIMA:
+            return Response(
+                {'error': f'Movimiento {indice}: delta debe estar entre -{CANTIDAD_MAXIMA} y {CANTIDAD_MAXIMA}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        pares.append((producto_id, delta))
+
+    try:
+        inventarios = ajustar_lote(pares, tipo, _motivo(request), usuario_del_token(request))
+    except InventarioNoEncontrado as e:
+        return Response({'error': str(e), 'producto_id': e.producto_id}, status=status.HTTP_404_NOT_FOUND)
+    except DataError:
+        # Los deltas sumados o el stock resultante no entran en la columna
+        return Response(
+            {'error': f'El stock resultante excede el máximo de {CANTIDAD_MAXIMA}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except StockInsuficiente as e:
+        return Response(
+            {'error': str(e), 'producto_id': e.producto_id, 'disponible': e.disponible},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response({'inventarios': InventarioSerializer(inventarios, many=True).data})
+
+# GET /api/productos/inventario/bajo-stock/?ubicacion= - Productos en o bajo su punto de reorden
+@api_view(['GET'])
+def listar_bajo_stock(request):
+    """
+    Alertas vigentes agrupadas por ubicación. Lee alertas_stock, que solo
+    tiene los inventarios bajo su umbral: el costo no depende del catálogo.
+    """
+    alertas = AlertaStock.objects.select_related('producto')
+    ubicacion = request.query_params.get('ubicacion')
+    if ubicacion:
+        alertas = alertas.filter(ubicacion=ubicacion)
+    resumen = list(alertas.values('ubicacion').annotate(total=Count('id')).order_by('ubicacion'))
+
+    # Clave (ubicacion, id) completa: con muchas alertas por ubicación no se pagina por OFFSET
+    paginador = PaginacionClaves(AlertaStock._meta.ordering)
+    pagina = paginador.paginate_queryset(alertas, request)
+    return Response({
+        'total': sum(fila['total'] for fila in resumen),
+        'ubicaciones': resumen,
+        'next': paginador.get_next_link(),
+        'previous': paginador.get_previous_link(),
+        'results': [
+            {'ubicacion': nombre, 'alertas': AlertaStockSerializer(list(grupo), many=True).data}
+            for nombre, grupo in groupby(pagina, key=attrgetter('ubicacion'))
+        ],
+    })
+
+# POST /api/productos/inventario/producto/{producto_id}/fracciones/ - Fraccionar el stock
+# Body: {"fracciones": 16}; 0 vuelve a una sola fila
+@api_view(['POST'])
+def fraccionar_inventario(request, producto_id):
+    """Reparte el disponible en N filas para que las ventas simultáneas no esperen por la misma"""
+    numero = request.data.get('fracciones')
+    if not isinstance(numero, int) or isinstance(numero, bool) or not 0 <= numero <= MAX_FRACCIONES:
+        return Response(
+            {'error': f'fracciones debe ser un entero entre 0 y {MAX_FRACCIONES}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        inventario = configurar_fracciones(producto_id, numero)
+    except Inventario.DoesNotExist:
+        return Response({'error': 'Inventario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(InventarioSerializer(inventario).data)
+
+# GET /api/productos/inventario/producto/{producto_id}/movimientos/?desde=&hasta= - Kardex del producto
+@api_view(['GET'])
+def listar_movimientos_producto(request, producto_id):
+    """Movimientos del más reciente al más antiguo, siempre paginados por cursor"""
+    movimientos = MovimientoInventario.objects.select_related('usuario').filter(producto_id=producto_id)
+    try:
+        if request.query_params.get('desde'):
+            movimientos = movimientos.filter(fecha__gte=leer_fecha(request.query_params['desde']))
+        if request.query_params.get('hasta'):
+            movimientos = movimientos.filter(fecha__lte=leer_fecha(request.query_params['hasta']))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginador = PaginacionCursor(MovimientoInventario._meta.ordering)
+    pagina = paginador.paginate_queryset(movimientos, request)
+    serializer = MovimientoInventarioSerializer(pagina, many=True)
+    return paginador.get_paginated_response(serializer.data)
+
+# GET /api/productos/inventario/producto/{producto_id}/stock/?fecha= - Stock histórico
+@api_view(['GET'])
+def stock_producto_en_fecha(request, producto_id):
+    try:
+        fecha = leer_fecha(request.query_params.get('fecha'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not Producto.objects.filter(pk=producto_id).exists():
+        return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(stock_en(producto_id, fecha))
+
+# GET /api/productos/inventario/valorizacion/?fecha= - Valor del inventario por categoría
+@api_view(['GET'])
+def valorizar_inventario(request):
+    try:
+        fecha = leer_fecha(request.query_params.get('fecha'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    resultado = valorizacion(fecha)
+    # Montos como texto, igual que los precios en los serializers
+    resultado['valor'] = str(resultado['valor'])
+    for categoria in resultado['categorias']:
+        categoria['valor'] = str(categoria['valor'])
+    return Response(resultado)
+
 @api_view(['DELETE'])
 def eliminar_inventario(request, pk):
     try:
@@ -228,30 +520,137 @@ def restaurar_inventario(request, pk):
 # =========================================================================
 # VISTAS PARA PRODUCTOS
 # =========================================================================
+# GET /api/productos/cache/estadisticas/ - Contadores de la cache del catálogo
+@api_view(['GET'])
+def estadisticas_cache(request):
+    """Aciertos, fallos y desalojos de la cache, para dimensionarla"""
+    return Response(cache_catalogo.estadisticas())
+
+
 # GET /api/productos/ - Listar productos activos
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def listar_productos(request):
     """Listar solo productos activos"""
-    productos = Producto.objects.filter(estado=True)
-    serializer = ProductoSerializer(productos, many=True)
+    campos = leer_campos(request, ProductoSerializer)
+    productos = catalogo_queryset(campos=campos).filter(estado=True)
+    pagina = paginar(request, productos, ProductoSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = ProductoSerializer(productos, many=True, campos=campos)
     return Response(serializer.data)
 
 
 # GET /api/productos/todos/ - Listar todos los productos
 @api_view(['GET'])
+@condicional(lambda request: version_catalogo(Producto.objects.all()))
 def listar_todos_productos(request):
     """Listar todos los productos (activos e inactivos)"""
-    productos = Producto.objects.all()
-    serializer = ProductoSerializer(productos, many=True)
+    campos = leer_campos(request, ProductoSerializer)
+    productos = catalogo_queryset(campos=campos)
+    pagina = paginar(request, productos, ProductoSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = ProductoSerializer(productos, many=True, campos=campos)
     return Response(serializer.data)
 
 
+def _leer_lote(request):
+    """
+    ?ids=3,1,2 y opcionalmente ?cantidades=2,1,1 como {id: cantidad} en el
+    orden pedido (cantidad None sin cantidades; los ids repetidos suman).
+    Lanza ValueError con el mensaje para el cliente.
+    """
+    ids = [parte.strip() for parte in request.query_params.get('ids', '').split(',') if parte.strip()]
+    if not ids:
+        raise ValueError('ids es obligatorio: lista de ids separados por coma')
+    if not all(parte.isdecimal() for parte in ids):
+        raise ValueError('ids debe ser una lista de ids numéricos separados por coma')
+    if len(ids) > settings.PRODUCTOS_MAX_LOTE:
+        raise ValueError(f'Se pueden pedir como máximo {settings.PRODUCTOS_MAX_LOTE} productos')
+
+    cantidades = request.query_params.get('cantidades')
+    if cantidades is None:
+        return {int(pk): None for pk in ids}
+    cantidades = [parte.strip() for parte in cantidades.split(',')]
+    if len(cantidades) != len(ids) or not all(parte.isdecimal() and int(parte) > 0 for parte in cantidades):
+        raise ValueError('cantidades debe tener un entero positivo por cada id')
+    lote = {}
+    for pk, cantidad in zip(ids, cantidades):
+        lote[int(pk)] = lote.get(int(pk), 0) + int(cantidad)
+    return lote
+
+
+# GET /api/productos/lote/?ids=3,1,2&cantidades=2,1,1 - Varios productos en una petición (carrito, favoritos)
+@api_view(['GET'])
+def obtener_productos_lote(request):
+    """
+    Productos activos en el orden pedido, con las mismas consultas sin
+    importar cuántos sean. Los ids inexistentes o inactivos se informan
+    aparte; con cantidades se agrega el total del carrito.
+    """
+    try:
+        lote = _leer_lote(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    campos = leer_campos(request, ProductoSerializer)
+    con_total = next(iter(lote.values())) is not None
+    columnas = campos | {'precio'} if campos is not None and con_total else campos
+    encontrados = {
+        producto.pk: producto
+        for producto in catalogo_queryset(campos=columnas).filter(pk__in=list(lote), estado=True)
+    }
+    productos = [encontrados[pk] for pk in lote if pk in encontrados]
+
+    faltantes = [pk for pk in lote if pk not in encontrados]
+    inactivos = set(
+        Producto.objects.filter(pk__in=faltantes, estado=False).values_list('pk', flat=True)
+    ) if faltantes else set()
+    datos = {
+        'productos': ProductoSerializer(productos, many=True, campos=campos).data,
+        'no_encontrados': [pk for pk in faltantes if pk not in inactivos],
+        'inactivos': [pk for pk in faltantes if pk in inactivos],
+    }
+    if con_total:
+        total = sum((producto.precio * lote[producto.pk] for producto in productos), Decimal('0'))
+        datos['total'] = str(total.quantize(Decimal('0.01')))
+    return Response(datos)
+
+
+# GET /api/productos/exportar/?formato=csv|ndjson - Exportar todos los productos
+@api_view(['GET'])
+def exportar_productos(request):
+    """Exportación en streaming (activos e inactivos)"""
+    columnas = [
+        ('id', 'id'),
+        ('descripcion', 'descripcion'),
+        ('precio', 'precio'),
+        ('categoria', 'categoria_id'),
+        ('nombre_categoria', 'categoria__descripcion'),
+        ('marca', 'marca_id'),
+        ('nombre_marca', 'marca__nombre'),
+        ('cantidad', 'cantidad_inventario'),
+        ('ubicacion', 'inventario__ubicacion'),
+        ('estado', 'estado'),
+        ('fecha_creacion', 'fecha_creacion'),
+        ('fecha_actualizacion', 'fecha_actualizacion'),
+    ]
+    # En los inventarios fraccionados inventario.cantidad es un total cacheado (ver fracciones.py)
+    productos = Producto.objects.annotate(cantidad_inventario=cantidad_exacta('inventario__'))
+    return exportar(request, productos.order_by('id'), columnas, 'productos')
+
+
 # GET /api/productos/{id}/ - Obtener producto específico
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def obtener_producto(request, pk):
+    campos = leer_campos(request, ProductoSerializer)
     try:
-        producto = Producto.objects.get(pk=pk, estado=True)
-        serializer = ProductoSerializer(producto)
+        producto = catalogo_queryset(campos=campos).get(pk=pk, estado=True)
+        serializer = ProductoSerializer(producto, campos=campos)
         return Response(serializer.data)
     except Producto.DoesNotExist:
         return Response(
@@ -274,11 +673,44 @@ def crear_producto(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# POST /api/productos/importar/ - Importación masiva desde CSV o NDJSON
+@api_view(['POST'])
+def importar_productos(request):
+    """Importar productos en lote; devuelve el reporte de errores por fila"""
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return Response(
+            {'error': 'Archivo (archivo) requerido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    formato = request.data.get('formato') or (
+        'ndjson' if archivo.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    )
+    if formato not in FORMATOS:
+        return Response(
+            {'error': 'Formato inválido. Use csv o ndjson'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        lote = int(request.data.get('lote', LOTE_POR_DEFECTO))
+        if not 1 <= lote <= LOTE_MAXIMO:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': f'El parámetro lote debe ser un entero entre 1 y {LOTE_MAXIMO}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(importar(archivo, formato, lote), status=status.HTTP_200_OK)
+
+
 # PUT /api/productos/{id}/actualizar/ - Actualizar producto
 @api_view(['PUT'])
 def actualizar_producto(request, pk):
     try:
-        producto = Producto.objects.get(pk=pk, estado=True)
+        producto = catalogo_queryset().get(pk=pk, estado=True)
     except Producto.DoesNotExist:
         return Response(
             {'error': 'Producto no encontrado o inactivo'}, 
@@ -315,7 +747,7 @@ def eliminar_producto(request, pk):
 @api_view(['POST'])
 def restaurar_producto(request, pk):
     try:
-        producto = Producto.objects.get(pk=pk, estado=False)
+        producto = catalogo_queryset().get(pk=pk, estado=False)
         producto.restaurar()
         serializer = ProductoSerializer(producto)
         return Response(
@@ -332,7 +764,7 @@ def restaurar_producto(request, pk):
         )
 
 
-# GET /api/productos/buscar/?q=texto - Búsqueda general
+# GET /api/productos/buscar/?q=texto - Búsqueda por relevancia (texto completo + trigram)
 @api_view(['GET'])
 def buscar_productos(request):
     query = request.query_params.get('q', None)
@@ -343,39 +775,132 @@ def buscar_productos(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    productos = Producto.objects.filter(
-        Q(descripcion__icontains=query) |
-        Q(categoria__descripcion__icontains=query) |
-        Q(marca__nombre__icontains=query),
-        estado=True
-    )
-    serializer = ProductoSerializer(productos, many=True)
+    campos = leer_campos(request, ProductoSerializer)
+    productos = buscar(catalogo_queryset(campos=campos).filter(estado=True), query)
+    pagina = paginar(request, productos, ProductoSerializer, paginador=PaginacionBusqueda(), campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = ProductoSerializer(productos, many=True, campos=campos)
+    return Response(serializer.data)
+
+
+# GET /api/productos/facetas/?categoria=&marca=&precio_min=&precio_max=&en_stock= - Catálogo con facetas
+@api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
+def facetas_productos(request):
+    """Página de productos activos filtrados, con conteos por categoría, marca y rango de precio"""
+    try:
+        filtros = leer_filtros(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    campos = leer_campos(request, ProductoSerializer)
+
+    activos = Producto.objects.filter(estado=True)
+    total, facetas = calcular_facetas(activos, filtros)
+
+    paginador = PaginacionCursor(Producto._meta.ordering)
+    pagina = paginador.paginate_queryset(filtrar(catalogo_queryset(activos, campos=campos), filtros), request)
+    serializer = ProductoSerializer(pagina, many=True, campos=campos)
+    return Response({
+        'total': total,
+        'next': paginador.get_next_link(),
+        'previous': paginador.get_previous_link(),
+        'results': serializer.data,
+        'facetas': facetas,
+    })
+
+
+def _filtros_catalogo(request):
+    """categoria y marca del catálogo; lanza ValueError con el mensaje para el cliente"""
+    filtros = {}
+    for campo in ('categoria', 'marca'):
+        valor = request.query_params.get(campo)
+        if valor:
+            if not valor.isdecimal():
+                raise ValueError(f'{campo} debe ser un id numérico')
+            filtros[f'{campo}_id'] = int(valor)
+    return filtros
+
+
+# GET /api/productos/catalogo/?categoria=&marca=&esp=RAM:16GB - Catálogo desde el modelo de lectura
+@api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
+def listar_catalogo(request):
+    """Productos activos ya desnormalizados: una sola tabla, sin joins ni prefetch"""
+    try:
+        filtros = _filtros_catalogo(request)
+        atributos = leer_atributos(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    campos = leer_campos(request, CatalogoProductoSerializer)
+    productos = filtrar_atributos(CatalogoProducto.objects.filter(**filtros), atributos)
+    productos = optimizar(productos, CatalogoProductoSerializer, campos)
+    pagina = paginar(request, productos, CatalogoProductoSerializer, campos=campos)
+    if pagina is not None:
+        return pagina
+    serializer = CatalogoProductoSerializer(productos, many=True, campos=campos)
     return Response(serializer.data)
 
 
+# GET /api/productos/catalogo/atributos/?categoria=&esp= - Valores de especificaciones para filtrar
+@api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
+def facetas_atributos_catalogo(request):
+    """Valores de cada especificación en la categoría con su número de productos"""
+    try:
+        filtros = _filtros_catalogo(request)
+        atributos = leer_atributos(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if 'categoria_id' not in filtros:
+        return Response(
+            {'error': 'categoria es obligatorio para listar los atributos'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    productos = CatalogoProducto.objects.filter(**filtros)
+    return Response({
+        'total': filtrar_atributos(productos, atributos).count(),
+        'atributos': facetas_atributos(productos, atributos),
+    })
+
+
 # GET /api/productos/categoria/{categoria_id}/ - Filtrar por categoría
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def listar_productos_por_categoria(request, categoria_id):
-    productos = Producto.objects.filter(categoria_id=categoria_id, estado=True)
-    serializer = ProductoSerializer(productos, many=True)
+    campos = leer_campos(request, ProductoSerializer)
+    productos = catalogo_queryset(campos=campos).filter(categoria_id=categoria_id, estado=True)
+    serializer = ProductoSerializer(productos, many=True, campos=campos)
     return Response(serializer.data)
 
 
 # GET /api/productos/marca/{marca_id}/ - Filtrar por marca
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def listar_productos_por_marca(request, marca_id):
-    productos = Producto.objects.filter(marca_id=marca_id, estado=True)
-    serializer = ProductoSerializer(productos, many=True)
+    campos = leer_campos(request, ProductoSerializer)
+    productos = catalogo_queryset(campos=campos).filter(marca_id=marca_id, estado=True)
+    serializer = ProductoSerializer(productos, many=True, campos=campos)
     return Response(serializer.data)
 
 
 # GET /api/productos/categoria/{categoria_id}/marca/{marca_id}/ - Filtrar por categoría y marca
 @api_view(['GET'])
+@condicional(cache_catalogo.validador)
+@cache_catalogo.cachear
 def listar_productos_por_categoria_marca(request, categoria_id, marca_id):
-    productos = Producto.objects.filter(
+    campos = leer_campos(request, ProductoSerializer)
+    productos = catalogo_queryset(campos=campos).filter(
         categoria_id=categoria_id, 
         marca_id=marca_id, 
         estado=True
     )
-    serializer = ProductoSerializer(productos, many=True)
+    serializer = ProductoSerializer(productos, many=True, campos=campos)
     return Response(serializer.data)
\ No newline at end of file
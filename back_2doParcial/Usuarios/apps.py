@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Usuarios'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from .autenticacion import invalidar_usuario
+        from .models import Usuario
+        from .tokens import revocar_si_inactivo
+        # delete() y restaurar() son lógicos y pasan por save()
+        post_save.connect(invalidar_usuario, sender=Usuario, dispatch_uid='cache_usuarios_save')
+        post_delete.connect(invalidar_usuario, sender=Usuario, dispatch_uid='cache_usuarios_delete')
+        post_save.connect(revocar_si_inactivo, sender=Usuario, dispatch_uid='refresh_tokens_inactivo')
@@ -0,0 +1,91 @@
+import copy
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from Api_2doParcial.cache import CacheLRU
+from .jwt_utils import decode_token
+from .models import Usuario
+from .revocaciones import revocaciones
+
+# Usuarios de los tokens, cacheados por id en memoria del proceso.
+#
+# El token ya trae id, tipo_usuario y 'ver' (version_token del usuario al
+# emitirlo), así que autenticar una petición es decodificar el JWT y
+# comparar contra el usuario cacheado: sin consulta mientras esté en la
+# cache. Guardar un usuario (incluidos delete() y restaurar()) lo saca de
+# la cache de este proceso; en los demás procesos vence a los
+# JWT_USUARIOS_CACHE_TTL segundos, que es la demora máxima para que un
+# usuario desactivado o con otra contraseña deje de entrar.
+
+cache_usuarios = CacheLRU(getattr(settings, 'JWT_USUARIOS_CACHE_MAX', 10_000))
+_NO_EXISTE = object()
+
+
+def invalidar_usuario(sender=None, instance=None, **kwargs):
+    """Receptor de post_save/post_delete de Usuario (o llamada directa con instance)"""
+    if instance is None or instance.pk is None:
+        return
+    clave = f'usuario:{instance.pk}'
+    cache_usuarios.delete(clave)
+    # Otra petición pudo volver a cachear la fila anterior antes del commit
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache_usuarios.delete(clave))
+
+
+def obtener_usuario(usuario_id):
+    """Usuario por id (activo o no) desde la cache, o None si no existe"""
+    ttl = getattr(settings, 'JWT_USUARIOS_CACHE_TTL', 60)
+    clave = f'usuario:{usuario_id}'
+    usuario = cache_usuarios.get(clave) if ttl > 0 else None
+    if usuario is None:
+        usuario = Usuario.objects.filter(pk=usuario_id).first() or _NO_EXISTE
+        if ttl > 0:
+            cache_usuarios.set(clave, usuario, ttl)
+    # Copia: la vista puede modificar request.user sin tocar la cache
+    return None if usuario is _NO_EXISTE else copy.copy(usuario)
+
+
+def usuario_de_payload(payload):
+    """
+    Usuario activo del token si el token sigue vigente para él (misma
+    version_token y familia no revocada, ver revocaciones.py), o None.
+    """
+    if 'fam' in payload and revocaciones.revocada(payload['fam']):
+        return None
+    usuario = obtener_usuario(payload.get('id'))
+    if usuario is None or not usuario.estado or payload.get('ver', 1) != usuario.version_token:
+        return None
+    return usuario
+
+
+def token_del_header(request):
+    """El token de 'Authorization: Bearer <token>', o None si el header no tiene ese formato"""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0].lower() != 'bearer':
+        return None
+    return parts[1]
+
+
+class JWTAutenticacion(BaseAuthentication):
+    """
+    Autenticación de DRF con los mismos tokens que jwt_required, para usar
+    en authentication_classes. Sin header deja la petición anónima.
+    """
+
+    def authenticate(self, request):
+        if 'Authorization' not in request.headers:
+            return None
+        token = token_del_header(request)
+        if token is None:
+            raise AuthenticationFailed('Formato de token inválido. Use: Bearer <token>')
+        payload = decode_token(token)
+        if payload is None:
+            raise AuthenticationFailed('Token inválido o expirado')
+        usuario = usuario_de_payload(payload)
+        if usuario is None:
+            raise AuthenticationFailed('Usuario no encontrado o inactivo')
+        return usuario, payload
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -1,12 +1,13 @@
 from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
+from .autenticacion import token_del_header, usuario_de_payload
 from .jwt_utils import decode_token
-from .models import Usuario
 
 def jwt_required(view_func):
     """
-    Decorador para proteger vistas con JWT
+    Decorador para proteger vistas con JWT. El usuario sale de la cache de
+    autenticacion.py: sin consulta a la base en cada petición.
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
@@ -20,16 +21,14 @@ def jwt_required(view_func):
             )
         
         # El formato debe ser: "Bearer <token>"
-        parts = auth_header.split()
+        token = token_del_header(request)
         
-        if len(parts) != 2 or parts[0].lower() != 'bearer':
+        if token is None:
             return Response(
                 {'error': 'Formato de token inválido. Use: Bearer <token>'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        token = parts[1]
-        
         # Decodificar y validar el token
         payload = decode_token(token)
         
@@ -39,16 +38,29 @@ def jwt_required(view_func):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        # Verificar que el usuario existe
-        try:
-            user = Usuario.objects.get(id=payload['id'])
-            request.user = user  # Agregar usuario al request
-        except Usuario.DoesNotExist:
+        # Verificar que el usuario existe, está activo y el token sigue vigente
+        user = usuario_de_payload(payload)
+        if user is None:
             return Response(
                 {'error': 'Usuario no encontrado'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
+        request.user = user  # Agregar usuario al request
         
         return view_func(request, *args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def usuario_del_token(request):
+    """
+    Usuario del header Authorization si trae un token válido, o None.
+    Para vistas que no exigen token pero registran quién hizo el cambio.
+    """
+    token = token_del_header(request)
+    if token is None:
+        return None
+
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return usuario_de_payload(payload)
@@ -2,16 +2,22 @@ import jwt
 import datetime
 from django.conf import settings
 
-def generate_token(user):
+def generate_token(user, familia=None):
     """
-    Genera un JWT token con información del usuario
+    Genera un JWT token (access token) con información del usuario.
+    `familia` es la del refresh token con el que se emitió (ver tokens.py)
     """
     payload = {
         'id': user.id,
         'username': user.username,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=settings.JWT_EXP_DELTA_HOURS),
+        # Claims para autorizar sin consultar la base (ver autenticacion.py)
+        'tipo_usuario': user.tipo_usuario,
+        'ver': user.version_token,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=settings.JWT_ACCESS_MINUTOS),
         'iat': datetime.datetime.utcnow()
     }
+    if familia is not None:
+        payload['fam'] = str(familia)
     
     token = jwt.encode(
         payload,
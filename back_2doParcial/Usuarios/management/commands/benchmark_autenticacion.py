@@ -0,0 +1,109 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from Usuarios.autenticacion import cache_usuarios
+from Usuarios.decorators import jwt_required
+from Usuarios.models import RefreshToken, Usuario
+from Usuarios.revocaciones import Revocaciones
+from Usuarios.tokens import emitir
+
+
+@api_view(['GET'])
+@jwt_required
+def _vista(request):
+    return Response({'id': request.user.id})
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de autenticar una petición con jwt_required, con y sin '
+        'la cache de usuarios, y el chequeo de revocación con el filtro de '
+        'Bloom contra una consulta, con familias revocadas sintéticas. Todo '
+        'dentro de una transacción que se descarta'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000, help='Peticiones por modo')
+        parser.add_argument('--revocadas', type=int, default=100_000, help='Familias revocadas a generar')
+
+    def handle(self, *args, **options):
+        if options['peticiones'] < 1:
+            raise CommandError('--peticiones debe ser mayor a 0')
+        try:
+            with transaction.atomic():
+                self._medir(options['peticiones'], options['revocadas'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _medir(self, peticiones, revocadas):
+        usuario = Usuario.objects.create(
+            username=f'benchmark-{time.time_ns()}', correo=f'benchmark-{time.time_ns()}@example.com',
+            password='benchmark', tipo_usuario='administrador'
+        )
+        ahora = timezone.now()
+        RefreshToken.objects.bulk_create(
+            [
+                RefreshToken(
+                    usuario=usuario, hash=uuid.uuid4().hex * 2, familia=uuid.uuid4(),
+                    expira=ahora + timedelta(days=1), revocado=ahora
+                )
+                for _ in range(revocadas)
+            ],
+            batch_size=5000
+        )
+        factory = RequestFactory()
+        header = f'Bearer {emitir(usuario)["token"]}'
+
+        def medir(titulo):
+            tiempos = []
+            with CaptureQueriesContext(connection) as contexto:
+                for _ in range(peticiones):
+                    request = factory.get('/benchmark/', HTTP_AUTHORIZATION=header)
+                    inicio = time.perf_counter()
+                    response = _vista(request)
+                    tiempos.append((time.perf_counter() - inicio) * 1_000_000)
+                    if response.status_code != 200:
+                        raise CommandError(f'{titulo}: respuesta {response.status_code}')
+            tiempos.sort()
+            self.stdout.write(
+                f'{titulo}: mediana {statistics.median(tiempos):.0f} µs, '
+                f'p95 {tiempos[min(int(len(tiempos) * 0.95), len(tiempos) - 1)]:.0f} µs, '
+                f'{len(contexto.captured_queries) / peticiones:.2f} consultas por petición'
+            )
+
+        with override_settings(JWT_USUARIOS_CACHE_TTL=0):
+            medir('Sin cache (usuario por consulta)')
+        cache_usuarios.delete(f'usuario:{usuario.pk}')
+        medir('Con cache de usuarios y filtro de revocados')
+
+        filtro = Revocaciones(intervalo=3600)
+        inicio = time.perf_counter()
+        filtro.reconstruir()
+        self.stdout.write(f'Reconstruir el filtro con {revocadas} familias revocadas: {(time.perf_counter() - inicio) * 1000:.0f} ms')
+
+        familias = [str(uuid.uuid4()) for _ in range(peticiones)]
+        inicio = time.perf_counter()
+        for familia in familias:
+            filtro.revocada(familia)
+        por_filtro = (time.perf_counter() - inicio) / peticiones * 1_000_000
+        inicio = time.perf_counter()
+        for familia in familias:
+            RefreshToken.objects.filter(familia=familia, revocado__isnull=False).exists()
+        por_consulta = (time.perf_counter() - inicio) / peticiones * 1_000_000
+        self.stdout.write(
+            f'Chequeo de revocación: filtro {por_filtro:.1f} µs, consulta {por_consulta:.0f} µs; '
+            f'{filtro.confirmaciones} de {peticiones} familias no revocadas fueron a la base (falsos positivos)'
+        )
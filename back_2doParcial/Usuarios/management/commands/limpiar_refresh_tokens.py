@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Usuarios.models import RefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra los refresh tokens vencidos. Se conservan mientras algún access '
+        'token emitido con ellos pueda seguir vigente, para que su revocación '
+        'siga en el filtro'
+    )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(minutes=settings.JWT_ACCESS_MINUTOS)
+        borrados, _ = RefreshToken.objects.filter(expira__lt=limite).delete()
+        self.stdout.write(self.style.SUCCESS(f'{borrados} refresh tokens borrados'))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.hashers import make_password, check_password
 
 class Usuario(models.Model):
@@ -7,15 +8,41 @@ class Usuario(models.Model):
     password = models.CharField(max_length=255)
     tipo_usuario = models.CharField(max_length=20)
     estado = models.BooleanField(default=True)  # True = Activo, False = Inactivo (eliminado lógicamente)
+    # Va en el token ('ver'): al cambiar contraseña, tipo o estado los tokens anteriores dejan de valer
+    version_token = models.PositiveIntegerField(default=1)
     
     class Meta:
         db_table = 'usuarios'
+
+    # Campos que invalidan los tokens emitidos
+    CAMPOS_TOKEN = ('password', 'tipo_usuario', 'estado')
+
+    # Para DRF (request.user.is_authenticated) cuando el usuario viene del token
+    is_authenticated = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._valores_token = {
+            campo: getattr(instancia, campo) for campo in cls.CAMPOS_TOKEN if campo in instancia.__dict__
+        }
+        return instancia
     
     def save(self, *args, **kwargs):
         # Hashear la contraseña antes de guardar
         if not self.password.startswith('pbkdf2_'):
             self.password = make_password(self.password)
+
+        anteriores = getattr(self, '_valores_token', None)
+        if anteriores is not None and any(
+            getattr(self, campo) != valor for campo, valor in anteriores.items()
+        ):
+            self.version_token += 1
+            campos = kwargs.get('update_fields')
+            if campos is not None:
+                kwargs['update_fields'] = {*campos, 'version_token'}
         super().save(*args, **kwargs)
+        self._valores_token = {campo: getattr(self, campo) for campo in self.CAMPOS_TOKEN}
     
     def check_password(self, raw_password):
         # Verificar contraseña
@@ -34,3 +61,39 @@ class Usuario(models.Model):
     def __str__(self):
         return self.username
 
+
+
+class RefreshToken(models.Model):
+    """
+    Refresh token emitido en el login. Solo se guarda el SHA-256 del token.
+    Cada uso lo rota: se marca `usado` y se emite otro de la misma familia.
+    Reusar uno ya usado revoca la familia completa (token robado).
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='refresh_tokens')
+    hash = models.CharField(max_length=64, unique=True)
+    familia = models.UUIDField(db_index=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField()
+    usado = models.DateTimeField(null=True, blank=True)     # rotado por otro
+    revocado = models.DateTimeField(null=True, blank=True)  # logout, reutilización o usuario desactivado
+
+    class Meta:
+        db_table = 'refresh_tokens'
+        indexes = [
+            # Reconstrucción del filtro de revocados (revocaciones.py)
+            models.Index(fields=['revocado'], name='refresh_revocados_idx', condition=Q(revocado__isnull=False)),
+        ]
+
+
+class CubetaLogin(models.Model):
+    """
+    Token bucket de los límites del login (proteccion.py) guardado en la base
+    para que todos los workers compartan los mismos intentos. La clave es
+    '<ip|usuario>:<sha1>'.
+    """
+    clave = models.CharField(max_length=64, primary_key=True)
+    tokens = models.FloatField()
+    instante = models.DateTimeField(db_index=True)  # última actualización (para recargar y purgar)
+
+    class Meta:
+        db_table = 'login_cubetas'
@@ -0,0 +1,320 @@
+import hashlib
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils import timezone
+from .models import CubetaLogin
+
+# Protección del login contra ráfagas de intentos (credential stuffing).
+#
+# Cada verificación de contraseña es un PBKDF2 de cientos de miles de
+# iteraciones: sin límites, una ráfaga de intentos ocupa todas las CPU.
+# Antes de hashear se consultan dos token buckets:
+#   - por IP: cada intento toma un token (LOGIN_IP_RAFAGA, se recargan
+#     LOGIN_IP_POR_MINUTO por minuto);
+#   - por username: solo las contraseñas incorrectas toman un token y un
+#     login correcto la vuelve a llenar, así un usuario legítimo no queda
+#     bloqueado por sus propios logins.
+# Sin tokens la petición se rechaza con 429 sin hashear nada.
+#
+# Además, como mucho LOGIN_HASH_CONCURRENTES hashes corren a la vez por
+# proceso (el resto espera hasta LOGIN_HASH_ESPERA segundos y luego recibe
+# 503), opcionalmente en un pool de LOGIN_HASH_PROCESOS procesos para que
+# el trabajo de CPU no compita con los hilos que atienden el resto de la API.
+#
+# Por defecto ('base') las cubetas están en la tabla login_cubetas y los
+# límites valen para todos los workers: cada intento es un upsert atómico
+# en PostgreSQL, barato al lado del hash que evita. Con 'local' viven en
+# memoria de cada proceso (un servidor de desarrollo o un benchmark): con
+# N workers un atacante tendría N veces la ráfaga.
+
+
+class Ocupado(Exception):
+    """No hubo lugar para verificar la contraseña a tiempo"""
+
+
+def _recargar(estado, capacidad, por_segundo, ahora):
+    """Tokens disponibles ahora a partir de (tokens, instante) guardado"""
+    if estado is None:
+        return capacidad
+    tokens, antes = estado
+    return min(capacidad, tokens + max(ahora - antes, 0) * por_segundo)
+
+
+class Cubetas:
+    """Token buckets por clave en memoria del proceso, con desalojo LRU"""
+
+    def __init__(self, capacidad, por_minuto, max_claves=100_000, reloj=time.monotonic):
+        self.capacidad = capacidad
+        self.por_segundo = por_minuto / 60
+        self.max_claves = max_claves
+        self.reloj = reloj
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _espera(self, tokens):
+        return 0 if tokens >= 1 else (1 - tokens) / self.por_segundo
+
+    def espera(self, clave):
+        """Segundos hasta que haya un token (0 si ya hay), sin tomarlo"""
+        with self._lock:
+            return self._espera(_recargar(self._datos.get(clave), self.capacidad, self.por_segundo, self.reloj()))
+
+    def tomar(self, clave):
+        """Toma un token: devuelve 0, o los segundos de espera si no había"""
+        with self._lock:
+            ahora = self.reloj()
+            tokens = _recargar(self._datos.get(clave), self.capacidad, self.por_segundo, ahora)
+            espera = self._espera(tokens)
+            self._datos[clave] = (tokens - 1 if espera == 0 else tokens, ahora)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_claves:
+                self._datos.popitem(last=False)
+            return espera
+
+    def reiniciar(self, clave=None):
+        """Llena la cubeta de una clave (o todas)"""
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+
+# Tokens de la cubeta `c` recargados hasta ahora
+_RECARGADAS = (
+    'LEAST(%(capacidad)s, c.tokens + EXTRACT(EPOCH FROM clock_timestamp() - c.instante)::float8 * %(por_segundo)s)'
+)
+
+
+class CubetasBase(Cubetas):
+    """
+    Las mismas cubetas en la tabla login_cubetas, compartidas por todos los
+    workers. Tomar un token es un solo INSERT ... ON CONFLICT DO UPDATE: la
+    fila queda bloqueada mientras se recarga y se descuenta, así dos
+    intentos simultáneos no pueden tomar el mismo token.
+    """
+
+    # Cada cuántos intentos se borran las cubetas que ya volvieron a llenarse
+    PURGAR_CADA = 1000
+
+    def __init__(self, capacidad, por_minuto, prefijo):
+        super().__init__(capacidad, por_minuto)
+        self.prefijo = prefijo
+        # Una cubeta que no se toca en este tiempo ya está llena
+        self.llena_en = max(int(capacidad / self.por_segundo) + 1, 1)
+        self._intentos = 0
+
+    def _clave(self, clave):
+        return f'{self.prefijo}:{hashlib.sha1(clave.encode()).hexdigest()}'
+
+    def _tokens(self, cursor, clave):
+        cursor.execute(
+            f'SELECT {_RECARGADAS} FROM {CubetaLogin._meta.db_table} c WHERE c.clave = %(clave)s',
+            {'clave': clave, 'capacidad': self.capacidad, 'por_segundo': self.por_segundo}
+        )
+        fila = cursor.fetchone()
+        return self.capacidad if fila is None else fila[0]
+
+    def espera(self, clave):
+        with connection.cursor() as cursor:
+            return self._espera(self._tokens(cursor, self._clave(clave)))
+
+    def tomar(self, clave):
+        clave = self._clave(clave)
+        with connection.cursor() as cursor:
+            # Sin token disponible el WHERE no actualiza y no vuelve ninguna fila
+            cursor.execute(
+                f"""
+                INSERT INTO {CubetaLogin._meta.db_table} AS c (clave, tokens, instante)
+                VALUES (%(clave)s, %(capacidad)s - 1, clock_timestamp())
+                ON CONFLICT (clave) DO UPDATE
+                    SET tokens = {_RECARGADAS} - 1, instante = clock_timestamp()
+                    WHERE {_RECARGADAS} >= 1
+                RETURNING c.tokens
+                """,
+                {'clave': clave, 'capacidad': self.capacidad, 'por_segundo': self.por_segundo}
+            )
+            if cursor.fetchone() is not None:
+                self._purgar()
+                return 0
+            espera = self._espera(self._tokens(cursor, clave))
+        # Si se recargó entre las dos consultas, que reintente en un segundo
+        return espera or 1
+
+    def _purgar(self):
+        self._intentos += 1
+        if self._intentos % self.PURGAR_CADA:
+            return
+        CubetaLogin.objects.filter(
+            clave__startswith=f'{self.prefijo}:',
+            instante__lt=timezone.now() - timedelta(seconds=self.llena_en)
+        ).delete()
+
+    def reiniciar(self, clave=None):
+        cubetas = CubetaLogin.objects.filter(clave__startswith=f'{self.prefijo}:')
+        if clave is not None:
+            cubetas = cubetas.filter(clave=self._clave(clave))
+        cubetas.delete()
+
+
+def crear_cubetas(nombre, capacidad, por_minuto):
+    """Cubetas según LOGIN_CUBETAS_BACKEND ('base' o 'local')"""
+    backend = getattr(settings, 'LOGIN_CUBETAS_BACKEND', 'base')
+    if backend == 'base':
+        return CubetasBase(capacidad, por_minuto, nombre)
+    if backend == 'local':
+        return Cubetas(capacidad, por_minuto)
+    raise ImproperlyConfigured(f"LOGIN_CUBETAS_BACKEND debe ser 'base' o 'local', no {backend!r}")
+
+
+def _resumen(muestras):
+    """Promedio, percentiles y máximo en milisegundos"""
+    if not muestras:
+        return None
+    ordenadas = sorted(muestras)
+
+    def percentil(p):
+        return round(ordenadas[min(int(len(ordenadas) * p), len(ordenadas) - 1)] * 1000, 2)
+
+    return {
+        'promedio': round(statistics.mean(ordenadas) * 1000, 2),
+        'p50': percentil(0.5),
+        'p95': percentil(0.95),
+        'p99': percentil(0.99),
+        'max': round(ordenadas[-1] * 1000, 2),
+    }
+
+
+class ProteccionLogin:
+    """Límites por IP y por username, cupos para hashear y métricas del hash"""
+
+    def __init__(self, procesos=0, concurrentes=4, espera=2, muestras=1000):
+        self.cubetas_ip = crear_cubetas(
+            'ip', getattr(settings, 'LOGIN_IP_RAFAGA', 20), getattr(settings, 'LOGIN_IP_POR_MINUTO', 10)
+        )
+        self.cubetas_usuario = crear_cubetas(
+            'usuario', getattr(settings, 'LOGIN_USUARIO_RAFAGA', 5), getattr(settings, 'LOGIN_USUARIO_POR_MINUTO', 1)
+        )
+        self.procesos = procesos
+        self.concurrentes = concurrentes
+        self.espera = espera
+        self.verificaciones = 0
+        self.en_curso = 0
+        self.rechazos = {'ip': 0, 'usuario': 0, 'ocupado': 0}
+        self._latencias = deque(maxlen=muestras)
+        self._esperas = deque(maxlen=muestras)
+        self._cupos = threading.BoundedSemaphore(concurrentes)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _ejecutor(self):
+        # 'spawn' evita heredar conexiones y hilos del proceso de Django
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.procesos, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def admitir(self, ip, username):
+        """
+        0 si el intento puede hashear, o los segundos a esperar. El intento
+        toma un token de la IP; la cubeta del username solo se consulta.
+        """
+        espera = self.cubetas_usuario.espera(username.lower())
+        if espera:
+            self.rechazos['usuario'] += 1
+            return espera
+        espera = self.cubetas_ip.tomar(ip)
+        if espera:
+            self.rechazos['ip'] += 1
+        return espera
+
+    def fallo(self, username):
+        """Contraseña incorrecta para un usuario existente: toma un token del username"""
+        self.cubetas_usuario.tomar(username.lower())
+
+    def exito(self, username):
+        self.cubetas_usuario.reiniciar(username.lower())
+
+    def verificar(self, password, encoded):
+        """
+        check_password dentro de un cupo (y en el pool si hay procesos).
+        Lanza Ocupado si no se libera un cupo en `espera` segundos.
+        """
+        inicio = time.perf_counter()
+        if not self._cupos.acquire(timeout=self.espera):
+            self.rechazos['ocupado'] += 1
+            raise Ocupado
+        try:
+            with self._lock:
+                self.en_curso += 1
+            comienzo = time.perf_counter()
+            if self.procesos:
+                valida = self._ejecutor().submit(check_password, password, encoded).result()
+            else:
+                valida = check_password(password, encoded)
+            with self._lock:
+                self.verificaciones += 1
+                self._latencias.append(time.perf_counter() - comienzo)
+                self._esperas.append(comienzo - inicio)
+            return valida
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+            self._cupos.release()
+
+    def estadisticas(self):
+        hasher = get_hasher()
+        with self._lock:
+            latencias, esperas = list(self._latencias), list(self._esperas)
+        return {
+            'algoritmo': hasher.algorithm,
+            'iteraciones': getattr(hasher, 'iterations', None),
+            'procesos': self.procesos,
+            'concurrentes': self.concurrentes,
+            'en_curso': self.en_curso,
+            'verificaciones': self.verificaciones,
+            'rechazos': dict(self.rechazos),
+            'hash_ms': _resumen(latencias),
+            'espera_ms': _resumen(esperas),
+        }
+
+    def reiniciar(self):
+        """Vacía cubetas y métricas de este proceso (pruebas y benchmarks)"""
+        self.cubetas_ip.reiniciar()
+        self.cubetas_usuario.reiniciar()
+        with self._lock:
+            self.verificaciones = 0
+            self.rechazos = dict.fromkeys(self.rechazos, 0)
+            self._latencias.clear()
+            self._esperas.clear()
+
+
+def ip_cliente(request):
+    """
+    IP del cliente: REMOTE_ADDR, o la que agregó el primero de los
+    LOGIN_PROXIES proxies de confianza en X-Forwarded-For.
+    """
+    proxies = getattr(settings, 'LOGIN_PROXIES', 0)
+    if proxies:
+        reenviadas = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(reenviadas) >= proxies:
+            return reenviadas[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+proteccion = ProteccionLogin(
+    getattr(settings, 'LOGIN_HASH_PROCESOS', 0),
+    getattr(settings, 'LOGIN_HASH_CONCURRENTES', 4),
+    getattr(settings, 'LOGIN_HASH_ESPERA', 2),
+)
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from .models import RefreshToken
+
+# Revocación de access tokens sin consulta por petición.
+#
+# Cada access token lleva la familia de su refresh token ('fam'). Las
+# familias revocadas (logout, reutilización de un refresh, usuario
+# desactivado) van a un filtro de Bloom en memoria del proceso que se
+# reconstruye desde la base cada JWT_REVOCACIONES_INTERVALO segundos.
+# Comprobar un token es un hash y unas lecturas de bits; solo si el filtro
+# dice "quizás" (revocada o falso positivo) se confirma con la base. La
+# reconstrucción corre en un hilo aparte: ninguna petición la espera salvo
+# la primera del proceso.
+#
+# Solo se cargan las familias revocadas en los últimos JWT_ACCESS_MINUTOS:
+# las anteriores ya no tienen access tokens vigentes. Una revocación hecha
+# en este proceso entra al filtro al instante (también si hay una
+# reconstrucción en curso); en los demás, en la próxima reconstrucción.
+
+
+class FiltroBloom:
+    """Conjunto probabilístico: sin falsos negativos, falsos positivos acotados"""
+
+    def __init__(self, bits=1 << 20, hashes=7):
+        self.bits = bits
+        self.hashes = hashes
+        self._arreglo = bytearray((bits + 7) // 8)
+
+    def _posiciones(self, valor):
+        # Doble hash (Kirsch-Mitzenmacher): un solo blake2b da las k posiciones
+        resumen = hashlib.blake2b(str(valor).encode(), digest_size=16).digest()
+        a = int.from_bytes(resumen[:8], 'big')
+        b = int.from_bytes(resumen[8:], 'big') | 1
+        return [(a + indice * b) % self.bits for indice in range(self.hashes)]
+
+    def agregar(self, valor):
+        for posicion in self._posiciones(valor):
+            self._arreglo[posicion >> 3] |= 1 << (posicion & 7)
+
+    def __contains__(self, valor):
+        return all(self._arreglo[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(valor))
+
+
+class Revocaciones:
+    def __init__(self, intervalo=None, bits=None, hashes=None, reloj=time.monotonic):
+        self.intervalo = intervalo if intervalo is not None else settings.JWT_REVOCACIONES_INTERVALO
+        self.bits = bits or settings.JWT_BLOOM_BITS
+        self.hashes = hashes or settings.JWT_BLOOM_HASHES
+        self.reloj = reloj
+        self.confirmaciones = 0  # consultas a la base por un "quizás" del filtro
+        self._filtro = None
+        self._construido = None
+        self._lock = threading.Lock()
+        # Revocaciones de este proceso mientras corre una reconstrucción (None si no hay ninguna)
+        self._agregadas = None
+        self._lock_agregadas = threading.Lock()
+
+    def _familias(self, desde):
+        # Ningún access token dura más de JWT_ACCESS_MINUTOS: una familia revocada
+        # antes de `desde` ya no tiene tokens vigentes (un minuto de margen por
+        # diferencias de reloj entre servidores)
+        return (
+            RefreshToken.objects.filter(revocado__gt=desde - timedelta(minutes=1))
+            .values_list('familia', flat=True).distinct().iterator()
+        )
+
+    def reconstruir(self):
+        """Filtro nuevo con las familias revocadas cuyos access tokens pueden seguir vigentes"""
+        desde = timezone.now() - timedelta(minutes=settings.JWT_ACCESS_MINUTOS)
+        with self._lock_agregadas:
+            self._agregadas = []
+        try:
+            filtro = FiltroBloom(self.bits, self.hashes)
+            for familia in self._familias(desde):
+                filtro.agregar(familia)
+            with self._lock_agregadas:
+                # Lo revocado aquí mientras corría la consulta puede no estar en
+                # su resultado: se pasa al filtro nuevo antes de reemplazar el anterior
+                for familia in self._agregadas:
+                    filtro.agregar(familia)
+                self._filtro, self._construido = filtro, self.reloj()
+        finally:
+            with self._lock_agregadas:
+                self._agregadas = None
+        return filtro
+
+    def _vigente(self):
+        filtro = self._filtro
+        if filtro is None:
+            # Primera vez en el proceso: hay que esperar el filtro
+            with self._lock:
+                if self._filtro is None:
+                    self.reconstruir()
+            return self._filtro
+        if self.reloj() - self._construido >= self.intervalo and self._lock.acquire(blocking=False):
+            # Vencido: se reconstruye en otro hilo y mientras tanto se usa el anterior
+            threading.Thread(target=self._reconstruir_en_segundo_plano, daemon=True).start()
+        return filtro
+
+    def _reconstruir_en_segundo_plano(self):
+        try:
+            self.reconstruir()
+        except DatabaseError:
+            # Se reintenta en la próxima petición; el filtro anterior sigue en uso
+            pass
+        finally:
+            connection.close()
+            self._lock.release()
+
+    def agregar(self, familia):
+        """Revocación hecha en este proceso: entra al filtro sin esperar la reconstrucción"""
+        with self._lock_agregadas:
+            if self._agregadas is not None:
+                self._agregadas.append(familia)
+            if self._filtro is not None:
+                self._filtro.agregar(familia)
+
+    def revocada(self, familia):
+        if familia not in self._vigente():
+            return False
+        self.confirmaciones += 1
+        return RefreshToken.objects.filter(familia=familia, revocado__isnull=False).exists()
+
+
+revocaciones = Revocaciones()
@@ -14,3 +14,5 @@ class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+class RefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
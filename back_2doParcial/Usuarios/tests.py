@@ -1,3 +1,290 @@
-from django.test import TestCase
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from .decorators import jwt_required, usuario_del_token
+from .jwt_utils import decode_token, generate_token
+from .models import CubetaLogin, RefreshToken, Usuario
+from .proteccion import Cubetas, CubetasBase, Ocupado, ProteccionLogin, crear_cubetas, proteccion
+from .revocaciones import FiltroBloom, Revocaciones, revocaciones
 
-# Create your tests here.
+
+@api_view(['GET'])
+@jwt_required
+def vista_protegida(request):
+    return Response({'id': request.user.id, 'tipo_usuario': request.user.tipo_usuario})
+
+
+class AutenticacionCacheadaTest(TestCase):
+    """jwt_required resuelve el usuario del token sin consultar la base en cada petición"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(
+            username='cajero', correo='cajero@example.com', password='secreta', tipo_usuario='cajero'
+        )
+        self.factory = RequestFactory()
+
+    def pedir(self, token=None):
+        token = token or generate_token(self.usuario)
+        return vista_protegida(self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+    def test_claims_y_cache(self):
+        token = generate_token(self.usuario)
+        payload = decode_token(token)
+        self.assertEqual((payload['tipo_usuario'], payload['ver']), ('cajero', self.usuario.version_token))
+
+        self.assertEqual(self.pedir(token).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.pedir(token)
+        self.assertEqual(response.data, {'id': self.usuario.id, 'tipo_usuario': 'cajero'})
+
+    def test_eliminar_y_restaurar_invalidan(self):
+        token = generate_token(self.usuario)
+        self.assertEqual(self.pedir(token).status_code, 200)
+
+        self.usuario.delete()
+        self.assertEqual(self.pedir(token).status_code, 401)
+        self.assertIsNone(usuario_del_token(self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')))
+
+        # Los tokens emitidos antes de la eliminación no vuelven a valer
+        self.usuario.restaurar()
+        self.assertEqual(self.pedir(token).status_code, 401)
+        self.assertEqual(self.pedir().status_code, 200)
+
+    def test_cambios_de_credenciales(self):
+        token = generate_token(self.usuario)
+        self.usuario.correo = 'caja1@example.com'
+        self.usuario.save()
+        self.assertEqual(self.pedir(token).status_code, 200)
+
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        usuario.password = 'otra'
+        usuario.save(update_fields=['password'])
+        self.assertEqual(self.pedir(token).status_code, 401)
+        self.assertEqual(Usuario.objects.get(pk=self.usuario.pk).version_token, self.usuario.version_token + 1)
+
+    def test_tokens_invalidos(self):
+        self.assertEqual(vista_protegida(self.factory.get('/')).status_code, 401)
+        self.assertEqual(vista_protegida(self.factory.get('/', HTTP_AUTHORIZATION='Token x')).status_code, 401)
+        self.assertEqual(self.pedir('no-es-un-jwt').status_code, 401)
+
+
+class RefreshTokensTest(TestCase):
+    """Access tokens cortos, refresh tokens rotados y revocación por familia"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(
+            username='vendedor', correo='vendedor@example.com', password='secreta', tipo_usuario='vendedor'
+        )
+        self.factory = RequestFactory()
+
+    def login(self):
+        response = self.client.post(
+            reverse('login'), {'username': 'vendedor', 'password': 'secreta'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def post(self, nombre, refresh):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(nombre), {'refresh': refresh}, content_type='application/json')
+
+    def acceso(self, token):
+        return vista_protegida(self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')).status_code
+
+    def test_rotacion_y_reutilizacion(self):
+        sesion = self.login()
+        self.assertEqual(RefreshToken.objects.get().hash, hashlib.sha256(sesion['refresh'].encode()).hexdigest())
+
+        nueva = self.post('refrescar-token', sesion['refresh']).data
+        self.assertNotEqual(nueva['refresh'], sesion['refresh'])
+        self.assertEqual(self.acceso(nueva['token']), 200)
+
+        # Reusar el refresh ya rotado revoca toda la familia
+        self.assertEqual(self.post('refrescar-token', sesion['refresh']).status_code, 401)
+        self.assertEqual(self.acceso(nueva['token']), 401)
+        self.assertEqual(self.post('refrescar-token', nueva['refresh']).status_code, 401)
+
+    def test_logout_corta_solo_su_familia(self):
+        primera, segunda = self.login(), self.login()
+        self.assertEqual(self.acceso(primera['token']), 200)
+
+        self.assertEqual(self.post('logout', primera['refresh']).status_code, 200)
+        self.assertEqual(self.acceso(primera['token']), 401)
+        self.assertEqual(self.acceso(segunda['token']), 200)
+        self.assertEqual(self.post('logout', 'no-existe').status_code, 401)
+
+    def test_desactivar_revoca_refresh(self):
+        sesion = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.delete()
+        self.usuario.restaurar()
+        self.assertEqual(self.post('refrescar-token', sesion['refresh']).status_code, 401)
+
+    def test_chequeo_sin_consultas(self):
+        sesion = self.login()
+        self.acceso(sesion['token'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.acceso(sesion['token']), 200)
+        self.assertFalse(revocaciones.revocada(str(uuid.uuid4())))
+
+    def test_filtro_bloom(self):
+        filtro = FiltroBloom(bits=1 << 14, hashes=7)
+        presentes = [uuid.uuid4() for _ in range(1000)]
+        for valor in presentes:
+            filtro.agregar(valor)
+        self.assertTrue(all(valor in filtro for valor in presentes))
+        falsos = sum(uuid.uuid4() in filtro for _ in range(2000))
+        self.assertLess(falsos, 100)  # ~1% esperado con 16 bits por elemento
+
+    def test_reconstruir_solo_revocaciones_recientes(self):
+        reciente, antigua = self.login(), self.login()
+        self.post('logout', reciente['refresh'])
+        self.post('logout', antigua['refresh'])
+        familia_reciente = decode_token(reciente['token'])['fam']
+        familia_antigua = decode_token(antigua['token'])['fam']
+        # Revocada hace más que la vida de un access token: ya no hace falta en el filtro
+        RefreshToken.objects.filter(familia=familia_antigua).update(
+            revocado=timezone.now() - timedelta(minutes=settings.JWT_ACCESS_MINUTOS + 5)
+        )
+
+        filtro = Revocaciones(bits=1 << 14).reconstruir()
+        self.assertIn(familia_reciente, filtro)
+        self.assertNotIn(familia_antigua, filtro)
+
+    def test_revocacion_durante_reconstruccion(self):
+        familia = str(uuid.uuid4())
+
+        class Lenta(Revocaciones):
+            def _familias(self, desde):
+                # La revocación llega mientras corre la consulta y no está en su resultado
+                resultado = list(super()._familias(desde))
+                self.agregar(familia)
+                return resultado
+
+        registro = Lenta(bits=1 << 14)
+        filtro = registro.reconstruir()
+        self.assertIn(familia, filtro)
+        self.assertIs(registro._vigente(), filtro)
+
+
+class ProteccionLoginTest(TestCase):
+    """Cubetas por IP y por username antes de hashear, cupos para el hash y métricas"""
+
+    def setUp(self):
+        proteccion.reiniciar()
+        self.addCleanup(proteccion.reiniciar)
+        Usuario.objects.create(username='cajera', correo='cajera@example.com', password='secreta', tipo_usuario='cajero')
+
+    def login(self, username='cajera', password='secreta', ip='10.0.0.1'):
+        return self.client.post(
+            reverse('login'), {'username': username, 'password': password},
+            content_type='application/json', REMOTE_ADDR=ip
+        )
+
+    def test_cubeta(self):
+        ahora = [0.0]
+        cubetas = Cubetas(capacidad=2, por_minuto=60, reloj=lambda: ahora[0])
+        self.assertEqual((cubetas.tomar('a'), cubetas.tomar('a')), (0, 0))
+        self.assertAlmostEqual(cubetas.tomar('a'), 1.0)
+        self.assertEqual(cubetas.tomar('b'), 0)
+        ahora[0] = 1.0
+        self.assertEqual(cubetas.espera('a'), 0)
+        self.assertEqual(cubetas.tomar('a'), 0)
+        self.assertGreater(cubetas.tomar('a'), 0)
+
+    def test_cubeta_en_base(self):
+        cubetas = CubetasBase(capacidad=2, por_minuto=6, prefijo='prueba')
+        self.assertEqual((cubetas.tomar('a'), cubetas.tomar('a')), (0, 0))
+        # Sin tokens: unos 10 s hasta el próximo (6 por minuto)
+        self.assertAlmostEqual(cubetas.tomar('a'), 10, delta=0.5)
+        self.assertGreater(cubetas.espera('a'), 9)
+        self.assertEqual(cubetas.tomar('b'), 0)
+        self.assertEqual(CubetaLogin.objects.filter(clave__startswith='prueba:').count(), 2)
+        cubetas.reiniciar('a')
+        self.assertEqual(cubetas.espera('a'), 0)
+        cubetas.reiniciar()
+        self.assertFalse(CubetaLogin.objects.exists())
+
+    def test_backend(self):
+        self.assertIsInstance(proteccion.cubetas_ip, CubetasBase)
+        with override_settings(LOGIN_CUBETAS_BACKEND='local'):
+            self.assertNotIsInstance(crear_cubetas('ip', 1, 1), CubetasBase)
+        with override_settings(LOGIN_CUBETAS_BACKEND='compartida'), self.assertRaises(ImproperlyConfigured):
+            crear_cubetas('ip', 1, 1)
+
+    def test_username_sin_hashear(self):
+        for _ in range(5):
+            self.assertEqual(self.login(password='otra').status_code, 401)
+        verificaciones = proteccion.verificaciones
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(proteccion.verificaciones, verificaciones)
+        # Mayúsculas no esquivan el límite; otro username sí puede entrar
+        self.assertEqual(self.login(username='CAJERA').status_code, 429)
+        self.assertEqual(self.login(username='nadie').status_code, 401)
+        self.assertEqual(proteccion.estadisticas()['rechazos']['usuario'], 2)
+
+    def test_exito_rellena_username(self):
+        for _ in range(4):
+            self.login(password='otra')
+        self.assertEqual(self.login().status_code, 200)
+        for _ in range(4):
+            self.assertEqual(self.login(password='otra').status_code, 401)
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_ip(self):
+        for _ in range(20):
+            self.assertEqual(self.login(username='nadie', ip='10.0.0.2').status_code, 401)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 429)
+        self.assertEqual(self.login(ip='10.0.0.3').status_code, 200)
+
+    def test_cupos(self):
+        protegido = ProteccionLogin(concurrentes=1, espera=0.01)
+        protegido._cupos.acquire()
+        with self.assertRaises(Ocupado):
+            protegido.verificar('secreta', make_password('secreta'))
+        protegido._cupos.release()
+        self.assertTrue(protegido.verificar('secreta', make_password('secreta')))
+        self.assertEqual(protegido.estadisticas()['rechazos']['ocupado'], 1)
+
+    def test_pool_de_procesos(self):
+        protegido = ProteccionLogin(procesos=1)
+        self.addCleanup(lambda: protegido._pool and protegido._pool.shutdown())
+        encoded = make_password('secreta')
+        self.assertTrue(protegido.verificar('secreta', encoded))
+        self.assertFalse(protegido.verificar('otra', encoded))
+
+    def test_estadisticas(self):
+        self.login()
+        datos = self.client.get(reverse('estadisticas-login')).data
+        self.assertEqual((datos['algoritmo'], datos['verificaciones']), ('pbkdf2_sha256', 1))
+        self.assertGreater(datos['iteraciones'], 0)
+        self.assertGreater(datos['hash_ms']['p50'], 0)
+
+
+class CubetasConcurrentesTest(TransactionTestCase):
+    """Intentos simultáneos desde varias conexiones (workers) sobre la misma cubeta"""
+
+    def test_no_se_toma_dos_veces_el_mismo_token(self):
+        cubetas = CubetasBase(capacidad=20, por_minuto=0.001, prefijo='prueba')
+
+        def intentar(_):
+            try:
+                return cubetas.tomar('10.0.0.9') == 0
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            admitidos = list(pool.map(intentar, range(60)))
+        self.assertEqual(sum(admitidos), 20)
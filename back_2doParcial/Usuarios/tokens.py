@@ -0,0 +1,87 @@
+import hashlib
+import secrets
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .jwt_utils import generate_token
+from .models import RefreshToken
+from .revocaciones import revocaciones
+
+# Refresh tokens: opacos, guardados como SHA-256 y rotados en cada uso.
+# El access token (JWT) dura JWT_ACCESS_MINUTOS y el refresh
+# JWT_REFRESH_DIAS; ver revocaciones.py para cómo se cortan los access
+# tokens de una familia revocada.
+
+
+class RefreshInvalido(Exception):
+    """Refresh token inexistente, vencido, revocado o reutilizado"""
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def emitir(usuario, familia=None):
+    """
+    Par {'token', 'refresh', 'expira_en'} para el usuario. Sin `familia`
+    abre una nueva (login).
+    """
+    familia = familia or uuid.uuid4()
+    refresh = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        usuario=usuario, hash=_hash(refresh), familia=familia,
+        expira=timezone.now() + timedelta(days=settings.JWT_REFRESH_DIAS)
+    )
+    return {
+        'token': generate_token(usuario, familia=familia),
+        'refresh': refresh,
+        'expira_en': settings.JWT_ACCESS_MINUTOS * 60,
+    }
+
+
+def revocar_familias(**filtro):
+    """Revoca las familias de los refresh tokens que cumplen `filtro`; devuelve cuántas"""
+    familias = list(RefreshToken.objects.filter(**filtro).values_list('familia', flat=True).distinct())
+    if familias:
+        RefreshToken.objects.filter(familia__in=familias, revocado__isnull=True).update(revocado=timezone.now())
+        for familia in familias:
+            transaction.on_commit(lambda familia=familia: revocaciones.agregar(familia))
+    return len(familias)
+
+
+def rotar(refresh):
+    """
+    Cambia un refresh token por un par nuevo de la misma familia. Si el
+    token ya se había usado, alguien lo copió: se revoca la familia y se
+    rechaza. Lanza RefreshInvalido.
+    """
+    with transaction.atomic():
+        fila = (
+            RefreshToken.objects.select_for_update().select_related('usuario')
+            .filter(hash=_hash(refresh)).first()
+        )
+        if fila is None or fila.revocado is not None or fila.expira <= timezone.now():
+            raise RefreshInvalido('Refresh token inválido o expirado')
+        if fila.usado is None:
+            if not fila.usuario.estado:
+                raise RefreshInvalido('Usuario inactivo')
+            fila.usado = timezone.now()
+            fila.save(update_fields=['usado'])
+            return emitir(fila.usuario, familia=fila.familia)
+        revocar_familias(familia=fila.familia)
+    # Fuera del atomic: la revocación queda confirmada aunque se rechace
+    raise RefreshInvalido('Refresh token reutilizado: se cerraron las sesiones de esa familia')
+
+
+def cerrar_sesion(refresh):
+    """Logout: revoca la familia del refresh token. Devuelve False si no existe"""
+    with transaction.atomic():
+        return revocar_familias(hash=_hash(refresh)) > 0
+
+
+def revocar_si_inactivo(sender, instance, **kwargs):
+    """post_save de Usuario: al desactivarlo se revocan todas sus familias"""
+    if not instance.estado:
+        revocar_familias(usuario_id=instance.pk, revocado__isnull=True)
@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     # === RUTAS DE USUARIOS ===
     path('login/', views.login, name='login'),
+    path('login/estadisticas/', views.estadisticas_login, name='estadisticas-login'),
+    path('token/refrescar/', views.refrescar_token, name='refrescar-token'),
+    path('logout/', views.logout, name='logout'),
     
     # Listar
     path('usuarios/', views.listar_usuarios, name='listar-usuarios'),
@@ -1,9 +1,11 @@
+import math
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Usuario
-from .serializers import UsuarioSerializer, LoginSerializer
-from .jwt_utils import generate_token
+from .proteccion import Ocupado, ip_cliente, proteccion
+from .serializers import UsuarioSerializer, LoginSerializer, RefreshSerializer
+from .tokens import RefreshInvalido, cerrar_sesion, emitir, rotar
 
 # POST /api/login/ - Login de usuario
 @api_view(['POST'])
@@ -16,23 +18,34 @@ def login(request):
     username = serializer.validated_data['username']
     password = serializer.validated_data['password']
     
+    # Rechazar antes de hashear si la IP o el username agotaron sus intentos
+    espera = proteccion.admitir(ip_cliente(request), username)
+    if espera:
+        return Response(
+            {'error': 'Demasiados intentos de inicio de sesión', 'reintentar_en': math.ceil(espera)},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(math.ceil(espera))}
+        )
+    
     try:
         # Buscar usuario por username (solo activos)
         usuario = Usuario.objects.get(username=username, estado=True)
         
-        # Verificar contraseña
-        if not usuario.check_password(password):
+        # Verificar contraseña (con cupo limitado, ver proteccion.py)
+        if not proteccion.verificar(password, usuario.password):
+            proteccion.fallo(username)
             return Response(
                 {'error': 'Credenciales inválidas'}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
+        proteccion.exito(username)
         
-        # Generar token
-        token = generate_token(usuario)
+        # Generar access token y refresh token
+        par = emitir(usuario)
         
         return Response({
             'message': 'Login exitoso',
-            'token': token,
+            **par,
             'user': {
                 'id': usuario.id,
                 'username': usuario.username,
@@ -46,6 +59,42 @@ def login(request):
             {'error': 'Credenciales inválidas'}, 
             status=status.HTTP_401_UNAUTHORIZED
         )
+    except Ocupado:
+        return Response(
+            {'error': 'Servidor ocupado, intente de nuevo en unos segundos'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': '1'}
+        )
+
+
+# GET /api/usuarios/login/estadisticas/ - Latencia del hash de contraseñas y rechazos del login
+@api_view(['GET'])
+def estadisticas_login(request):
+    """Para ajustar las iteraciones del hasher y los límites del login (por proceso)"""
+    return Response(proteccion.estadisticas())
+
+
+# POST /api/usuarios/token/refrescar/ - Cambiar el refresh token por un par nuevo
+@api_view(['POST'])
+def refrescar_token(request):
+    serializer = RefreshSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(rotar(serializer.validated_data['refresh']), status=status.HTTP_200_OK)
+    except RefreshInvalido as e:
+        return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+# POST /api/usuarios/logout/ - Cerrar la sesión del refresh token (y de sus access tokens)
+@api_view(['POST'])
+def logout(request):
+    serializer = RefreshSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not cerrar_sesion(serializer.validated_data['refresh']):
+        return Response({'error': 'Refresh token inválido'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({'message': 'Sesión cerrada'}, status=status.HTTP_200_OK)
 
 
 # GET /api/usuarios/ - Listar usuarios activos (PROTEGIDA)
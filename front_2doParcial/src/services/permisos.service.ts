@@ -65,4 +65,43 @@ export async function actualizarPermiso(id: number, data: UpdatePermisoData): Pr
 export async function eliminarPermiso(id: number): Promise<{message: string}> {
   const response = await axios.delete(`${API}/permisos/${id}/eliminar/`)
   return response.data
-}
\ No newline at end of file
+}
+
+export interface MatrizPermisos {
+  acciones: { ver: number; crear: number; editar: number; eliminar: number }
+  usuarios: Record<string, Record<string, number>>
+}
+
+// Token del login para los endpoints que verifican permisos en el servidor
+function authHeaders() {
+  const token = localStorage.getItem('authToken')
+  return token ? { Authorization: `Bearer ${token}` } : {}
+}
+
+// 🧮 Permisos compilados de todos los usuarios (o de los dados) en una llamada
+export async function getMatrizPermisos(usuarios?: number[]): Promise<MatrizPermisos> {
+  const params = usuarios?.length ? { usuarios: usuarios.join(',') } : undefined
+  const response = await axios.get(`${API}/permisos/matriz/`, { params, headers: authHeaders() })
+  return response.data
+}
+
+export interface AsignacionMasivaData {
+  usuarios: number[]
+  permisos?: Omit<CreatePermisoData, 'usuario'>[]
+  origen?: number
+  reemplazar?: boolean
+}
+
+export interface AsignacionMasivaResultado {
+  usuarios: number
+  vistas: number
+  asignados: number
+  eliminados: number
+  matriz: MatrizPermisos['usuarios']
+}
+
+// 📦 Asignar las mismas vistas (o copiar las de un usuario) a varios usuarios
+export async function asignarPermisos(data: AsignacionMasivaData): Promise<AsignacionMasivaResultado> {
+  const response = await axios.post(`${API}/permisos/asignar/`, data, { headers: authHeaders() })
+  return response.data
+}
@@ -93,6 +93,22 @@ export async function obtenerProducto(id: number): Promise<Producto> {
   return response.data
 }
 
+export interface ProductosLote {
+  productos: Producto[];
+  no_encontrados: number[];
+  inactivos: number[];
+  total?: string;
+}
+
+// 🛒 Obtener varios productos en una petición (carrito, favoritos), en el orden pedido.
+// Con cantidades (una por id) el backend agrega el total del carrito.
+export async function obtenerProductosLote(ids: number[], cantidades?: number[]): Promise<ProductosLote> {
+  const params: Record<string, string> = { ids: ids.join(',') }
+  if (cantidades) params.cantidades = cantidades.join(',')
+  const response = await axios.get(`${API}/productos/lote/`, { params })
+  return response.data
+}
+
 // 📥 Crear un nuevo producto
 export async function crearProducto(data: CreateProductoData): Promise<Producto> {
   const response = await axios.post(`${API}/productos/crear/`, data)